@@ -12,5 +12,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Widoki tylko do odczytu w wersji asynchronicznej (finance/async_views.py)
+os.environ.setdefault('FINANCE_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Ciężkie biblioteki wczytane raz, przed rozwidleniem procesów serwera (FINANCE_PRELOAD, domyślnie wyłączone)
+from finance.preload import preload_if_enabled  # noqa: E402
+
+preload_if_enabled()
+
+# Okresowa materializacja transakcji cyklicznych (FINANCE_RECURRING_INTERVAL, domyślnie wyłączona)
+from finance.recurring import start_runner  # noqa: E402
+
+start_runner()
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os
 
+from django.contrib.messages import constants as message_constants
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Profilowanie żądań - aktywne tylko przy FINANCE_PROFILING=1 (patrz niżej)
+    'finance.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +70,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'finance.context_processors.currency',
             ],
         },
     },
@@ -80,8 +85,51 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+# Profil produkcyjny SQLite (DB_PROFILE=production): pragmy i BEGIN IMMEDIATE przy każdym połączeniu
+# (finance/database.py), połączenia utrzymywane między żądaniami (DB_CONN_MAX_AGE sekund, sprawdzane
+# przed użyciem) i opcjonalnie osobny alias do odczytu (DB_READ_ALIAS=1, ten sam plik).
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+FINANCE_SQLITE_PRAGMAS = {}
+FINANCE_SQLITE_BEGIN_IMMEDIATE = False
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    })
+    FINANCE_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,             # ms
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,         # ujemne = KiB, czyli 64 MiB
+        'temp_store': 'MEMORY',
     }
+    FINANCE_SQLITE_BEGIN_IMMEDIATE = True
+    if os.environ.get('DB_READ_ALIAS') == '1':
+        DATABASES['read'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+        DATABASE_ROUTERS = ['finance.database.ReadWriteRouter']
+
+
+# Cache (pulpit, specyfikacje wykresów). Domyślnie pamięć procesu - przy kilku procesach
+# serwera ustaw wspólny backend, np.:
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/centus-cache
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+# (Redis wymaga pakietu redis)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'finance'),
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', ''),
+    },
+    # Liczniki limitu żądań API (finance/api.py) - zawsze lokalnie w procesie, bez sieci na każde żądanie
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'finance-api',
+    },
 }
 
 
@@ -128,3 +176,56 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = 'transaction_list'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Komunikaty jako alerty Bootstrapa (alert-danger zamiast nieistniejącego alert-error)
+MESSAGE_TAGS = {message_constants.ERROR: 'danger'}
+
+# --- Aplikacja finance ---
+# Waluta, w której pokazujemy sumy, wykresy i budżety (kwoty w innych walutach są przeliczane
+# po kursach z tabeli ExchangeRate - "manage.py load_rates")
+FINANCE_REPORTING_CURRENCY = os.environ.get('FINANCE_REPORTING_CURRENCY', 'PLN')
+# Maksymalny łączny rozmiar gotowych wykresów PNG trzymanych w pamięci procesu (LRU)
+FINANCE_CHART_CACHE_BYTES = 32 * 1024 * 1024
+# Domyślny tryb wykresów: 'server' (PNG z matplotlib) lub 'client' (rysuje przeglądarka z JSON)
+FINANCE_CHART_MODE = 'server'
+# Od jakiego wykorzystania limitu (0-1) pokazujemy ostrzeżenie o budżecie
+FINANCE_BUDGET_WARNING_RATIO = 0.8
+# Asynchroniczne widoki odczytu (włączane przez core/asgi.py; pod WSGI zostają synchroniczne)
+FINANCE_ASYNC_VIEWS = os.environ.get('FINANCE_ASYNC_VIEWS') == '1'
+# Pula procesów rysujących wykresy PNG (0 = rysowanie w procesie serwera), limit kolejki
+# i maksymalny czas oczekiwania na wykres w sekundach
+FINANCE_CHART_WORKERS = int(os.environ.get('FINANCE_CHART_WORKERS', 2))
+FINANCE_CHART_QUEUE_LIMIT = 16
+FINANCE_CHART_TIMEOUT = 10
+# Wczytanie NumPy (i matplotlib, gdy FINANCE_CHART_WORKERS=0) już przy starcie (core/wsgi.py, core/asgi.py)
+# zamiast przy pierwszym użyciu - dla serwerów typu pre-fork uruchamianych z --preload; procesy puli
+# wykresów rozgrzewają się same (finance/preload.py)
+FINANCE_PRELOAD = os.environ.get('FINANCE_PRELOAD') == '1'
+# Limit żądań JSON API na użytkownika i proces (0 = bez limitu) w oknie o długości w sekundach
+FINANCE_API_RATE_LIMIT = int(os.environ.get('FINANCE_API_RATE_LIMIT', 300))
+FINANCE_API_RATE_WINDOW = 60
+# Profilowanie żądań (Server-Timing, /metrics); wyłączone middleware nie kosztuje nic
+FINANCE_PROFILING = os.environ.get('FINANCE_PROFILING') == '1'
+# Jaka część żądań jest dodatkowo profilowana przez cProfile (0 = żadne) i gdzie zapisywać profile
+FINANCE_PROFILING_SAMPLE_RATE = float(os.environ.get('FINANCE_PROFILING_SAMPLE_RATE', 0))
+FINANCE_PROFILING_DIR = BASE_DIR / 'profiles'
+# Od ilu powtórzeń tego samego zapytania w jednym żądaniu logujemy ostrzeżenie o N+1
+FINANCE_PROFILING_DUPLICATE_THRESHOLD = 5
+# Token dla Prometheusa (nagłówek "Authorization: Bearer <token>"); pusty = tylko administratorzy
+FINANCE_METRICS_TOKEN = os.environ.get('FINANCE_METRICS_TOKEN', '')
+# Co ile sekund proces serwera materializuje transakcje cykliczne (0 = nie robi tego sam;
+# wtedy "manage.py materialize_recurring" z crona)
+FINANCE_RECURRING_INTERVAL = int(os.environ.get('FINANCE_RECURRING_INTERVAL', 0))
+# Kolejka zadań w tle (finance/jobs.py, worker "manage.py run_jobs"): katalog plików,
+# ile zadań jednego użytkownika może się wykonywać naraz i czekać łącznie w kolejce
+FINANCE_JOBS_DIR = BASE_DIR / 'jobs'
+FINANCE_JOBS_PER_USER = 1
+FINANCE_JOBS_MAX_PENDING = 5
+# Liczba prób, opóźnienie pierwszego ponowienia (sekundy, potem podwajane), czas bez znaku
+# życia workera, po którym zadanie wraca do kolejki, i jak długo trzymamy wyniki
+FINANCE_JOBS_MAX_ATTEMPTS = 3
+FINANCE_JOBS_RETRY_DELAY = 30
+FINANCE_JOBS_TIMEOUT = 15 * 60
+FINANCE_JOBS_RESULT_TTL = 24 * 60 * 60
+# Wyciągi większe niż tyle bajtów importuje worker, mniejsze - od razu w żądaniu
+FINANCE_JOBS_IMPORT_INLINE_BYTES = 1024 * 1024
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Ciężkie biblioteki wczytane raz, przed rozwidleniem procesów serwera (FINANCE_PRELOAD, domyślnie wyłączone)
+from finance.preload import preload_if_enabled  # noqa: E402
+
+preload_if_enabled()
+
+# Okresowa materializacja transakcji cyklicznych (FINANCE_RECURRING_INTERVAL, domyślnie wyłączona)
+from finance.recurring import start_runner  # noqa: E402
+
+start_runner()
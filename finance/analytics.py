@@ -0,0 +1,251 @@
+"""
+Analizy historii użytkownika liczone wektorowo (NumPy).
+
+Całą historię pobieramy jednym zapytaniem z miesięcznych rollupów i układamy w macierz
+kategorie x miesiące (miesiące bez danych to zera - inaczej średnie kroczące i zmiany
+miesiąc do miesiąca przeskakiwałyby luki). Wszystkie wskaźniki to operacje na całych
+wierszach tej macierzy, bez pętli po miesiącach i bez arytmetyki na Decimalach.
+
+Bieżący miesiąc jest niepełny: pokazujemy go w seriach, ale prognoza i "największe zmiany"
+liczone są tylko z pełnych miesięcy.
+"""
+import numpy as np
+from django.db import connections
+from django.utils import timezone
+
+from finance import caching, categories, currency
+from finance.models import MonthlyRollup
+
+# Okno średniej kroczącej i bazy porównania dla największych zmian (w miesiącach)
+WINDOW = 3
+TOP_MOVERS = 5
+FORECAST_MONTHS = 3
+# Od ilu pełnych miesięcy prognoza uwzględnia sezonowość (dwa pełne lata)
+SEASONAL_MIN_MONTHS = 24
+
+
+class History:
+    """Macierz sum: matrix[i, j] to suma kategorii category_ids[i] w miesiącu months[j]"""
+
+    def __init__(self, months, category_ids, category_types, matrix, current, missing_rates=()):
+        self.months = months
+        self.category_ids = category_ids
+        self.category_types = category_types
+        self.matrix = matrix
+        # Liczba pełnych miesięcy (wszystkie przed bieżącym)
+        self.complete = int(np.searchsorted(months, current))
+        # Waluty bez kursów - ich sumy są w macierzy zerami
+        self.missing_rates = sorted(missing_rates)
+
+    @property
+    def income(self):
+        return self.matrix[self.category_types == 'INCOME'].sum(axis=0)
+
+    @property
+    def expense(self):
+        return self.matrix[self.category_types == 'EXPENSE'].sum(axis=0)
+
+
+def load(user, today=None):
+    """
+    Historia użytkownika - jedno zapytanie, miesiące od pierwszego z danymi do bieżącego.
+    Sumy w innych walutach są przeliczane na walutę raportów po średnim kursie miesiąca.
+    """
+    today = today or timezone.localdate()
+    current = np.datetime64(today, 'M')
+    rows = _fetch(MonthlyRollup.objects.filter(user=user).order_by()
+                  .values_list('month', 'category_id', 'category_type', 'total', 'currency'))
+    if not rows:
+        return History(np.array([current]), np.array([], dtype=int), np.array([], dtype=str),
+                       np.zeros((0, 1)), current)
+
+    months, category_ids, category_types, totals, currencies = zip(*rows)
+    # SQLite zwraca daty jako tekst 'RRRR-MM-DD', inne bazy jako date - NumPy przyjmuje oba
+    months = np.array(months, dtype='datetime64[D]').astype('datetime64[M]')
+    converter = currency.converter()
+    totals = np.array(totals, dtype=float) * _factors(months, np.array(currencies), converter)
+    first = months.min()
+    span = np.arange(first, max(months.max(), current) + 1)
+    ids, first_row, rows_category = np.unique(np.array(category_ids), return_index=True, return_inverse=True)
+
+    matrix = np.zeros((len(ids), len(span)))
+    np.add.at(matrix, (rows_category, (months - first).astype(int)), totals)
+    return History(span, ids, np.array(category_types)[first_row], matrix, current, converter.missing)
+
+
+def _factors(months, currencies, converter):
+    """Mnożniki kursów dla wierszy - liczone raz na parę (waluta, miesiąc), nie na wiersz"""
+    factors = np.ones(len(months))
+    for code in np.unique(currencies).tolist():
+        if code == converter.target:
+            continue
+        mask = currencies == code
+        unique, inverse = np.unique(months[mask], return_inverse=True)
+        factors[mask] = np.array([converter.month_factor(code, month.item())
+                                  for month in unique.astype('datetime64[D]')])[inverse]
+    return factors
+
+
+def _fetch(queryset):
+    """
+    Surowe wiersze zapytania - bez konwerterów ORM. Przy kilku tysiącach rollupów zamiana
+    każdej sumy na Decimal i każdego miesiąca na date kosztuje więcej niż same obliczenia,
+    a i tak od razu zamieniamy je na tablice float i datetime64.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def rolling_mean(values, window=WINDOW):
+    """Średnia z ostatnich window miesięcy; NaN dopóki nie ma pełnego okna"""
+    result = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def changes(values):
+    """Zmiana miesiąc do miesiąca - kwotowo i procentowo (NaN, gdy poprzedni miesiąc był zerowy)"""
+    previous = np.concatenate(([np.nan], values[:-1]))
+    delta = values - previous
+    percent = np.divide(delta, previous, out=np.full(values.shape, np.nan),
+                        where=~np.isnan(previous) & (previous != 0))
+    return delta, percent * 100
+
+
+def savings_rate(income, expense):
+    """Jaka część wpływów została (procent); NaN w miesiącach bez wpływów"""
+    return np.divide(income - expense, income, out=np.full(income.shape, np.nan), where=income > 0) * 100
+
+
+def top_movers(history, count=TOP_MOVERS, window=WINDOW):
+    """
+    Kategorie wydatków o największej zmianie w ostatnim pełnym miesiącu względem
+    średniej z window poprzednich. Zwraca (indeksy wierszy macierzy, ostatni miesiąc, średnia).
+    """
+    last = history.complete - 1
+    if last < 1:
+        return np.array([], dtype=int), np.array([]), np.array([])
+    expenses = history.matrix[history.category_types == 'EXPENSE']
+    rows = np.flatnonzero(history.category_types == 'EXPENSE')
+    latest = expenses[:, last]
+    baseline = expenses[:, max(0, last - window):last].mean(axis=1)
+    change = latest - baseline
+    order = np.argsort(-np.abs(change), kind='stable')[:count]
+    order = order[change[order] != 0]
+    return rows[order], latest[order], baseline[order]
+
+
+def forecast(values, months, horizon=FORECAST_MONTHS):
+    """
+    Prognoza na horizon miesięcy po ostatnim z months: trend liniowy (najmniejsze kwadraty),
+    a przy co najmniej dwóch latach historii także średnie odchylenie danego miesiąca
+    kalendarzowego od trendu (sezonowość). Zwraca (prognoza, metoda).
+    """
+    count = len(values)
+    steps = np.arange(count, count + horizon)
+    if count == 0:
+        return np.zeros(horizon), 'brak danych'
+    if count < 3:
+        return np.full(horizon, values.mean()), 'średnia'
+
+    x = np.arange(count)
+    slope, intercept = np.polyfit(x, values, 1)
+    result = slope * steps + intercept
+    method = 'trend liniowy'
+    if count >= SEASONAL_MIN_MONTHS:
+        calendar_month = (months.astype(int) % 12)
+        residuals = values - (slope * x + intercept)
+        seasonal = np.bincount(calendar_month, residuals, minlength=12) / np.maximum(
+            np.bincount(calendar_month, minlength=12), 1)
+        result = result + seasonal[(calendar_month[-1] + 1 + np.arange(horizon)) % 12]
+        method = 'trend liniowy + sezonowość'
+    # Wydatki nie bywają ujemne - trend spadkowy obcinamy na zerze
+    return np.maximum(result, 0), method
+
+
+def report(user, today=None):
+    """Komplet wskaźników jako słownik gotowy do JSON-a i szablonu"""
+    today = today or timezone.localdate()
+    history = load(user, today)
+    income, expense = history.income, history.expense
+    balance = income - expense
+    expense_change, expense_change_pct = changes(expense)
+    income_change, income_change_pct = changes(income)
+
+    complete = history.complete
+    totals = income[:complete].sum(), expense[:complete].sum()
+    predicted, method = forecast(expense[:complete], history.months[:complete])
+    forecast_months = history.months[complete - 1] + 1 + np.arange(FORECAST_MONTHS) if complete \
+        else history.months[-1:] + np.arange(FORECAST_MONTHS)
+
+    registry = categories.registry()
+    rows, latest, baseline = top_movers(history)
+    movers = [
+        {'category_id': int(history.category_ids[row]), 'name': registry.name(int(history.category_ids[row])),
+         'value': _round(value), 'average': _round(average), 'change': _round(value - average),
+         'change_pct': _round((value - average) / average * 100) if average else None}
+        for row, value, average in zip(rows, latest, baseline)
+    ]
+
+    return {
+        'months': [str(month) for month in history.months],
+        'complete_months': complete,
+        'window': WINDOW,
+        'income': _values(income),
+        'expense': _values(expense),
+        'balance': _values(balance),
+        'income_rolling': _values(rolling_mean(income)),
+        'expense_rolling': _values(rolling_mean(expense)),
+        'balance_rolling': _values(rolling_mean(balance)),
+        'income_change': _values(income_change),
+        'income_change_pct': _values(income_change_pct),
+        'expense_change': _values(expense_change),
+        'expense_change_pct': _values(expense_change_pct),
+        'savings_rate': _values(savings_rate(income, expense)),
+        'savings_rate_total': _round((totals[0] - totals[1]) / totals[0] * 100) if totals[0] > 0 else None,
+        'top_movers': movers,
+        'missing_rates': history.missing_rates,
+        'movers_month': str(history.months[complete - 1]) if rows.size else None,
+        'forecast': {
+            'months': [str(month) for month in forecast_months],
+            'expense': _values(predicted),
+            'method': method,
+        },
+    }
+
+
+def cached_report(user, today=None):
+    """report() zapamiętany do następnej zmiany danych użytkownika (jak kontekst pulpitu)"""
+    today = today or timezone.localdate()
+    key = caching.dashboard_key(user.pk, 'analytics', today.year, today.month)
+    result = caching.get_dashboard(key)
+    if result is None:
+        result = report(user, today)
+        caching.set_dashboard(key, result)
+    return result
+
+
+def recent_months(result, count=12):
+    """Ostatnie count miesięcy raportu jako wiersze tabeli (od najnowszego)"""
+    keys = ['income', 'expense', 'balance', 'expense_rolling', 'expense_change', 'expense_change_pct',
+            'savings_rate']
+    start = max(0, len(result['months']) - count)
+    return [
+        dict({key: result[key][index] for key in keys}, month=result['months'][index],
+             complete=index < result['complete_months'])
+        for index in range(len(result['months']) - 1, start - 1, -1)
+    ]
+
+
+def _values(array):
+    """Tablica -> lista liczb z dwoma miejscami po przecinku; NaN -> None (null w JSON)"""
+    # value != value tylko dla NaN
+    return [None if value != value else value for value in np.round(array, 2).tolist()]
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 2)
@@ -0,0 +1,234 @@
+"""
+JSON API tylko do odczytu (/api/v1/) dla aplikacji mobilnych i automatyzacji.
+
+Odpowiedzi powstają bez formularzy i szablonów: wiersze z values_list zamieniane wprost
+na zwięzły JSON. Każda odpowiedź ma ETag wyliczany z wersji danych użytkownika, kategorii
+i kursów (finance/caching.py) oraz adresu z parametrami - klient, który odpytuje ponownie
+z If-None-Match, dostaje 304 bez zapytań o dane (zostają tylko sesja i użytkownik).
+Odpowiedzi są kompresowane gzipem, gdy klient na to pozwala.
+
+Uwierzytelnianie - sesja, jak w pozostałych endpointach JSON (bez sesji 401 zamiast
+przekierowania na logowanie). Limit żądań na użytkownika (FINANCE_API_RATE_LIMIT na
+FINANCE_API_RATE_WINDOW sekund) liczony jest w lokalnym cache procesu (alias 'api' w CACHES):
+bez ruchu sieciowego na każde żądanie, za to przy kilku procesach serwera limit dotyczy
+każdego z nich osobno.
+"""
+import datetime
+import hashlib
+import math
+import time
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
+
+from finance import caching, categories, search, series
+from finance.models import Category, Transaction
+from finance.pagination import PAGE_SIZE, InvalidCursor, keyset_page
+
+VERSION = 'v1'
+MAX_PAGE_SIZE = 200
+SEARCH_MAX_LENGTH = 200
+TYPES = {type for type, label in Category.TYPE_CHOICES}
+# Bez spacji po separatorach i bez escapowania polskich znaków - krótsze odpowiedzi
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def _error(status, message, **extra):
+    return _json(dict({'error': message}, **extra), status=status)
+
+
+def _rate_limit(user_id):
+    """Liczy żądanie w bieżącym oknie; zwraca (liczba żądań w oknie, sekundy do końca okna)"""
+    window = settings.FINANCE_API_RATE_WINDOW
+    now = time.time()
+    slot = int(now // window)
+    key = f'{caching.PREFIX}api:rate:{user_id}:{slot}'
+    cache = caches['api']
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Wpis wypadł z cache między add a incr
+        cache.set(key, 1, window)
+        count = 1
+    return count, math.ceil((slot + 1) * window - now)
+
+
+def api_view(view):
+    """Uwierzytelnienie (401), limit żądań (429) i nagłówki wspólne dla odpowiedzi API"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(401, "Wymagane zalogowanie.")
+        limit = settings.FINANCE_API_RATE_LIMIT
+        if limit:
+            count, reset = _rate_limit(request.user.pk)
+            if count > limit:
+                response = _error(429, "Za dużo żądań - spróbuj ponownie później.", retry_after=reset)
+                response['Retry-After'] = str(reset)
+                return response
+        response = view(request, *args, **kwargs)
+        if limit:
+            response['X-RateLimit-Limit'] = str(limit)
+            response['X-RateLimit-Remaining'] = str(max(limit - count, 0))
+            response['X-RateLimit-Reset'] = str(reset)
+        # Klient może trzymać odpowiedź, ale zawsze pyta o aktualność (ETag -> 304)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    # gzip na zewnątrz: ETag z condition() staje się słaby (W/"..."), a porównanie If-None-Match
+    # dla GET i tak jest słabe, więc skompresowana odpowiedź nadal daje 304
+    return require_safe(gzip_page(wrapper))
+
+
+def _etag(request, *parts):
+    return hashlib.md5(repr((VERSION, request.user.pk, caching.data_version(request.user.pk),
+                             request.get_full_path(), *parts)).encode()).hexdigest()
+
+
+def _category_etag(request):
+    # Kategorie są wspólne - zmiany transakcji użytkownika nie unieważniają listy
+    return hashlib.md5(repr((VERSION, caching.category_version())).encode()).hexdigest()
+
+
+# --- Transakcje ---
+
+def _parse_date(value):
+    return datetime.date.fromisoformat(value)
+
+
+def _parse_amount(value):
+    amount = Decimal(value)
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(value)
+    return amount
+
+
+def _parse_category(value):
+    category = categories.registry().get(int(value))
+    if category is None:
+        raise ValueError(value)
+    return category
+
+
+def _parse_type(value):
+    if value not in TYPES:
+        raise ValueError(value)
+    return value
+
+
+def _parse_query(value):
+    if len(value) > SEARCH_MAX_LENGTH:
+        raise ValueError(value)
+    return value
+
+
+# Te same filtry co w wyszukiwarce (search.filter_transactions), bez TransactionFilterForm
+FILTERS = {
+    'q': (_parse_query, f"Najwyżej {SEARCH_MAX_LENGTH} znaków."),
+    'date_from': (_parse_date, "Oczekiwano daty RRRR-MM-DD."),
+    'date_to': (_parse_date, "Oczekiwano daty RRRR-MM-DD."),
+    'category': (_parse_category, "Nie ma takiej kategorii."),
+    'type': (_parse_type, f"Dozwolone wartości: {', '.join(sorted(TYPES))}."),
+    'amount_min': (_parse_amount, "Oczekiwano nieujemnej kwoty."),
+    'amount_max': (_parse_amount, "Oczekiwano nieujemnej kwoty."),
+}
+
+
+def parse_filters(params):
+    """Parametry GET -> (filtry dla search.filter_transactions, błędy {pole: [komunikat]})"""
+    filters, errors = {}, {}
+    for name, (parse, message) in FILTERS.items():
+        value = params.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            filters[name] = parse(value)
+        except (ValueError, InvalidOperation):
+            errors[name] = [message]
+    return filters, errors
+
+
+def _page_size(params):
+    try:
+        size = int(params.get('size', PAGE_SIZE))
+    except ValueError:
+        return None
+    return size if 1 <= size <= MAX_PAGE_SIZE else None
+
+
+@api_view
+@condition(etag_func=lambda request: _etag(request))
+def transactions(request):
+    """Transakcje od najnowszej, stronicowane kursorem (next_cursor), z filtrami jak w wyszukiwarce"""
+    filters, errors = parse_filters(request.GET)
+    size = _page_size(request.GET)
+    if size is None:
+        errors['size'] = [f"Oczekiwano liczby od 1 do {MAX_PAGE_SIZE}."]
+    if errors:
+        return _json({'errors': errors}, status=400)
+
+    rows = (search.filter_transactions(Transaction.objects.filter(user=request.user), filters)
+            .values_list('pk', 'date', 'amount', 'currency', 'description', 'category_id', named=True))
+    try:
+        page, next_cursor = keyset_page(rows, request.GET.get('cursor'), size)
+    except InvalidCursor:
+        return _json({'errors': {'cursor': ["Nieprawidłowy kursor."]}}, status=400)
+
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = f'{request.path}?{query.urlencode()}'
+    return _json({
+        'results': [{
+            'id': row.pk,
+            'date': row.date,
+            'amount': row.amount,
+            'currency': row.currency,
+            'description': row.description,
+            'category': row.category_id,
+        } for row in page],
+        'next_cursor': next_cursor,
+        'next': next_url,
+    })
+
+
+# --- Kategorie i podsumowania ---
+
+@api_view
+@condition(etag_func=_category_etag)
+def category_list(request):
+    """Kategorie z rejestru procesu - bez zapytania do bazy, dopóki nie zmieni się wersja kategorii"""
+    return _json({'results': [
+        {'id': category.pk, 'name': category.name, 'type': category.type} for category in categories.registry()
+    ]})
+
+
+@api_view
+@condition(etag_func=lambda request: _etag(request, settings.FINANCE_REPORTING_CURRENCY))
+def summary(request):
+    """Sumy z całej historii, miesiąc po miesiącu i wydatki według kategorii - w walucie raportów"""
+    totals = series.balance(request.user)
+    monthly = series.monthly_balance(request.user)
+    expenses = series.expenses_by_category(request.user)
+    return _json({
+        'currency': settings.FINANCE_REPORTING_CURRENCY,
+        'income': totals['income'],
+        'expense': totals['expense'],
+        'balance': totals['balance'],
+        'missing_rates': totals['missing_rates'],
+        'monthly': [{'month': month, 'income': income, 'expense': expense}
+                    for month, income, expense in zip(monthly['months'], monthly['incomes'], monthly['expenses'])],
+        'expenses_by_category': [{'category': name, 'total': total}
+                                 for name, total in zip(expenses['labels'], expenses['values'])],
+    })
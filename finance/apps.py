@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class FinanceConfig(AppConfig):
+    name = 'finance'
+    verbose_name = 'Finanse'
+
+    def ready(self):
+        # Rejestracja odbiorników sygnałów (rollupy, unieważnianie cache itd.)
+        from finance import signals  # noqa: F401
+        # Pragmy SQLite dla każdego nowego połączenia (profil produkcyjny, patrz core/settings.py)
+        from finance import database
+        database.install()
@@ -0,0 +1,139 @@
+"""
+Asynchroniczne odpowiedniki widoków tylko do odczytu (serwer ASGI).
+
+Zapytania idą przez asynchroniczne ORM (async for), wykresy rysuje pula procesów
+(finance/rendering.py), więc czekające żądanie nie zajmuje wątku. Sesja i szablony
+stron dziedziczących z base.html w Django 5.0 są synchroniczne - te kroki wykonujemy
+przez sync_to_async. finance/urls.py wybiera ten moduł, gdy FINANCE_ASYNC_VIEWS=1
+(ustawiane w core/asgi.py).
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from finance import budgets, caching, charts, rendering, series, views
+from finance.categories import aregistry
+from finance.pagination import InvalidCursor, akeyset_page
+
+
+def alogin_required(view):
+    """login_required dla widoków async (w Django 5.0 dekorator obsługuje tylko widoki synchroniczne)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, user, *args, **kwargs)
+    return wrapper
+
+
+def _dashboard_state(request):
+    # Wszystko, co dotyka sesji, w jednym przejściu do wątku
+    etag = views.dashboard_etag(request)
+    last_modified = views.dashboard_last_modified(request)
+    return views.chart_mode(request), etag and quote_etag(etag), last_modified and last_modified.timestamp()
+
+
+@alogin_required
+async def transaction_list(request, user):
+    mode, etag, last_modified = await sync_to_async(_dashboard_state)(request)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    today = timezone.localdate()
+    key = await sync_to_async(caching.dashboard_key)(user.pk, mode, today.year, today.month)
+    context = await sync_to_async(caching.get_dashboard)(key)
+    if context is None:
+        page, next_cursor = await akeyset_page(views.transaction_feed(user))
+        (await aregistry()).attach(page)
+        totals = await series.abalance(user)
+        context = views.build_dashboard_context(page, next_cursor, totals, await budgets.astatuses(user, today), mode)
+        await sync_to_async(caching.set_dashboard)(key, context)
+
+    response = await sync_to_async(views.render_dashboard)(request, context, mode)
+    if etag:
+        response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@alogin_required
+async def transaction_list_more(request, user):
+    try:
+        page, next_cursor = await akeyset_page(views.transaction_feed(user), request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Nieprawidłowy kursor')
+    (await aregistry()).attach(page)
+
+    # Sam fragment wierszy - bez procesorów kontekstu, więc można go wyrenderować w pętli zdarzeń
+    response = HttpResponse(render_to_string('finance/_transaction_rows.html', {'transactions': page}))
+    response['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+
+@alogin_required
+async def analysis(request, user):
+    mode = await sync_to_async(views.chart_mode)(request)
+    pie_chart = None
+    bar_chart = None
+
+    if mode == 'server':
+        expenses = await series.aexpenses_by_category(user)
+        if expenses['labels']:
+            pie_chart = await sync_to_async(charts.register)(charts.pie_spec(expenses['labels'], expenses['values']))
+
+        monthly = await series.amonthly_balance(user)
+        if monthly['months']:
+            bar_chart = await sync_to_async(charts.register)(
+                charts.monthly_spec(monthly['months'], monthly['incomes'], monthly['expenses']))
+
+    # Obliczenia NumPy i cache są synchroniczne - wykonujemy je w wątku (NumPy ładowany przy pierwszym użyciu)
+    from finance import analytics
+    report = await sync_to_async(analytics.cached_report)(user)
+    return await sync_to_async(render)(request, 'finance/analysis.html', {
+        'chart_mode': mode,
+        'pie_chart': pie_chart,
+        'bar_chart': bar_chart,
+        **await sync_to_async(views.analysis_context)(report, mode),
+    })
+
+
+@alogin_required
+async def balance_data(request, user):
+    return JsonResponse(await series.abalance(user))
+
+
+@alogin_required
+async def expenses_data(request, user):
+    return JsonResponse(await series.aexpenses_by_category(user))
+
+
+@alogin_required
+async def monthly_data(request, user):
+    return JsonResponse(await series.amonthly_balance(user))
+
+
+@alogin_required
+async def analytics_data(request, user):
+    from finance import analytics
+    return JsonResponse(await sync_to_async(analytics.cached_report)(user))
+
+
+@alogin_required
+async def chart_image(request, user, key):
+    try:
+        png = await charts.aget_png(key, render=rendering.arender)
+    except rendering.RenderError as error:
+        return views.chart_unavailable(error)
+    if png is None:
+        raise Http404("Nieznany wykres")
+    return views.chart_response(request, key, png)
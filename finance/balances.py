@@ -0,0 +1,308 @@
+"""
+Dzienne sumy narastające (DailyBalance) i raporty dla dowolnego okresu.
+
+Dla każdej trójki (użytkownik, kategoria, waluta) trzymamy wiersz na dzień z transakcjami:
+sumę z tego dnia i sumę od początku historii do tego dnia włącznie. Suma z okresu
+[od, do] to prefiks(do) - prefiks(od - 1 dzień), a prefiks(d) to ostatni wiersz z datą <= d -
+jedno wyszukiwanie w indeksie (user, category, currency, date) na kategorię, walutę i granicę
+okresu, niezależnie od tego, ile transakcji mieści się w okresie. Sumy są w walucie transakcji -
+raport przelicza je na walutę raportów średnim kursem z okresu (finance/currency.py).
+
+Zmiany transakcji przychodzą jako delty (jak dla MonthlyRollup, patrz finance/rollups.py).
+Zmiana z dnia D przesuwa sumy narastające wszystkich późniejszych dni tej kategorii:
+przy kilku zmienionych dniach robi to jeden UPDATE ... WHERE date >= D na dzień, przy
+wielu (import historii) przeliczamy całą końcówkę tej kategorii i waluty od najwcześniejszego
+zmienionego dnia.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import connections, router, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+
+from finance import categories, currency
+from finance.models import Category, DailyBalance, MonthlyRollup, Transaction
+from finance.rollups import CENT, add_months, month_end
+
+# Od ilu zmienionych dni jednej trójki (użytkownik, kategoria, waluta) przeliczamy jej końcówkę
+# zamiast przesuwać sumy osobnym UPDATE-em dla każdego dnia
+SUFFIX_THRESHOLD = 16
+BULK_BATCH = 5000
+
+COMPARE_PREVIOUS = 'previous'
+COMPARE_YEAR = 'year'
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def apply_deltas(deltas):
+    """Nakłada delty {(user_id, category_id, data, waluta): [kwota, liczba]} na DailyBalance"""
+    groups = defaultdict(dict)
+    for (user_id, category_id, date, code), (amount, count) in deltas.items():
+        # Transakcje bez kategorii nie wchodzą do żadnej sumy
+        if category_id is None or (not amount and not count):
+            continue
+        groups[user_id, category_id, code][date] = (amount, count)
+    if not groups:
+        return
+
+    shifts = []
+    with transaction.atomic():
+        for (user_id, category_id, code), days in groups.items():
+            if len(days) > SUFFIX_THRESHOLD:
+                _rewrite_suffix(user_id, category_id, code, days)
+            else:
+                shifts.extend((user_id, category_id, code, date, amount, count)
+                              for date, (amount, count) in days.items())
+        if shifts:
+            _shift(shifts)
+
+
+def _shift(rows):
+    """
+    Kilka dni na trójkę: brakujący wiersz dnia tworzymy z sumą narastającą poprzedniego dnia,
+    potem dodajemy deltę do tego dnia i wszystkich późniejszych - dwa executemany na całą paczkę.
+    """
+    connection = connections[router.db_for_write(DailyBalance)]
+    ops = connection.ops
+    meta = DailyBalance._meta
+    table = ops.quote_name(meta.db_table)
+    user, category, code, date, day_total, day_count, total, count = (
+        ops.quote_name(meta.get_field(name).column)
+        for name in ('user', 'category', 'currency', 'date', 'day_total', 'day_count', 'total', 'count')
+    )
+    where = f'{user} = %s AND {category} = %s AND {code} = %s'
+    previous = (f'SELECT %s FROM {table} WHERE {user} = %%s AND {category} = %%s AND {code} = %%s '
+                f'AND {date} < %%s ORDER BY {date} DESC LIMIT 1')
+    insert = (
+        f'INSERT INTO {table} ({user}, {category}, {code}, {date}, {day_total}, {day_count}, {total}, {count}) '
+        f'VALUES (%s, %s, %s, %s, 0, 0, COALESCE(({previous % total}), 0), COALESCE(({previous % count}), 0)) '
+        f'ON CONFLICT DO NOTHING'
+    )
+    update = (
+        f'UPDATE {table} SET '
+        f'{day_total} = {day_total} + CASE WHEN {date} = %s THEN %s ELSE 0 END, '
+        f'{day_count} = {day_count} + CASE WHEN {date} = %s THEN %s ELSE 0 END, '
+        f'{total} = {total} + %s, {count} = {count} + %s '
+        f'WHERE {where} AND {date} >= %s'
+    )
+    total_field = meta.get_field('total')
+
+    inserts, updates, emptied = [], [], []
+    for user_id, category_id, currency_code, day, amount, number in rows:
+        key = (user_id, category_id, currency_code)
+        day = ops.adapt_datefield_value(day)
+        amount = ops.adapt_decimalfield_value(amount, total_field.max_digits, total_field.decimal_places)
+        # Wiersz dnia tworzymy tylko dla nowych transakcji - usunięcie albo edycja dotyczy dnia, który już jest
+        if number > 0:
+            inserts.append((*key, day, *key, day, *key, day))
+        updates.append((day, amount, day, number, amount, number, *key, day))
+        if number < 0:
+            emptied.append((*key, day))
+    with connection.cursor() as cursor:
+        if inserts:
+            cursor.executemany(insert, inserts)
+        cursor.executemany(update, updates)
+        if emptied:
+            # Dzień bez transakcji niczego nie wnosi - prefiks weźmie się z wcześniejszego wiersza
+            cursor.executemany(f'DELETE FROM {table} WHERE {where} AND {date} = %s AND {day_count} <= 0', emptied)
+
+
+def _rewrite_suffix(user_id, category_id, code, days):
+    """Wiele dni na trójkę: przeliczamy wiersze od najwcześniejszego zmienionego dnia od nowa"""
+    start = min(days)
+    balances = DailyBalance.objects.filter(user_id=user_id, category_id=category_id, currency=code)
+    total, count = (balances.filter(date__lt=start).order_by('-date').values_list('total', 'count').first()
+                    or (Decimal('0'), 0))
+    daily = {day: [day_total, day_count] for day, day_total, day_count in
+             balances.filter(date__gte=start).values_list('date', 'day_total', 'day_count')}
+    for day, (amount, number) in days.items():
+        entry = daily.setdefault(day, [Decimal('0'), 0])
+        entry[0] += amount
+        entry[1] += number
+
+    rows = []
+    for day in sorted(daily):
+        day_total, day_count = daily[day]
+        if day_count <= 0:
+            continue
+        total += day_total
+        count += day_count
+        rows.append(DailyBalance(user_id=user_id, category_id=category_id, currency=code, date=day,
+                                 day_total=day_total, day_count=day_count, total=total, count=count))
+    balances.filter(date__gte=start).delete()
+    DailyBalance.objects.bulk_create(rows, batch_size=BULK_BATCH)
+
+
+def _source_rows(user_ids=None):
+    """Sumy dzienne policzone od zera z tabeli Transaction (punkt odniesienia dla rebuild/verify)"""
+    transactions = Transaction.objects.filter(category__isnull=False)
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+    rows = (transactions.values('user_id', 'category_id', 'currency', 'date')
+            .annotate(day_total=Sum('amount'), day_count=Count('id'))
+            .order_by('user_id', 'category_id', 'currency', 'date'))
+    key, total, count = None, Decimal('0'), 0
+    for row in rows.iterator(chunk_size=BULK_BATCH):
+        if (row['user_id'], row['category_id'], row['currency']) != key:
+            key, total, count = (row['user_id'], row['category_id'], row['currency']), Decimal('0'), 0
+        # SQLite sumuje kolumny decimal jako REAL - zaokrąglamy do groszy
+        row['day_total'] = row['day_total'].quantize(CENT)
+        total += row['day_total']
+        count += row['day_count']
+        yield dict(row, total=total, count=count)
+
+
+def rebuild(user_ids=None):
+    """Przelicza sumy narastające od zera. Zwraca liczbę utworzonych wierszy."""
+    with transaction.atomic():
+        balances = DailyBalance.objects.all()
+        if user_ids is not None:
+            balances = balances.filter(user_id__in=user_ids)
+        balances.delete()
+        created = 0
+        batch = []
+        for row in _source_rows(user_ids):
+            batch.append(DailyBalance(**row))
+            if len(batch) >= BULK_BATCH:
+                created += len(DailyBalance.objects.bulk_create(batch))
+                batch = []
+        created += len(DailyBalance.objects.bulk_create(batch))
+    return created
+
+
+def verify(user_ids=None):
+    """
+    Porównuje DailyBalance z sumami policzonymi z tabeli Transaction.
+    Zwraca listę rozbieżności: (user_id, category_id, dzień, waluta, oczekiwane, zapisane).
+    """
+    fields = ('day_total', 'day_count', 'total', 'count')
+    expected = {(row['user_id'], row['category_id'], row['date'], row['currency']): tuple(row[name] for name in fields)
+                for row in _source_rows(user_ids)}
+    balances = DailyBalance.objects.all()
+    if user_ids is not None:
+        balances = balances.filter(user_id__in=user_ids)
+    stored = {tuple(row[:4]): tuple(row[4:]) for row in
+              balances.values_list('user_id', 'category_id', 'date', 'currency', *fields)
+              .iterator(chunk_size=BULK_BATCH)}
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        if expected.get(key) != stored.get(key):
+            mismatches.append((*key, expected.get(key), stored.get(key)))
+    return mismatches
+
+
+# --- Zapytania ---
+
+def prefix_sums(user, bounds):
+    """
+    Sumy narastające do każdej z dat bounds (włącznie): {(data, category_id, waluta): (suma, liczba)}.
+    Jedno zapytanie: dla każdej kategorii, waluty i granicy podzapytanie wybiera ostatni wiersz z indeksu.
+    """
+    # Waluty użytkownika z rollupów - kilka wierszy na miesiąc zamiast przeglądania dziennych sum
+    codes = list(MonthlyRollup.objects.filter(user=user).order_by().values_list('currency', flat=True).distinct())
+    if not codes:
+        return {}
+
+    def last_rows(bound, code):
+        return Category.objects.annotate(row=Subquery(
+            DailyBalance.objects.filter(user=user, category=OuterRef('pk'), currency=code, date__lte=bound)
+            .order_by('-date').values('pk')[:1]
+        )).values('row')
+
+    rows = DailyBalance.objects.filter(reduce(or_, (Q(pk__in=last_rows(bound, code))
+                                                    for bound in bounds for code in codes)))
+    by_key = defaultdict(list)
+    for category_id, code, date, total, count in rows.values_list('category_id', 'currency', 'date', 'total', 'count'):
+        by_key[category_id, code].append((date, total, count))
+
+    result = {}
+    for bound in bounds:
+        for (category_id, code), entries in by_key.items():
+            # Zwrócone wiersze to prefiksy którejś z granic - dla tej granicy bierzemy najpóźniejszy nie po niej
+            candidates = [entry for entry in entries if entry[0] <= bound]
+            if candidates:
+                result[bound, category_id, code] = max(candidates)[1:]
+    return result
+
+
+def shift_months(day, months):
+    """Jak add_months, ale ostatni dzień miesiąca zostaje ostatnim (29.02 -> 28.02, 28.02 -> 29.02)"""
+    if day == month_end(day):
+        return month_end(add_months(day.replace(day=1), months))
+    return add_months(day, months)
+
+
+def comparison_period(start, end, compare):
+    """Okres porównawczy: poprzedni okres tej samej długości albo ten sam okres rok wcześniej"""
+    if compare == COMPARE_YEAR:
+        return shift_months(start, -12), shift_months(end, -12)
+    if compare == COMPARE_PREVIOUS:
+        if start.day == 1 and end == month_end(end):
+            # Pełne miesiące porównujemy z tyloma samymi poprzednimi miesiącami (marzec -> luty, nie 29.01-28.02)
+            months = (end.year - start.year) * 12 + end.month - start.month + 1
+            return add_months(start, -months), start - ONE_DAY
+        return start - (end - start) - ONE_DAY, start - ONE_DAY
+    return None
+
+
+def report(user, start, end, compare=None):
+    """
+    Sumy kategorii w okresie [start, end] i opcjonalnie w okresie porównawczym, w walucie raportów
+    (sumy w innych walutach przeliczone średnim kursem z okresu)
+    """
+    periods = {'current': (start, end)}
+    previous = comparison_period(start, end, compare)
+    if previous:
+        periods['previous'] = previous
+    sums = prefix_sums(user, sorted({day for first, last in periods.values() for day in (first - ONE_DAY, last)}))
+    codes = sorted({code for bound, category_id, code in sums})
+    converter = currency.converter()
+
+    def period_sum(first, last, category_id):
+        total, count = Decimal('0'), 0
+        for code in codes:
+            total_end, count_end = sums.get((last, category_id, code), (Decimal('0'), 0))
+            total_start, count_start = sums.get((first - ONE_DAY, category_id, code), (Decimal('0'), 0))
+            if count_end != count_start:
+                total += converter.period(total_end - total_start, code, first, last)
+                count += count_end - count_start
+        return total.quantize(CENT), count
+
+    registry = categories.registry()
+    rows = []
+    summary = {type: {name: Decimal('0') for name in periods} for type, label in Category.TYPE_CHOICES}
+    for category_id in sorted({category_id for bound, category_id, code in sums}):
+        category = registry.get(category_id)
+        if category is None:
+            continue
+        row = {'category': category}
+        for name, (first, last) in periods.items():
+            row[name], row[f'{name}_count'] = period_sum(first, last, category_id)
+            summary[category.type][name] += row[name]
+        if not any(row[f'{name}_count'] for name in periods):
+            continue
+        if previous:
+            row.update(_change(row['current'], row['previous']))
+        rows.append(row)
+    rows.sort(key=lambda row: (row['category'].type != 'INCOME', -row['current']))
+
+    balance = {name: summary['INCOME'][name] - summary['EXPENSE'][name] for name in periods}
+    totals = [('Przychody', summary['INCOME']), ('Wydatki', summary['EXPENSE']), ('Bilans', balance)]
+    if previous:
+        for label, values in totals:
+            values.update(_change(values['current'], values['previous']))
+    return {
+        'start': start, 'end': end, 'previous_period': previous,
+        'rows': rows, 'totals': totals, 'missing_rates': sorted(converter.missing),
+    }
+
+
+def _change(current, previous):
+    return {
+        'change': current - previous,
+        'change_pct': (current - previous) / abs(previous) * 100 if previous else None,
+    }
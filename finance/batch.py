@@ -0,0 +1,150 @@
+"""
+Masowe dodawanie, edycja i usuwanie transakcji (formularz wielowierszowy, endpoint JSON, usuwanie zaznaczonych).
+
+Zapis po jednej transakcji to osobne zapytania, sygnał, aktualizacja rollupów i unieważnienie
+pulpitu dla każdego wiersza. Tutaj cała paczka idzie jednym bulk_create, jednym bulk_update
+i jednym DELETE w jednej transakcji bazy, a delty rollupów liczymy dla całej paczki
+i wysyłamy jednym sygnałem transactions_changed (jak import wyciągów).
+"""
+from django.db import connections, router, transaction
+from django.forms.models import model_to_dict
+
+from finance import categories, rollups
+from finance.forms import BATCH_MAX_ROWS, TransactionRowForm
+from finance.models import Transaction
+from finance.signals import transactions_changed
+
+FIELDS = ['category', 'amount', 'currency', 'date', 'description']
+# Limit parametrów zapytania w starszych SQLite to 999
+DELETE_CHUNK = 900
+
+
+class BatchError(Exception):
+    """Paczka odrzucona w całości; errors w układzie {'create': {nr wiersza: błędy}, 'update': ..., 'delete': ...}"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def save(user, created=(), updated=(), deleted_ids=()):
+    """
+    Zapisuje paczkę zmian jednego użytkownika - wszystko albo nic.
+    created - nowe obiekty Transaction, updated - pary (zmieniony obiekt, stan sprzed zmiany:
+    słownik z kluczami category/amount/currency/date), deleted_ids - identyfikatory do usunięcia.
+    Zwraca (utworzone obiekty z nadanymi id, liczba zmienionych, liczba usuniętych).
+    """
+    created, updated = list(created), list(updated)
+    deltas = rollups.new_deltas()
+    for obj in created:
+        obj.user = user
+        rollups.add_delta(deltas, user.pk, obj.category_id, obj.date, obj.amount, obj.currency)
+    for obj, previous in updated:
+        rollups.add_delta(deltas, user.pk, previous['category'], previous['date'], previous['amount'],
+                          previous['currency'], count=-1)
+        rollups.add_delta(deltas, user.pk, obj.category_id, obj.date, obj.amount, obj.currency)
+
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(created)
+        Transaction.objects.bulk_update([obj for obj, previous in updated], FIELDS)
+        deleted = _delete(Transaction.objects.filter(user=user, pk__in=list(deleted_ids)), deltas)
+        transactions_changed.send(sender=Transaction, deltas=deltas)
+    return created, len(updated), deleted
+
+
+def save_formset(formset, user):
+    """Zapis poprawnego formsetu z forms.transaction_formset (wiersze oznaczone do usunięcia są usuwane)"""
+    previous = {form.instance.pk: form.initial for form in formset.initial_forms}
+    formset.save(commit=False)
+    return save(
+        user,
+        created=formset.new_objects,
+        updated=[(obj, previous[obj.pk]) for obj, changed in formset.changed_objects],
+        deleted_ids=[obj.pk for obj in formset.deleted_objects],
+    )
+
+
+def apply(user, create=(), update=(), delete=()):
+    """
+    Paczka zmian z API: create - słowniki pól, update - słowniki z kluczem id i polami do zmiany
+    (pozostałe zostają jak były), delete - identyfikatory. Każdy wiersz walidowany tym samym
+    formularzem co w formsecie; jeden błąd odrzuca całą paczkę (BatchError).
+    """
+    if len(create) + len(update) + len(delete) > BATCH_MAX_ROWS:
+        raise BatchError({'__all__': [f"Najwyżej {BATCH_MAX_ROWS} wierszy w jednej paczce."]})
+    errors = {}
+    registry = categories.registry()
+
+    ids = [row.get('id') if isinstance(row, dict) else None for row in update]
+    wrong = {index: ["Nieprawidłowy identyfikator."] for index, pk in enumerate(ids) if not _is_id(pk)}
+    existing = Transaction.objects.filter(user=user).in_bulk([pk for pk in ids if _is_id(pk)])
+    wrong.update({index: ["Nie ma takiej transakcji."] for index, pk in enumerate(ids)
+                  if index not in wrong and pk not in existing})
+    missing = [pk for pk in delete if not _is_id(pk)]
+    if not missing:
+        found = set(Transaction.objects.filter(user=user, pk__in=delete).values_list('pk', flat=True))
+        missing = [pk for pk in delete if pk not in found]
+    if missing:
+        errors['delete'] = [f"Nie ma takiej transakcji: {pk}" for pk in missing]
+
+    created, create_errors = [], {}
+    for index, row in enumerate(create):
+        form = TransactionRowForm(row if isinstance(row, dict) else {}, registry=registry)
+        if form.is_valid():
+            created.append(form.save(commit=False))
+        else:
+            create_errors[index] = form.errors
+    if create_errors:
+        errors['create'] = create_errors
+
+    updated, update_errors = [], dict(wrong)
+    for index, row in enumerate(update):
+        if index in wrong:
+            continue
+        obj = existing[row['id']]
+        initial = model_to_dict(obj, fields=FIELDS)
+        form = TransactionRowForm({**initial, **row}, instance=obj, registry=registry)
+        if form.is_valid():
+            updated.append((form.save(commit=False), initial))
+        else:
+            update_errors[index] = form.errors
+    if update_errors:
+        errors['update'] = update_errors
+
+    if errors:
+        raise BatchError(errors)
+    return save(user, created, updated, delete)
+
+
+def delete(queryset):
+    """Usuwa transakcje z querysetu (np. wynik filtrów wyszukiwarki) jedną operacją; zwraca ich liczbę"""
+    deltas = rollups.new_deltas()
+    with transaction.atomic():
+        deleted = _delete(queryset, deltas)
+        transactions_changed.send(sender=Transaction, deltas=deltas)
+    return deleted
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _delete(queryset, deltas):
+    """
+    Usuwa wiersze surowym DELETE ... WHERE id IN (...) i dopisuje ich delty do deltas.
+    QuerySet.delete() wczytałby każdy obiekt i wysłał dla niego post_delete - czyli
+    osobną aktualizację rollupów na każdy usunięty wiersz.
+    """
+    rows = list(queryset.order_by().values_list('id', 'user_id', 'category_id', 'date', 'amount', 'currency'))
+    if not rows:
+        return 0
+    for pk, user_id, category_id, date, amount, currency in rows:
+        rollups.add_delta(deltas, user_id, category_id, date, amount, currency, count=-1)
+
+    connection = connections[router.db_for_write(Transaction)]
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), DELETE_CHUNK):
+            chunk = [row[0] for row in rows[start:start + DELETE_CHUNK]]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+    return len(rows)
@@ -0,0 +1,93 @@
+"""
+Stan budżetów: wydatki vs limit per (użytkownik, kategoria, miesiąc).
+
+Wydatki bierzemy z MonthlyRollup - to licznik utrzymywany przy każdym zapisie
+transakcji - więc stan wszystkich limitów to dwa zapytania (limity i ich rollupy),
+a sprawdzenie limitu po zapisie transakcji to wyszukiwania po indeksach unikalnych.
+Limity są w walucie raportów; wydatki w innych walutach przelicza finance/currency.py.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+
+from finance import currency
+from finance.models import BudgetLimit, MonthlyRollup
+from finance.rollups import CENT, month_start
+
+
+def _spent_rows(limits):
+    """Rollupy (wszystkie waluty) dla par (kategoria, miesiąc) z limitów"""
+    if not limits:
+        return MonthlyRollup.objects.none()
+    # Kategorie x miesiące - nadmiarowe pary attach_spent pominie, a parametrów jest tyle, ile kategorii i miesięcy
+    return (MonthlyRollup.objects
+            .filter(user_id=limits[0].user_id, category_id__in={limit.category_id for limit in limits},
+                    month__in={limit.month for limit in limits})
+            .values_list('category_id', 'month', 'currency', 'total'))
+
+
+def attach_spent(limits, rows, converter):
+    """Ustawia limitom atrybut spent - suma wydatków z rollupów, przeliczona na walutę raportów"""
+    spent = {}
+    for category_id, month, code, total in rows:
+        spent[category_id, month] = spent.get((category_id, month), 0) + converter.month(total, code, month)
+    for limit in limits:
+        limit.spent = Decimal(spent.get((limit.category_id, limit.month), 0)).quantize(CENT)
+    return limits
+
+
+class BudgetStatus:
+    def __init__(self, limit):
+        self.limit = limit
+        self.spent = limit.spent
+        self.ratio = float(limit.spent / limit.limit_amount) if limit.limit_amount else 0.0
+
+    @property
+    def remaining(self):
+        return self.limit.limit_amount - self.spent
+
+    @property
+    def level(self):
+        """'ok', 'warning' (blisko limitu) albo 'over' (limit przekroczony)"""
+        if self.spent > self.limit.limit_amount:
+            return 'over'
+        if self.ratio >= settings.FINANCE_BUDGET_WARNING_RATIO:
+            return 'warning'
+        return 'ok'
+
+    @property
+    def percent(self):
+        return min(round(self.ratio * 100), 100)
+
+
+def _status_query(user, month):
+    limits = BudgetLimit.objects.filter(user=user)
+    if month is not None:
+        limits = limits.filter(month=month_start(month))
+    return limits.select_related('category').order_by('-month', 'category__name')
+
+
+def statuses(user, month=None):
+    limits = list(_status_query(user, month))
+    attach_spent(limits, _spent_rows(limits), currency.converter())
+    return [BudgetStatus(limit) for limit in limits]
+
+
+async def astatuses(user, month=None):
+    limits = [limit async for limit in _status_query(user, month)]
+    rows = [row async for row in _spent_rows(limits)]
+    attach_spent(limits, rows, await currency.aconverter())
+    return [BudgetStatus(limit) for limit in limits]
+
+
+def check_transaction(transaction):
+    """Stan limitu, którego dotyczy transakcja (albo None, gdy kategoria nie ma limitu w tym miesiącu)"""
+    if transaction.category_id is None:
+        return None
+    limit = BudgetLimit.objects.select_related('category').filter(
+        user_id=transaction.user_id, category_id=transaction.category_id, month=month_start(transaction.date),
+    ).first()
+    if limit is None:
+        return None
+    attach_spent([limit], _spent_rows([limit]), currency.converter())
+    return BudgetStatus(limit)
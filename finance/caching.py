@@ -0,0 +1,103 @@
+"""
+Cache pulpitu per użytkownik z unieważnianiem przez wersjonowane klucze.
+
+Każdy użytkownik ma "wersję danych" (znacznik czasu ostatniej zmiany jego transakcji
+lub limitów), a kategorie i kursy walut - wspólne wersje globalne. Klucz cache zawiera wszystkie,
+więc zapis nie musi niczego kasować: wystarczy podbić wersję, a stare wpisy same
+wygasną. Ten sam znacznik czasu służy jako Last-Modified dla warunkowego GET.
+
+Przy wielu procesach (gunicorn/uvicorn workers) cache musi być współdzielony
+(FileBasedCache, Redis) - patrz CACHES w core/settings.py.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+PREFIX = 'finance:'
+DASHBOARD_TIMEOUT = 3600
+VERSION_TIMEOUT = None  # wersje nie wygasają - ich utrata oznaczałaby tylko chybienie cache
+
+CATEGORY_VERSION_KEY = PREFIX + 'version:categories'
+RATE_VERSION_KEY = PREFIX + 'version:rates'
+STATS_KEYS = {'hits': PREFIX + 'stats:dashboard:hits', 'misses': PREFIX + 'stats:dashboard:misses'}
+
+
+def _user_version_key(user_id):
+    return f'{PREFIX}version:user:{user_id}'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        # add - jeśli inny proces zdążył ustawić wersję, bierzemy jego wartość
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def user_version(user_id):
+    return _version(_user_version_key(user_id))
+
+
+def category_version():
+    return _version(CATEGORY_VERSION_KEY)
+
+
+def rate_version():
+    return _version(RATE_VERSION_KEY)
+
+
+def bump_users(user_ids):
+    now = time.time()
+    cache.set_many({_user_version_key(user_id): now for user_id in user_ids}, VERSION_TIMEOUT)
+
+
+def bump_categories():
+    cache.set(CATEGORY_VERSION_KEY, time.time(), VERSION_TIMEOUT)
+
+
+def bump_rates():
+    cache.set(RATE_VERSION_KEY, time.time(), VERSION_TIMEOUT)
+
+
+def data_version(user_id):
+    """(wersja użytkownika, kategorii, kursów) - zmienia się przy każdym zapisie wpływającym na pulpit"""
+    return user_version(user_id), category_version(), rate_version()
+
+
+def last_modified(user_id):
+    return max(data_version(user_id))
+
+
+def dashboard_key(user_id, *variant):
+    """Klucz kontekstu pulpitu; variant to pozostałe wejścia widoku (tryb wykresów, bieżący miesiąc...)"""
+    versions = data_version(user_id)
+    digest = hashlib.md5(repr((versions, variant)).encode()).hexdigest()
+    return f'{PREFIX}dashboard:{user_id}:{digest}'
+
+
+def get_dashboard(key):
+    context = cache.get(key)
+    _count('misses' if context is None else 'hits')
+    return context
+
+
+def set_dashboard(key, context):
+    cache.set(key, context, DASHBOARD_TIMEOUT)
+
+
+def _count(name):
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Licznika jeszcze nie ma (albo wypadł z cache)
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    values = cache.get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
@@ -0,0 +1,100 @@
+"""
+Rejestr kategorii w pamięci procesu.
+
+Kategorie zmieniają się rzadko, a czytane są ciągle: formularze (lista wyboru), wiersze
+transakcji, wykresy i analizy. Rejestr trzyma wszystkie kategorie jednego procesu i jest
+ważny tak długo, jak wersja kategorii w cache (caching.category_version) - tę wersję podbijają
+sygnały zapisu i usunięcia kategorii, więc zmiana w jednym procesie unieważnia rejestry
+we wszystkich. Sprawdzenie aktualności to jeden odczyt z cache, przeładowanie - jedno zapytanie.
+
+Obiekty Category z rejestru są współdzielone między żądaniami - tylko do odczytu.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.utils.html import format_html
+
+from finance import caching
+from finance.models import Category
+
+_registry = None
+_lock = threading.Lock()
+
+
+class Registry:
+    def __init__(self, version, categories):
+        self.version = version
+        self._all = list(categories)
+        self._by_id = {category.pk: category for category in self._all}
+        self._options = {}
+
+    def __iter__(self):
+        return iter(self._all)
+
+    def __len__(self):
+        return len(self._all)
+
+    def get(self, pk):
+        return self._by_id.get(pk)
+
+    def all(self):
+        return list(self._all)
+
+    def of_type(self, type):
+        return [category for category in self._all if category.type == type]
+
+    def ids_of_type(self, type):
+        return [category.pk for category in self._all if category.type == type]
+
+    def name(self, pk, default=''):
+        category = self._by_id.get(pk)
+        return category.name if category else default
+
+    def attach(self, objects):
+        """
+        Podstawia kategorię z rejestru obiektom z category_id (transakcje, limity...) -
+        zamiast JOIN-a albo zapytania na wiersz przy pierwszym odwołaniu do .category
+        """
+        for obj in objects:
+            category = self._by_id.get(obj.category_id)
+            # Kategorii spoza rejestru (dodanej przed chwilą w innym procesie) nie podstawiamy - Django ją doczyta
+            if category is not None:
+                obj.category = category
+        return objects
+
+    def options(self, type=None, empty_label=None):
+        """
+        Gotowe fragmenty <option> listy wyboru: (wartość, html, html zaznaczonej opcji).
+        Liczone raz na wersję rejestru - widżet CategorySelect tylko je skleja.
+        """
+        key = (type, empty_label)
+        options = self._options.get(key)
+        if options is None:
+            options = []
+            if empty_label is not None:
+                options.append(('', format_html('<option value="">{}</option>', empty_label),
+                                format_html('<option value="" selected>{}</option>', empty_label)))
+            for category in self.of_type(type) if type else self._all:
+                options.append((str(category.pk),
+                                format_html('<option value="{}">{}</option>', category.pk, category),
+                                format_html('<option value="{}" selected>{}</option>', category.pk, category)))
+            self._options[key] = options
+        return options
+
+
+def registry():
+    """Aktualny rejestr kategorii (przeładowany, jeśli kategorie zmieniły się od ostatniego użycia)"""
+    global _registry
+    version = caching.category_version()
+    current = _registry
+    if current is None or current.version != version:
+        with _lock:
+            current = _registry
+            if current is None or current.version != version:
+                # Wersję odczytujemy przed zapytaniem - zmiana w trakcie ładowania podbije ją ponownie
+                current = _registry = Registry(version, Category.objects.order_by('id'))
+    return current
+
+
+async def aregistry():
+    return await sync_to_async(registry)()
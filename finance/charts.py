@@ -0,0 +1,249 @@
+"""
+Renderowanie wykresów poza widokami HTML.
+
+Widok opisuje wykres jako "specyfikację" (słownik z danymi serii), a w szablonie
+wstawia tylko adres /charts/<klucz>.png. Klucz to skrót SHA-256 specyfikacji,
+więc ten sam zestaw danych zawsze daje ten sam adres: przeglądarka trzyma obrazek
+w cache (ETag + immutable), a serwer renderuje go najwyżej raz.
+
+Używamy obiektowego API matplotlib (Figure) zamiast pyplot - bez globalnego
+stanu i przełączania backendu, więc renderowanie jest bezpieczne wątkowo.
+matplotlib importujemy przy pierwszym rysowaniu, nie przy imporcie modułu: specyfikacje,
+klucze i cache PNG nie potrzebują go wcale, a proces, który nigdy nie rysuje (większość
+procesów serwera - rysuje pula z finance/rendering.py), nie płaci za jego start i pamięć.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from finance import profiling
+
+SPEC_CACHE_PREFIX = 'finance:chart-spec:'
+SPEC_TIMEOUT = 7 * 24 * 3600
+
+
+class PngCache:
+    """Bufor LRU gotowych obrazków PNG ograniczony łącznym rozmiarem w bajtach"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+            return png
+
+    def set(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+png_cache = PngCache(getattr(settings, 'FINANCE_CHART_CACHE_BYTES', 32 * 1024 * 1024))
+
+# Liczniki dla diagnostyki: ile razy obrazek był w cache, a ile trzeba było go narysować
+stats = {'hits': 0, 'misses': 0, 'renders': 0}
+
+
+def chart_key(spec):
+    payload = json.dumps(spec, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def register(spec):
+    """Zapamiętuje specyfikację wykresu (współdzielony cache Django) i zwraca jej klucz"""
+    key = chart_key(spec)
+    # Zawsze set, także gdy PNG jest w buforze tego procesu: każde wyświetlenie strony przedłuża
+    # ważność specyfikacji, a inny proces bez tego PNG musi umieć go narysować
+    cache.set(SPEC_CACHE_PREFIX + key, spec, SPEC_TIMEOUT)
+    return key
+
+
+def get_png(key, render=None):
+    """
+    Zwraca PNG dla klucza - z bufora albo renderując ze specyfikacji. None jeśli klucz nieznany.
+    render(spec) pozwala narysować wykres poza bieżącym procesem (finance/rendering.py).
+    """
+    png = png_cache.get(key)
+    if png is not None:
+        stats['hits'] += 1
+        return png
+
+    spec = cache.get(SPEC_CACHE_PREFIX + key)
+    if spec is None:
+        return None
+    stats['misses'] += 1
+    with profiling.span('chart'):
+        png = (render or render_png)(spec)
+    stats['renders'] += 1
+    png_cache.set(key, png)
+    return png
+
+
+async def aget_png(key, render):
+    """get_png dla widoków asynchronicznych; render to korutyna (np. rendering.arender)"""
+    png = png_cache.get(key)
+    if png is not None:
+        stats['hits'] += 1
+        return png
+
+    spec = await cache.aget(SPEC_CACHE_PREFIX + key)
+    if spec is None:
+        return None
+    stats['misses'] += 1
+    with profiling.span('chart'):
+        png = await render(spec)
+    stats['renders'] += 1
+    png_cache.set(key, png)
+    return png
+
+
+# --- Specyfikacje wykresów ---
+
+def balance_spec(total_income, total_expense):
+    return {'kind': 'balance', 'income': str(total_income), 'expense': str(total_expense),
+            'currency': settings.FINANCE_REPORTING_CURRENCY}
+
+
+def pie_spec(labels, sizes):
+    return {'kind': 'pie', 'labels': list(labels), 'sizes': [str(size) for size in sizes]}
+
+
+def monthly_spec(months, incomes, expenses):
+    return {'kind': 'monthly', 'months': list(months),
+            'incomes': [str(value) for value in incomes], 'expenses': [str(value) for value in expenses],
+            'currency': settings.FINANCE_REPORTING_CURRENCY}
+
+
+def trend_spec(months, expenses, rolling, forecast_months, forecast):
+    """Wydatki miesięczne ze średnią kroczącą i prognozą (finance/analytics.py)"""
+    return {'kind': 'trend', 'months': list(months), 'expenses': list(expenses), 'rolling': list(rolling),
+            'forecast_months': list(forecast_months), 'forecast': list(forecast),
+            'currency': settings.FINANCE_REPORTING_CURRENCY}
+
+
+# --- Renderowanie ---
+
+def render_png(spec):
+    renderer = RENDERERS[spec['kind']]
+    fig = renderer(spec)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def _figure(**kwargs):
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+
+def _currency(spec):
+    # Specyfikacje zapisane w cache przed wprowadzeniem walut nie mają tego pola
+    return spec.get('currency', 'PLN')
+
+
+def _render_balance(spec):
+    # Figura o niestandardowym rozmiarze (szeroka i niska)
+    fig = _figure(figsize=(8, 3))
+    ax = fig.subplots()
+
+    categories = ['Przychody', 'Wydatki']
+    values = [float(spec['income']), float(spec['expense'])]
+    colors = ['#198754', '#dc3545']  # Kolory Bootstrap: Success (zielony) i Danger (czerwony)
+
+    bars = ax.bar(categories, values, color=colors, width=0.4)
+    # Wartości nad słupkami dla czytelności
+    ax.bar_label(bars, fmt=f"%.2f {_currency(spec)}", padding=3)
+    ax.set_title('Ogólny Bilans Finansowy')
+
+    # Bez górnej i prawej ramki - czystszy wygląd
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+    fig.tight_layout()
+    return fig
+
+
+def _render_pie(spec):
+    fig = _figure(figsize=(6, 6))
+    ax = fig.subplots()
+    ax.pie([float(size) for size in spec['sizes']], labels=spec['labels'], autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')  # Zapewnia, że wykres jest kołem
+    ax.set_title('Procentowy udział wydatków')
+    return fig
+
+
+def _render_monthly(spec):
+    months = spec['months']
+    x = range(len(months))
+    width = 0.35
+
+    fig = _figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.bar([i - width / 2 for i in x], [float(v) for v in spec['incomes']], width, label='Przychody', color='green')
+    ax.bar([i + width / 2 for i in x], [float(v) for v in spec['expenses']], width, label='Wydatki', color='red')
+
+    ax.set_ylabel(f"Kwota ({_currency(spec)})")
+    ax.set_title('Bilans miesięczny')
+    ax.set_xticks(x)
+    ax.set_xticklabels(months, rotation=45)
+    ax.legend()
+
+    fig.tight_layout()
+    return fig
+
+
+def _render_trend(spec):
+    months = spec['months'] + spec['forecast_months']
+    known = len(spec['months'])
+    x = range(len(months))
+
+    fig = _figure(figsize=(10, 5))
+    ax = fig.subplots()
+    ax.bar(x[:known], spec['expenses'], color='#dc3545', alpha=0.6, label='Wydatki')
+    # None (brak pełnego okna) -> NaN, matplotlib pomija te punkty
+    ax.plot(x[:known], [float('nan') if v is None else v for v in spec['rolling']],
+            color='black', label='Średnia krocząca')
+    ax.plot(x[known - 1:] if known else x, ([spec['expenses'][-1]] if known else []) + spec['forecast'],
+            color='#0d6efd', linestyle='--', marker='o', label='Prognoza')
+
+    ax.set_ylabel(f"Kwota ({_currency(spec)})")
+    ax.set_title('Trend wydatków')
+    # Przy długiej historii co n-ta etykieta, żeby się nie nakładały
+    step = max(1, len(months) // 24)
+    ax.set_xticks(list(x)[::step])
+    ax.set_xticklabels(months[::step], rotation=45)
+    ax.legend()
+
+    fig.tight_layout()
+    return fig
+
+
+RENDERERS = {
+    'balance': _render_balance,
+    'pie': _render_pie,
+    'monthly': _render_monthly,
+    'trend': _render_trend,
+}
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def currency(request):
+    """Waluta raportów dla szablonów (sumy, budżety, wykresy)"""
+    return {'reporting_currency': settings.FINANCE_REPORTING_CURRENCY}
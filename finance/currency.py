@@ -0,0 +1,137 @@
+"""
+Przeliczanie kwot na walutę raportów (FINANCE_REPORTING_CURRENCY) po kursach z ExchangeRate.
+
+Wszystkie kursy jednego procesu trzyma tabela RateTable, ważna tak długo, jak wersja kursów
+w cache (caching.rate_version) - podbija ją "manage.py load_rates", więc poprawione kursy
+widzą od razu wszystkie procesy, a wersja kursów jest częścią klucza cache pulpitu.
+
+Przeliczamy zgrupowane sumy, nie pojedyncze transakcje: suma rollupu w walucie X z miesiąca M
+razy średni kurs X w M (podzielony przez średni kurs waluty raportów w M, gdy ta nie jest walutą
+bazową). Kursy dzienne, średnie z miesięcy i okresów są zapamiętywane w tabeli, więc pulpit
+z historią wielu lat to kilkaset mnożeń, a rollupy po korekcie kursów nie wymagają przeliczania.
+
+Dzień bez notowania (weekend, święto) bierze ostatni wcześniejszy kurs, okres bez notowań -
+kurs z jego ostatniego dnia. Waluty bez żadnego kursu nie da się przeliczyć: jej kwoty są
+pomijane w sumach i zgłaszane przez Converter.missing.
+"""
+import bisect
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from finance import caching
+from finance.models import DEFAULT_CURRENCY, ExchangeRate
+from finance.rollups import month_end
+
+ONE = Decimal('1')
+
+_table = None
+_lock = threading.Lock()
+
+
+class RateTable:
+    def __init__(self, version, rows):
+        self.version = version
+        dates, rates = defaultdict(list), defaultdict(list)
+        for currency, date, rate in rows:
+            dates[currency].append(date)
+            rates[currency].append(rate)
+        self._dates = dict(dates)
+        self._rates = dict(rates)
+        self._daily = {}
+        self._periods = {}
+
+    def currencies(self):
+        return {DEFAULT_CURRENCY, *self._dates}
+
+    def rate(self, currency, day):
+        """Kurs z dnia day (ostatnie notowanie nie późniejsze niż day); None, gdy waluta nie ma kursów"""
+        if currency == DEFAULT_CURRENCY:
+            return ONE
+        key = (currency, day)
+        if key not in self._daily:
+            dates = self._dates.get(currency)
+            # Dzień sprzed pierwszego notowania - bierzemy pierwsze
+            self._daily[key] = self._rates[currency][max(bisect.bisect_right(dates, day) - 1, 0)] if dates else None
+        return self._daily[key]
+
+    def average(self, currency, first, last):
+        """Średnia notowań z okresu [first, last]; None, gdy waluta nie ma kursów"""
+        if currency == DEFAULT_CURRENCY:
+            return ONE
+        key = (currency, first, last)
+        if key not in self._periods:
+            dates = self._dates.get(currency)
+            value = None
+            if dates:
+                rates = self._rates[currency][bisect.bisect_left(dates, first):bisect.bisect_right(dates, last)]
+                value = sum(rates) / len(rates) if rates else self.rate(currency, last)
+            self._periods[key] = value
+        return self._periods[key]
+
+    def factor(self, currency, first, last, target):
+        """Mnożnik przeliczający kwoty z okresu [first, last] z currency na target (None - brak kursu)"""
+        if currency == target:
+            return ONE
+        rate, target_rate = self.average(currency, first, last), self.average(target, first, last)
+        if rate is None or not target_rate:
+            return None
+        return rate / target_rate
+
+
+class Converter:
+    """Przelicza sumy na walutę raportów i zbiera waluty, których nie dało się przeliczyć"""
+
+    def __init__(self, table, target=None):
+        self.table = table
+        self.target = target or settings.FINANCE_REPORTING_CURRENCY
+        self.missing = set()
+
+    def period(self, amount, currency, first, last):
+        if currency == self.target:
+            return amount
+        factor = self.table.factor(currency, first, last, self.target)
+        if factor is None:
+            self.missing.add(currency)
+            return Decimal('0')
+        return amount * factor
+
+    def month(self, amount, currency, month):
+        """Suma z miesiąca (rollup) - po średnim kursie tego miesiąca"""
+        return self.period(amount, currency, month, month_end(month))
+
+    def month_factor(self, currency, month):
+        """Mnożnik dla sum z miesiąca jako float (obliczenia NumPy); 0 dla waluty bez kursów"""
+        if currency == self.target:
+            return 1.0
+        factor = self.table.factor(currency, month, month_end(month), self.target)
+        if factor is None:
+            self.missing.add(currency)
+            return 0.0
+        return float(factor)
+
+
+def table():
+    """Aktualna tabela kursów (przeładowana, jeśli kursy zmieniły się od ostatniego użycia)"""
+    global _table
+    version = caching.rate_version()
+    current = _table
+    if current is None or current.version != version:
+        with _lock:
+            current = _table
+            if current is None or current.version != version:
+                current = _table = RateTable(
+                    version, ExchangeRate.objects.order_by('currency', 'date').values_list('currency', 'date', 'rate'),
+                )
+    return current
+
+
+def converter(target=None):
+    return Converter(table(), target)
+
+
+async def aconverter(target=None):
+    return Converter(await sync_to_async(table)(), target)
@@ -0,0 +1,60 @@
+"""
+Produkcyjny profil SQLite (DB_PROFILE=production w core/settings.py).
+
+Przy każdym nowym połączeniu ustawiamy pragmy z FINANCE_SQLITE_PRAGMAS: WAL (czytelnicy
+nie blokują piszącego), synchronous=NORMAL (w trybie WAL bezpieczne przy awarii procesu,
+fsync tylko przy checkpoincie), busy_timeout (czekanie na blokadę zamiast natychmiastowego
+"database is locked"), mmap i większy cache stron.
+
+Transakcje zaczynamy od BEGIN IMMEDIATE: zwykłe BEGIN bierze blokadę zapisu dopiero przy
+pierwszym zapisie, a gdy dwie transakcje czytające chcą jednocześnie zacząć pisać, SQLite
+zwraca jednej z nich SQLITE_BUSY od razu, z pominięciem busy_timeout.
+
+ReadWriteRouter kieruje odczyty poza transakcjami na osobny alias (DB_READ_ALIAS=1) - ten sam
+plik, osobne połączenia tylko do odczytu - a zapisy i wszystko wewnątrz atomic() na 'default'.
+"""
+import types
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+READ_ALIAS = 'read'
+
+
+def _begin_immediate(self):
+    self.cursor().execute('BEGIN IMMEDIATE')
+
+
+def configure_connection(sender=None, connection=None, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.FINANCE_SQLITE_PRAGMAS)
+    if connection.alias == READ_ALIAS:
+        pragmas['query_only'] = 1
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    if settings.FINANCE_SQLITE_BEGIN_IMMEDIATE and connection.alias != READ_ALIAS:
+        connection._start_transaction_under_autocommit = types.MethodType(_begin_immediate, connection)
+
+
+def install():
+    connection_created.connect(configure_connection, dispatch_uid='finance_configure_connection')
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        # Wewnątrz transakcji czytamy tym samym połączeniem - inaczej nie widzielibyśmy własnych zapisów
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
@@ -0,0 +1,215 @@
+"""
+Strumieniowy eksport transakcji (CSV, JSON, XLSX, opcjonalnie gzip).
+
+Każdy format to generator kawałków bajtów dla StreamingHttpResponse: wiersze
+pobieramy przez .iterator(chunk_size=...), zamieniamy na tekst paczkami i od razu
+oddajemy. Pamięć nie zależy od liczby transakcji, a pierwsze bajty wychodzą
+zanim baza zwróci ostatni wiersz.
+"""
+import csv
+import datetime
+import io
+import json
+import zipfile
+import zlib
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from finance.models import Transaction
+
+CHUNK_SIZE = 2000
+COLUMNS = ['date', 'category', 'type', 'amount', 'currency', 'description']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_rows(user, date_from=None, date_to=None, categories=None):
+    """Krotki (data, kategoria, typ, kwota, waluta, opis) w kolejności chronologicznej, pobierane paczkami"""
+    transactions = Transaction.objects.filter(user=user)
+    if date_from:
+        transactions = transactions.filter(date__gte=date_from)
+    if date_to:
+        transactions = transactions.filter(date__lte=date_to)
+    if categories:
+        transactions = transactions.filter(category__in=categories)
+    return (transactions.order_by('date', 'id')
+            .values_list('date', 'category__name', 'category__type', 'amount', 'currency', 'description')
+            .iterator(chunk_size=CHUNK_SIZE))
+
+
+def _batches(rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, CHUNK_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+class _LineBuffer:
+    """Obiekt "plikopodobny" dla csv.writer - zbiera tekst do oddania jako jeden kawałek"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def pop(self):
+        data = ''.join(self.parts)
+        self.parts.clear()
+        return data.encode()
+
+
+def stream_csv(rows):
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield '\ufeff'.encode() + buffer.pop()  # BOM - Excel poprawnie rozpozna polskie znaki
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        yield buffer.pop()
+
+
+def stream_json(rows):
+    yield b'['
+    separator = ''
+    for batch in _batches(rows):
+        parts = []
+        for date, category, type, amount, currency, description in batch:
+            parts.append(separator + json.dumps({
+                'date': date.isoformat(), 'category': category, 'type': type,
+                'amount': str(amount), 'currency': currency, 'description': description,
+            }, ensure_ascii=False, separators=(',', ':')))
+            separator = ','
+        yield ''.join(parts).encode()
+    yield b']'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Strumień bez seek() - zipfile zapisuje wtedy rozmiary w deskryptorach za danymi"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Transakcje" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Styl nr 1 = wbudowany format daty (numFmtId 14), styl nr 2 = kwota z dwoma miejscami po przecinku
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+EXCEL_EPOCH = datetime.date(1899, 12, 30)
+
+
+def _text_cell(value):
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(value or "")}</t></is></c>'
+
+
+def stream_xlsx(rows):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                '<row>' + ''.join(_text_cell(column) for column in COLUMNS) + '</row>'
+            ).encode())
+            for batch in _batches(rows):
+                sheet.write(''.join(
+                    f'<row><c s="1"><v>{(date - EXCEL_EPOCH).days}</v></c>{_text_cell(category)}'
+                    f'{_text_cell(type)}<c s="2"><v>{amount}</v></c>{_text_cell(currency)}'
+                    f'{_text_cell(description)}</row>'
+                    for date, category, type, amount, currency, description in batch
+                ).encode())
+                yield sink.pop()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.pop()
+
+
+STREAMS = {
+    'csv': stream_csv,
+    'json': stream_json,
+    'xlsx': stream_xlsx,
+}
+
+
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = nagłówek gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(rows, format='csv', gzip=False):
+    chunks = STREAMS[format](rows)
+    return gzip_stream(chunks) if gzip else chunks
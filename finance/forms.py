@@ -1,14 +1,53 @@
 from django import forms
-from finance.models import Transaction, Category  # <--- Dodałem kropkę przed models
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from finance.categories import registry as category_registry
+from finance.models import Transaction, Category, BudgetLimit, ImportJob, ImportRule, RecurringRule  # <--- Dodałem kropkę przed models
+from finance.models import CURRENCY_CHOICES, DEFAULT_CURRENCY
 
-class TransactionForm(forms.ModelForm):
+
+class CategoryRegistryMixin:
+    """
+    Pole category z rejestru kategorii (finance/categories.py) zamiast ModelChoiceField,
+    który przy każdym renderowaniu pyta bazę o wszystkie kategorie, a przy walidacji o wybraną
+    """
+    category_type = None  # np. 'EXPENSE' - tylko kategorie wydatków
+    category_attrs = None
+
+    def __init__(self, *args, registry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields['category']
+        self.fields['category'] = CategoryChoiceField(
+            type=self.category_type, registry=registry, attrs=self.category_attrs,
+            required=field.required, label=field.label, help_text=field.help_text,
+        )
+
+    def _get_validation_exclusions(self):
+        # Kategoria jest już sprawdzona z rejestrem - bez tego model sprawdzałby
+        # istnienie klucza obcego osobnym zapytaniem (w formsecie: na każdy wiersz)
+        exclude = super()._get_validation_exclusions()
+        exclude.add('category')
+        return exclude
+
+
+class TransactionForm(CategoryRegistryMixin, forms.ModelForm):
     class Meta:
         model = Transaction
-        fields = ['category', 'amount', 'date', 'description']
+        fields = ['category', 'amount', 'currency', 'date', 'description']
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Wiersze z API i starsze formularze bez waluty - waluta bazowa
+        self.fields['currency'].required = False
+
+    def clean_currency(self):
+        return self.cleaned_data['currency'] or DEFAULT_CURRENCY
+
 # Upewnij się, że ta linia jest "przyklejona" do lewej krawędzi (bez spacji przed 'class')
 class CategoryForm(forms.ModelForm):
     class Meta:
@@ -17,4 +56,242 @@ class CategoryForm(forms.ModelForm):
         labels = {
             'name': 'Nazwa kategorii',
             'type': 'Rodzaj (Wpływ/Wydatek)'
-        }
\ No newline at end of file
+        }
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(label="Plik wyciągu")
+    format = forms.ChoiceField(choices=ImportJob.FORMAT_CHOICES, label="Format")
+    encoding = forms.ChoiceField(choices=[('utf-8-sig', 'UTF-8'), ('cp1250', 'Windows-1250')],
+                                 label="Kodowanie znaków")
+    delimiter = forms.ChoiceField(choices=[(',', 'Przecinek'), (';', 'Średnik'), ('\t', 'Tabulator')],
+                                  label="Separator kolumn (CSV)")
+    date_format = forms.ChoiceField(choices=[('%Y-%m-%d', 'RRRR-MM-DD'), ('%d.%m.%Y', 'DD.MM.RRRR'),
+                                             ('%d-%m-%Y', 'DD-MM-RRRR')], label="Format daty (CSV)")
+    currency = forms.ChoiceField(choices=CURRENCY_CHOICES, initial=DEFAULT_CURRENCY, label="Waluta rachunku")
+
+
+class ImportRuleForm(CategoryRegistryMixin, forms.ModelForm):
+    class Meta:
+        model = ImportRule
+        fields = ['pattern', 'category', 'priority']
+
+
+class ExportForm(forms.Form):
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('xlsx', 'Excel (XLSX)'), ('json', 'JSON')],
+                               initial='csv', label="Format")
+    date_from = forms.DateField(required=False, label="Od dnia", widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label="Do dnia", widget=forms.DateInput(attrs={'type': 'date'}))
+    categories = forms.MultipleChoiceField(required=False, label="Kategorie",
+                                           help_text="Brak zaznaczenia = wszystkie kategorie")
+    gzip = forms.BooleanField(required=False, label="Spakuj (gzip)")
+
+    def __init__(self, *args, registry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Lista kategorii z rejestru zamiast ModelMultipleChoiceField (zapytanie przy każdym renderowaniu)
+        field = self.fields['categories']
+        self.fields['categories'] = CategoryMultipleChoiceField(
+            registry=registry, required=field.required, label=field.label, help_text=field.help_text,
+        )
+
+
+class TransactionFilterForm(CategoryRegistryMixin, forms.Form):
+    """Filtry listy transakcji - te same parametry GET dla strony HTML i endpointu JSON"""
+    q = forms.CharField(required=False, max_length=200, label="Szukaj w opisie")
+    date_from = forms.DateField(required=False, label="Od dnia", widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label="Do dnia", widget=forms.DateInput(attrs={'type': 'date'}))
+    # Lista kategorii z rejestru - pole podmienia CategoryRegistryMixin
+    category = forms.ModelChoiceField(queryset=Category.objects.none(), required=False, label="Kategoria")
+    type = forms.ChoiceField(choices=[('', 'Wszystkie')] + list(Category.TYPE_CHOICES), required=False,
+                             label="Rodzaj")
+    amount_min = forms.DecimalField(required=False, min_value=0, decimal_places=2, label="Kwota od")
+    amount_max = forms.DecimalField(required=False, min_value=0, decimal_places=2, label="Kwota do")
+
+
+class ReportForm(forms.Form):
+    """Okres raportu i okres porównawczy (finance/balances.py)"""
+    COMPARE_CHOICES = [
+        ('previous', 'Poprzedni okres'),
+        ('year', 'Ten sam okres rok wcześniej'),
+        ('', 'Bez porównania'),
+    ]
+    date_from = forms.DateField(label="Od dnia", widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    date_to = forms.DateField(label="Do dnia", widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    compare = forms.ChoiceField(choices=COMPARE_CHOICES, required=False, label="Porównaj z")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            self.add_error('date_to', "Koniec okresu nie może być wcześniejszy niż początek.")
+        return cleaned_data
+
+
+# Maksymalna liczba wierszy jednego zapisu masowego (formularz i endpoint JSON)
+BATCH_MAX_ROWS = 500
+
+
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField nad listą obiektów wczytaną wcześniej (np. raz dla wszystkich wierszy formsetu).
+    Ani renderowanie opcji, ani walidacja nie wykonują zapytań.
+    """
+
+    def __init__(self, model, objects, **kwargs):
+        super().__init__(queryset=model.objects.none(), **kwargs)
+        objects = list(objects)
+        self.objects = {str(obj.pk): obj for obj in objects}
+        self.choices = ([('', self.empty_label)] if self.empty_label is not None else []) + [
+            (obj.pk, self.label_from_instance(obj)) for obj in objects
+        ]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            return self.objects[str(value)]
+        except KeyError:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                        params={'value': value})
+
+
+class CategorySelect(forms.Select):
+    """
+    Lista wyboru sklejana z gotowych fragmentów <option> (Registry.options) zamiast renderowania
+    szablonu dla każdej opcji - przy formsecie na setki wierszy to większość czasu odpowiedzi
+    """
+
+    def __init__(self, options=(), attrs=None):
+        super().__init__(attrs)
+        self.options = options
+
+    def render(self, name, value, attrs=None, renderer=None):
+        selected = set(self.format_value(value))
+        html = ''.join(chosen if option_value in selected else plain for option_value, plain, chosen in self.options)
+        return format_html('<select name="{}"{}>{}</select>', name, flatatt(self.build_attrs(self.attrs, attrs)),
+                           mark_safe(html))
+
+
+class CategoryChoiceField(PreloadedModelChoiceField):
+    """Wybór kategorii z rejestru kategorii - bez zapytań przy renderowaniu i walidacji"""
+
+    def __init__(self, type=None, registry=None, attrs=None, **kwargs):
+        if registry is None:
+            registry = category_registry()
+        super().__init__(Category, registry.of_type(type) if type else registry.all(), **kwargs)
+        widget = CategorySelect(registry.options(type, self.empty_label), attrs)
+        widget.choices = self.choices
+        widget.is_required = self.required
+        self.widget = widget
+
+
+class CategoryMultipleChoiceField(forms.MultipleChoiceField):
+    """Wybór wielu kategorii z rejestru kategorii - bez zapytań; cleaned_data to lista obiektów Category"""
+
+    def __init__(self, registry=None, **kwargs):
+        if registry is None:
+            registry = category_registry()
+        categories = registry.all()
+        self.objects = {str(category.pk): category for category in categories}
+        super().__init__(choices=[(category.pk, str(category)) for category in categories], **kwargs)
+
+    def clean(self, value):
+        # MultipleChoiceField sprawdza już, że każda wartość jest jedną z opcji
+        return [self.objects[pk] for pk in super().clean(value)]
+
+
+class TransactionRowForm(TransactionForm):
+    """Wiersz masowego dodawania/edycji - rejestr kategorii dostaje od formsetu (jeden dla wszystkich wierszy)"""
+    category_attrs = {'class': 'form-select form-select-sm'}
+
+    class Meta(TransactionForm.Meta):
+        widgets = {
+            'amount': forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': '0.01'}),
+            'currency': forms.Select(attrs={'class': 'form-select form-select-sm'}),
+            'date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}, format='%Y-%m-%d'),
+            'description': forms.TextInput(attrs={'class': 'form-control form-control-sm'}),
+        }
+
+
+class BaseTransactionFormSet(forms.BaseModelFormSet):
+    """
+    Formset masowej edycji: kategorie z rejestru (jeden dla wszystkich wierszy), edytowane
+    transakcje jednym zapytaniem (queryset formsetu) - liczba zapytań nie rośnie z liczbą wierszy
+    """
+
+    def __init__(self, *args, registry=None, **kwargs):
+        self.registry = category_registry() if registry is None else registry
+        super().__init__(*args, **kwargs)
+
+    def get_form_kwargs(self, index):
+        return {**super().get_form_kwargs(index), 'registry': self.registry}
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Domyślne ukryte pole id to ModelChoiceField, który przy walidacji pyta bazę o każdy wiersz
+        name = self._pk_field.name
+        field = form.fields[name]
+        form.fields[name] = PreloadedModelChoiceField(Transaction, self.get_queryset(), required=False,
+                                                      initial=field.initial, widget=field.widget)
+
+
+def transaction_formset(extra=0):
+    return forms.modelformset_factory(
+        Transaction, form=TransactionRowForm, formset=BaseTransactionFormSet, extra=extra, can_delete=True,
+        max_num=BATCH_MAX_ROWS, absolute_max=BATCH_MAX_ROWS, validate_max=True,
+    )
+
+
+class RecurringRuleForm(CategoryRegistryMixin, forms.ModelForm):
+    class Meta:
+        model = RecurringRule
+        fields = ['category', 'amount', 'currency', 'description', 'cadence', 'start_date', 'end_date']
+        widgets = {
+            'start_date': forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+            'end_date': forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', "Ostatni termin nie może być wcześniejszy niż pierwszy.")
+        return cleaned_data
+
+
+class BudgetLimitForm(CategoryRegistryMixin, forms.ModelForm):
+    category_type = 'EXPENSE'
+
+    class Meta:
+        model = BudgetLimit
+        fields = ['category', 'month', 'limit_amount']
+        labels = {
+            'category': 'Kategoria wydatków',
+            'month': 'Miesiąc',
+        }
+        widgets = {
+            'month': forms.DateInput(attrs={'type': 'date'}),
+        }
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        # Limity i wydatki w budżetach są w walucie raportów
+        self.fields['limit_amount'].label = f"Limit ({settings.FINANCE_REPORTING_CURRENCY})"
+
+    def clean_month(self):
+        # Limit dotyczy całego miesiąca - zawsze zapisujemy jego pierwszy dzień
+        return self.cleaned_data['month'].replace(day=1)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        category, month = cleaned_data.get('category'), cleaned_data.get('month')
+        if category and month:
+            duplicate = BudgetLimit.objects.filter(user=self.user, category=category, month=month)
+            if self.instance.pk:
+                duplicate = duplicate.exclude(pk=self.instance.pk)
+            if duplicate.exists():
+                raise forms.ValidationError("Limit dla tej kategorii w tym miesiącu już istnieje.")
+        return cleaned_data
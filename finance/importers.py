@@ -0,0 +1,340 @@
+"""
+Strumieniowy import wyciągów bankowych (CSV i OFX).
+
+Plik jest czytany wiersz po wierszu i zapisywany paczkami (jedno executemany w jednej
+transakcji na paczkę), więc w pamięci jest najwyżej jedna paczka wierszy. Po każdej paczce
+ImportJob.rows_read zapisuje punkt wznowienia - przerwany import startuje od
+pierwszego niezatwierdzonego wiersza. Duplikaty odrzucamy po odcisku wiersza
+(Transaction.fingerprint, unikalny indeks per użytkownik).
+
+Identyczne operacje (data, kwota, opis) odróżnia numer kolejnego wystąpienia danego dnia.
+Licznik obejmuje tylko bieżący dzień wyciągu, więc wiersze jednego dnia muszą leżeć obok
+siebie - wyciągi bankowe są posortowane po dacie (rosnąco albo malejąco). Pamiętamy jeszcze
+zbiór dni już zamkniętych (tyle elementów, ile dni obejmuje wyciąg): dzień, który wraca po
+innych, przerywa import błędem UnsortedStatement zamiast po cichu zgubić wiersze jako duplikaty.
+"""
+import csv
+import datetime
+import hashlib
+import io
+import re
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from finance import rollups
+from finance.models import DEFAULT_CURRENCY, Category, ImportJob, ImportRule, Transaction
+from finance.signals import transactions_changed
+
+BATCH_SIZE = 5000
+# Limit parametrów w jednym zapytaniu SQLite (fingerprint__in=...)
+LOOKUP_CHUNK = 900
+
+DEFAULT_INCOME_CATEGORY = 'Inne wpływy'
+DEFAULT_EXPENSE_CATEGORY = 'Inne wydatki'
+
+
+class RowError(ValueError):
+    pass
+
+
+class UnsortedStatement(ValueError):
+    pass
+
+
+class StatementRow:
+    __slots__ = ('date', 'amount', 'description')
+
+    def __init__(self, date, amount, description):
+        self.date = date
+        self.amount = amount  # ze znakiem: ujemne = wydatek
+        self.description = description
+
+
+def parse_amount(value):
+    """'-1 234,56', '1,234.56', '12.5' -> Decimal"""
+    value = value.strip().replace('\xa0', '').replace(' ', '')
+    if ',' in value and '.' in value:
+        # Separatorem dziesiętnym jest ten, który występuje jako ostatni
+        if value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '').replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    else:
+        value = value.replace(',', '.')
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise RowError(f"Nieprawidłowa kwota: {value!r}")
+    # NaN, Infinity i kwoty spoza Transaction.amount wysypałyby zapis całej paczki - to błędny wiersz
+    field = Transaction._meta.get_field('amount')
+    limit = 10 ** (field.max_digits - field.decimal_places)
+    if not amount.is_finite():
+        raise RowError(f"Nieprawidłowa kwota: {value!r}")
+    # Zapis zaokrągla do groszy (99999999.995 -> 100000000.00), więc zakres sprawdzamy po zaokrągleniu.
+    # Zwracamy kwotę bez zaokrąglenia - od jej zapisu zależy odcisk wiersza z wcześniejszych importów.
+    if abs(amount) >= limit or abs(amount.quantize(Decimal(1).scaleb(-field.decimal_places))) >= limit:
+        raise RowError(f"Kwota poza zakresem: {value!r}")
+    return amount
+
+
+def parse_date(value, date_format):
+    value = value.strip()
+    try:
+        if date_format == '%Y-%m-%d':
+            return datetime.date.fromisoformat(value[:10])
+        return datetime.datetime.strptime(value, date_format).date()
+    except ValueError:
+        raise RowError(f"Nieprawidłowa data: {value!r}")
+
+
+def read_csv(stream, date_column='date', amount_column='amount', description_column='description',
+             date_format='%Y-%m-%d', delimiter=','):
+    """Generator wierszy z pliku CSV z nagłówkiem. Błędne wiersze zwracane są jako RowError."""
+    reader = csv.DictReader(stream, delimiter=delimiter)
+    missing = {date_column, amount_column} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Brak kolumn w pliku CSV: {', '.join(sorted(missing))}")
+    for record in reader:
+        try:
+            yield StatementRow(
+                parse_date(record[date_column] or '', date_format),
+                parse_amount(record[amount_column] or ''),
+                (record.get(description_column) or '').strip(),
+            )
+        except RowError as error:
+            yield error
+
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def read_ofx(stream):
+    """Generator operacji <STMTTRN> z pliku OFX (zarówno SGML 1.x, jak i XML 2.x)"""
+    current = None
+    for line in stream:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    yield _ofx_row(current)
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+def _ofx_row(fields):
+    try:
+        posted = fields.get('DTPOSTED', '')
+        date = parse_date(f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}", '%Y-%m-%d')
+        amount = parse_amount(fields.get('TRNAMT', ''))
+    except RowError as error:
+        return error
+    description = ' '.join(part for part in (fields.get('NAME'), fields.get('MEMO')) if part)
+    return StatementRow(date, amount, description)
+
+
+def file_hash(fileobj, chunk_size=1024 * 1024):
+    """SHA-256 pliku liczony kawałkami - identyfikuje plik przy wznawianiu importu"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def open_rows(fileobj, format, encoding='utf-8-sig', **csv_options):
+    """Otwiera binarny plik wyciągu jako strumień tekstu i zwraca generator wierszy"""
+    stream = io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+    if format == 'ofx':
+        return read_ofx(stream)
+    return read_csv(stream, **csv_options)
+
+
+class CategoryMatcher:
+    """Przypisuje kategorię według reguł użytkownika, a gdy żadna nie pasuje - według znaku kwoty"""
+
+    def __init__(self, user, income_category=None, expense_category=None):
+        self.rules = [(rule.pattern.lower(), rule.category_id)
+                      for rule in ImportRule.objects.filter(user=user).only('pattern', 'category_id')]
+        self.income_category = income_category or Category.objects.get_or_create(
+            name=DEFAULT_INCOME_CATEGORY, type='INCOME')[0]
+        self.expense_category = expense_category or Category.objects.get_or_create(
+            name=DEFAULT_EXPENSE_CATEGORY, type='EXPENSE')[0]
+
+    def __call__(self, row):
+        description = row.description.lower()
+        for pattern, category_id in self.rules:
+            if pattern in description:
+                return category_id
+        return self.income_category.pk if row.amount > 0 else self.expense_category.pk
+
+
+class StatementImporter:
+    def __init__(self, job, matcher, batch_size=BATCH_SIZE, progress=None, currency=DEFAULT_CURRENCY):
+        self.job = job
+        self.matcher = matcher
+        # Waluta rachunku - wszystkie operacje jednego wyciągu są w tej samej
+        self.currency = currency
+        self.batch_size = batch_size
+        self.progress = progress
+        # {klucz operacji: liczba wystąpień} bieżącego dnia i dni już zamknięte
+        self._day = None
+        self._occurrences = Counter()
+        self._closed_days = set()
+
+    def fingerprint(self, row):
+        if row.date != self._day:
+            if row.date in self._closed_days:
+                raise UnsortedStatement(f"wiersze z dnia {row.date.isoformat()} nie leżą obok siebie - "
+                                        f"posortuj wyciąg według daty")
+            if self._day is not None:
+                self._closed_days.add(self._day)
+            self._day = row.date
+            self._occurrences.clear()
+        base = f"{self.job.user_id}|{row.date.isoformat()}|{row.amount}|{row.description}"
+        self._occurrences[base] += 1
+        # Data na początku odcisku - kolejne wiersze trafiają obok siebie w indeksie unikalnym
+        digest = hashlib.sha1(f"{base}|{self._occurrences[base]}".encode()).hexdigest()
+        return f"{row.date:%Y%m%d}{digest[:32]}"
+
+    def run(self, rows):
+        """Importuje wiersze, zaczynając od punktu wznowienia zapisanego w jobie"""
+        job = self.job
+        started = time.monotonic() - job.seconds
+        rows = iter(rows)
+
+        try:
+            # Wznowienie: wiersze już zatwierdzone tylko przeliczamy (numeracja duplikatów), bez zapisu
+            for row in islice(rows, job.rows_read):
+                if not isinstance(row, RowError):
+                    self.fingerprint(row)
+
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self._import_batch(batch)
+                job.seconds = time.monotonic() - started
+                if self.progress:
+                    self.progress(job)
+        except Exception as error:
+            job.status = 'FAILED'
+            job.error = f"{type(error).__name__}: {error}"
+            job.seconds = time.monotonic() - started
+            job.save(update_fields=['status', 'error', 'seconds'])
+            raise
+
+        job.status = 'DONE'
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'seconds', 'finished_at'])
+        return job
+
+    def _import_batch(self, batch):
+        job = self.job
+        candidates = {}
+        invalid = 0
+        for row in batch:
+            if isinstance(row, RowError):
+                invalid += 1
+                continue
+            candidates[self.fingerprint(row)] = row
+
+        existing = set()
+        fingerprints = list(candidates)
+        for start in range(0, len(fingerprints), LOOKUP_CHUNK):
+            # order_by() - bez domyślnego sortowania po dacie SQLite użyje indeksu (user, fingerprint)
+            existing.update(Transaction.objects.filter(
+                user_id=job.user_id, fingerprint__in=fingerprints[start:start + LOOKUP_CHUNK],
+            ).order_by().values_list('fingerprint', flat=True))
+
+        deltas = rollups.new_deltas()
+        values = []
+        for fingerprint, row in candidates.items():
+            if fingerprint in existing:
+                continue
+            category_id = self.matcher(row)
+            amount = abs(row.amount)
+            values.append((category_id, amount, row.description, row.date, fingerprint))
+            rollups.add_delta(deltas, job.user_id, category_id, row.date, amount, self.currency)
+
+        # Paczka, rollupy i punkt wznowienia zatwierdzane razem - albo wszystko, albo nic
+        with transaction.atomic():
+            insert_transactions(job.user_id, values, self.currency)
+            transactions_changed.send(sender=Transaction, deltas=deltas)
+            job.rows_read += len(batch)
+            job.rows_imported += len(values)
+            job.rows_duplicate += len(candidates) - len(values)
+            job.rows_invalid += invalid
+            job.save(update_fields=['rows_read', 'rows_imported', 'rows_duplicate', 'rows_invalid', 'seconds'])
+
+
+def insert_transactions(user_id, values, currency=DEFAULT_CURRENCY):
+    """
+    Wstawia paczkę transakcji jednym executemany: values to krotki
+    (category_id, amount, description, date, fingerprint), wszystkie w walucie currency.
+
+    Przy setkach tysięcy wierszy bulk_create większość czasu spędza na przygotowaniu
+    każdego pola każdego obiektu; tu konwertujemy wartości raz, bez tworzenia modeli.
+    """
+    insert_rows([(user_id, *row, currency) for row in values])
+
+
+def insert_rows(rows):
+    """
+    Jak insert_transactions, ale dla wielu użytkowników i walut naraz:
+    krotki (user_id, category_id, amount, description, date, fingerprint, currency)
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(Transaction)]
+    ops = connection.ops
+    meta = Transaction._meta
+    amount_field = meta.get_field('amount')
+    columns = [meta.get_field(name).column for name in
+               ('user', 'category', 'amount', 'currency', 'description', 'date', 'created_at', 'fingerprint')]
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        ops.quote_name(meta.db_table),
+        ', '.join(ops.quote_name(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    created_at = ops.adapt_datetimefield_value(timezone.now())
+    params = [
+        (user_id, category_id,
+         ops.adapt_decimalfield_value(amount, amount_field.max_digits, amount_field.decimal_places), currency,
+         description, ops.adapt_datefield_value(date), created_at, fingerprint)
+        for user_id, category_id, amount, description, date, fingerprint, currency in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def start_job(user, source, fileobj, format, resume=True):
+    """Tworzy nowy ImportJob albo zwraca niedokończony import tego samego pliku"""
+    digest = file_hash(fileobj)
+    if resume:
+        job = (ImportJob.objects.filter(user=user, file_hash=digest, status__in=['RUNNING', 'FAILED'])
+               .order_by('-started_at').first())
+        if job:
+            job.status = 'RUNNING'
+            job.save(update_fields=['status'])
+            return job
+    return ImportJob.objects.create(user=user, source=source, file_hash=digest, format=format)
+
+
+def import_statement(user, source, fileobj, format='csv', encoding='utf-8-sig', resume=True,
+                     income_category=None, expense_category=None, batch_size=BATCH_SIZE, progress=None,
+                     currency=DEFAULT_CURRENCY, **csv_options):
+    """Cały import: identyfikacja pliku, ewentualne wznowienie, parsowanie i zapis paczkami"""
+    job = start_job(user, source, fileobj, format, resume=resume)
+    matcher = CategoryMatcher(user, income_category, expense_category)
+    rows = open_rows(fileobj, format, encoding=encoding, **csv_options)
+    return StatementImporter(job, matcher, batch_size=batch_size, progress=progress, currency=currency).run(rows)
@@ -0,0 +1,256 @@
+"""
+Kolejka zadań w tle w bazie danych (BackgroundJob) - bez zewnętrznego brokera.
+
+Widok tylko dodaje zadanie (enqueue) i przekierowuje na stronę, która co kilka sekund pyta
+o jego status; pracę wykonuje osobny proces "manage.py run_jobs" (można uruchomić kilka).
+Worker bierze zadanie warunkowym UPDATE ... WHERE status = 'QUEUED' - z dwóch workerów
+sięgających po to samo zadanie dostaje je tylko jeden - a ten sam UPDATE pomija użytkowników,
+którzy mają już FINANCE_JOBS_PER_USER zadań w trakcie, więc jeden użytkownik nie zajmie
+wszystkich workerów.
+
+Nieudane zadanie wraca do kolejki z rosnącym opóźnieniem (FINANCE_JOBS_RETRY_DELAY * 2^n),
+najwyżej FINANCE_JOBS_MAX_ATTEMPTS razy; błędy danych (ValueError - np. zły format pliku)
+nie są ponawiane. Zadanie, którego worker przestał dawać znaki życia (przerwany proces),
+po FINANCE_JOBS_TIMEOUT wraca do kolejki. Wyniki i przesłane pliki leżą w FINANCE_JOBS_DIR
+i są usuwane razem z zadaniem po FINANCE_JOBS_RESULT_TTL.
+"""
+import datetime
+import logging
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.utils import timezone
+
+from finance import charts, exporters, importers, series
+from finance.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+PENDING = ('QUEUED', 'RUNNING')
+# Ilu kandydatów sprawdza jedno pobranie zadania (reszta mogła zostać zabrana przez inne workery)
+CLAIM_CANDIDATES = 10
+# Jak często (sekundy) handler zapisuje postęp i znak życia
+HEARTBEAT_INTERVAL = 2
+
+
+class JobLimitError(Exception):
+    pass
+
+
+def enqueue(user, kind, params=None, upload=None):
+    """
+    Dodaje zadanie do kolejki; upload (przesłany plik) jest zapisywany w FINANCE_JOBS_DIR.
+    JobLimitError, gdy użytkownik ma już FINANCE_JOBS_MAX_PENDING niedokończonych zadań.
+    """
+    pending = BackgroundJob.objects.filter(user=user, status__in=PENDING).count()
+    if pending >= settings.FINANCE_JOBS_MAX_PENDING:
+        raise JobLimitError(f"Masz już {pending} zadań w kolejce - poczekaj, aż któreś się zakończy.")
+    input_file = _store_upload(upload) if upload else ''
+    return BackgroundJob.objects.create(user=user, kind=kind, params=params or {}, input_file=input_file,
+                                        run_after=timezone.now())
+
+
+def path(name):
+    return Path(settings.FINANCE_JOBS_DIR) / name
+
+
+def _store_upload(upload):
+    name = f'inputs/{uuid.uuid4().hex}'
+    target = path(name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, 'wb') as output:
+        for chunk in upload.chunks():
+            output.write(chunk)
+    return name
+
+
+def default_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, now=None):
+    """Bierze najstarsze gotowe do uruchomienia zadanie (status RUNNING) albo zwraca None"""
+    now = now or timezone.now()
+    busy = (BackgroundJob.objects.filter(status='RUNNING').order_by().values('user')
+            .annotate(running=Count('id')).filter(running__gte=settings.FINANCE_JOBS_PER_USER).values('user'))
+    candidates = list(BackgroundJob.objects.filter(status='QUEUED', run_after__lte=now).exclude(user__in=busy)
+                      .order_by('run_after', 'id').values_list('pk', flat=True)[:CLAIM_CANDIDATES])
+    for pk in candidates:
+        # Limit sprawdzany ponownie w tym samym UPDATE - między wyborem a zajęciem inny worker
+        # mógł wziąć to zadanie albo inne zadanie tego użytkownika
+        claimed = BackgroundJob.objects.filter(pk=pk, status='QUEUED').exclude(user__in=busy).update(
+            status='RUNNING', worker=worker, attempts=F('attempts') + 1, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=pk)
+    return None
+
+
+class Heartbeat:
+    """Przekazywany handlerom jako progress(tekst): zapisuje postęp i znak życia workera"""
+
+    def __init__(self, job):
+        self.job = job
+        self.last = time.monotonic()
+
+    def __call__(self, text=None, force=False):
+        now = time.monotonic()
+        if not force and now - self.last < HEARTBEAT_INTERVAL:
+            return
+        self.last = now
+        fields = {'heartbeat_at': timezone.now()}
+        if text is not None:
+            fields['progress'] = self.job.progress = text[:200]
+        BackgroundJob.objects.filter(pk=self.job.pk).update(**fields)
+
+
+def run(job):
+    """Wykonuje zajęte zadanie; błąd kończy się ponowieniem albo statusem FAILED"""
+    progress = Heartbeat(job)
+    try:
+        result = HANDLERS[job.kind](job, progress)
+        if result is not None:
+            job.result_name, job.content_type, chunks = result
+            job.result_file = _write_result(job, chunks, progress)
+    except Exception as error:
+        logger.exception("Zadanie %s nie powiodło się (próba %d)", job.pk, job.attempts)
+        _failed(job, error)
+        return job
+
+    now = timezone.now()
+    _remove(job.input_file)
+    job.status = 'DONE'
+    job.error = ''
+    job.input_file = ''
+    job.finished_at = now
+    job.expires_at = now + datetime.timedelta(seconds=settings.FINANCE_JOBS_RESULT_TTL)
+    job.save(update_fields=['status', 'error', 'input_file', 'result_file', 'result_name', 'content_type',
+                            'progress', 'finished_at', 'expires_at'])
+    return job
+
+
+def _failed(job, error):
+    now = timezone.now()
+    job.error = f"{type(error).__name__}: {error}"
+    # Błąd danych (zły plik, nieznany format) przy kolejnej próbie byłby taki sam
+    if job.attempts < settings.FINANCE_JOBS_MAX_ATTEMPTS and not isinstance(error, ValueError):
+        job.status = 'QUEUED'
+        job.run_after = now + datetime.timedelta(seconds=settings.FINANCE_JOBS_RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = 'FAILED'
+        job.finished_at = now
+        job.expires_at = now + datetime.timedelta(seconds=settings.FINANCE_JOBS_RESULT_TTL)
+    job.save(update_fields=['status', 'error', 'progress', 'run_after', 'finished_at', 'expires_at'])
+
+
+def _write_result(job, chunks, progress):
+    """Zapisuje wynik kawałkami (pod tymczasową nazwą, podmienianą po zakończeniu)"""
+    name = f'results/{job.pk}-{uuid.uuid4().hex}'
+    target = path(name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_suffix('.part')
+    written = 0
+    with open(partial, 'wb') as output:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+            progress(f"Zapisano {written // 1024} kB")
+    partial.replace(target)
+    return name
+
+
+def _remove(name):
+    if name:
+        path(name).unlink(missing_ok=True)
+
+
+def run_next(worker):
+    """Bierze i wykonuje jedno zadanie; None, gdy kolejka jest pusta"""
+    job = claim(worker)
+    if job is not None:
+        run(job)
+    return job
+
+
+def requeue_stale(now=None):
+    """Zadania RUNNING bez znaku życia od FINANCE_JOBS_TIMEOUT: do kolejki albo (po ostatniej próbie) FAILED"""
+    now = now or timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status='RUNNING', heartbeat_at__lt=now - datetime.timedelta(seconds=settings.FINANCE_JOBS_TIMEOUT),
+    )
+    failed = stale.filter(attempts__gte=settings.FINANCE_JOBS_MAX_ATTEMPTS).update(
+        status='FAILED', error="Worker przestał odpowiadać.", finished_at=now,
+        expires_at=now + datetime.timedelta(seconds=settings.FINANCE_JOBS_RESULT_TTL),
+    )
+    requeued = stale.update(status='QUEUED', run_after=now, worker='')
+    return requeued, failed
+
+
+def cleanup(now=None):
+    """Usuwa zadania po terminie ważności razem z ich plikami; zwraca ich liczbę"""
+    expired = BackgroundJob.objects.filter(expires_at__lt=now or timezone.now())
+    for input_file, result_file in expired.values_list('input_file', 'result_file'):
+        _remove(input_file)
+        _remove(result_file)
+    return expired.delete()[0]
+
+
+# --- Zadania ---
+
+def _date(value):
+    return datetime.date.fromisoformat(value) if value else None
+
+
+def export_params(cleaned_data):
+    """Parametry zadania eksportu z ExportForm.cleaned_data (w postaci do zapisania jako JSON)"""
+    return {
+        'format': cleaned_data['format'],
+        'date_from': cleaned_data['date_from'] and cleaned_data['date_from'].isoformat(),
+        'date_to': cleaned_data['date_to'] and cleaned_data['date_to'].isoformat(),
+        'categories': [category.pk for category in cleaned_data['categories']],
+        'gzip': cleaned_data['gzip'],
+    }
+
+
+def run_export(job, progress):
+    params = job.params
+    rows = exporters.export_rows(job.user, _date(params['date_from']), _date(params['date_to']), params['categories'])
+    name, content_type = f"transakcje.{params['format']}", exporters.CONTENT_TYPES[params['format']]
+    if params['gzip']:
+        name, content_type = name + '.gz', 'application/gzip'
+    return name, content_type, exporters.export_stream(rows, params['format'], gzip=params['gzip'])
+
+
+def run_import(job, progress):
+    params = dict(job.params)
+    source = params.pop('source')
+    with open(path(job.input_file), 'rb') as fileobj:
+        # Ponowienie po błędzie wznawia ten sam ImportJob (rozpoznany po skrócie pliku)
+        result = importers.import_statement(
+            job.user, source, fileobj, progress=lambda import_job: progress(f"Wczytano {import_job.rows_read} wierszy"),
+            **params,
+        )
+    job.progress = (f"Zaimportowano {result.rows_imported} transakcji (duplikaty: {result.rows_duplicate}, "
+                    f"błędne wiersze: {result.rows_invalid}).")
+    return None
+
+
+def run_chart(job, progress):
+    monthly = series.monthly_balance(job.user)
+    if not monthly['months']:
+        raise ValueError("Brak danych do narysowania wykresu")
+    spec = charts.monthly_spec(monthly['months'], monthly['incomes'], monthly['expenses'])
+    # Worker to osobny proces - rysuje sam, bez puli z finance/rendering.py
+    return 'historia.png', 'image/png', [charts.render_png(spec)]
+
+
+HANDLERS = {
+    'export': run_export,
+    'import': run_import,
+    'chart': run_chart,
+}
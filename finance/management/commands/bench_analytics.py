@@ -0,0 +1,140 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finance import analytics, synthetic
+from finance.models import MonthlyRollup
+
+
+def loop_report(user, today):
+    """
+    Te same wskaźniki co analytics.report (bez sezonowości prognozy), liczone jak dotychczasowe
+    serie (series._monthly_balance): słowniki miesięcy i pętle po Decimalach - punkt odniesienia.
+    """
+    rows = MonthlyRollup.objects.filter(user=user).order_by().values('month', 'category_id', 'category_type', 'total')
+    data_dict, categories = {}, {}
+    for item in rows:
+        month_str = item['month'].strftime('%Y-%m')
+        data_dict.setdefault(month_str, {})
+        data_dict[month_str][item['category_id']] = data_dict[month_str].get(item['category_id'], 0) + item['total']
+        categories[item['category_id']] = item['category_type']
+
+    months = []
+    month = min(data_dict) if data_dict else today.strftime('%Y-%m')
+    last = max(max(data_dict) if data_dict else month, today.strftime('%Y-%m'))
+    while month <= last:
+        months.append(month)
+        year, number = int(month[:4]), int(month[5:])
+        month = f'{year + number // 12}-{number % 12 + 1:02d}'
+
+    income, expense = [], []
+    for month in months:
+        values = data_dict.get(month, {})
+        income.append(sum((value for pk, value in values.items() if categories[pk] == 'INCOME'), Decimal(0)))
+        expense.append(sum((value for pk, value in values.items() if categories[pk] == 'EXPENSE'), Decimal(0)))
+    balance = [i - e for i, e in zip(income, expense)]
+
+    def rolling(values):
+        return [None if index < analytics.WINDOW - 1
+                else sum(values[index - analytics.WINDOW + 1:index + 1]) / analytics.WINDOW
+                for index in range(len(values))]
+
+    def change(values):
+        result, percent = [None], [None]
+        for previous, value in zip(values, values[1:]):
+            result.append(value - previous)
+            percent.append((value - previous) / previous * 100 if previous else None)
+        return result, percent
+
+    complete = sum(1 for month in months if month < today.strftime('%Y-%m'))
+    movers = []
+    if complete > 1:
+        last, window = months[complete - 1], months[max(0, complete - 1 - analytics.WINDOW):complete - 1]
+        for pk, type in categories.items():
+            if type != 'EXPENSE':
+                continue
+            value = data_dict.get(last, {}).get(pk, Decimal(0))
+            average = sum(data_dict.get(month, {}).get(pk, Decimal(0)) for month in window) / len(window)
+            if value != average:
+                movers.append((abs(value - average), pk, value, average))
+        movers = sorted(movers, key=lambda mover: -mover[0])[:analytics.TOP_MOVERS]
+
+    # Trend liniowy metodą najmniejszych kwadratów, sumy liczone w pętli
+    known = [float(value) for value in expense[:complete]]
+    count = len(known)
+    forecast = None
+    if count >= 3:
+        mean_x, mean_y = (count - 1) / 2, sum(known) / count
+        slope = (sum((x - mean_x) * (y - mean_y) for x, y in enumerate(known))
+                 / sum((x - mean_x) ** 2 for x in range(count)))
+        forecast = [max(0.0, mean_y + slope * (x - mean_x)) for x in range(count, count + analytics.FORECAST_MONTHS)]
+
+    return {
+        'months': months, 'expense': expense, 'expense_rolling': rolling(expense), 'balance_rolling': rolling(balance),
+        'expense_change': change(expense), 'savings_rate': [(i - e) / i * 100 if i > 0 else None
+                                                            for i, e in zip(income, expense)],
+        'top_movers': movers, 'forecast': forecast,
+    }
+
+
+class Command(BaseCommand):
+    help = ("Benchmark analiz: porównuje finance/analytics.py (NumPy, jedno zapytanie) z liczeniem "
+            "w pętlach po Decimalach dla historii różnej długości. Działa na tymczasowej bazie testowej.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, nargs='+', default=[36, 120, 600],
+                            help="Długości historii w miesiącach")
+        parser.add_argument('--per-month', type=int, default=40, help="Transakcji na miesiąc")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, months, per_month, repeat, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            categories = synthetic.ensure_categories()
+            today = datetime.date.today()
+            self.stdout.write(f"{'miesiące':>9} {'rollupy':>8} {'pętle':>9} {'NumPy':>9} {'przysp.':>8}")
+            for count in months:
+                user = synthetic.create_users(f'bench-analytics-{count}', 1, 'bench')[0]
+                synthetic.populate(user, synthetic.Generator(categories, months=count, end=today, seed=count),
+                                   count * per_month, budgets=False)
+                self._check(loop_report(user, today), analytics.report(user, today))
+                loops = self._time(loop_report, user, today, repeat)
+                vectorized = self._time(analytics.report, user, today, repeat)
+                rows = MonthlyRollup.objects.filter(user=user).count()
+                self.stdout.write(f"{count:>9} {rows:>8} {loops * 1000:>7.2f}ms {vectorized * 1000:>7.2f}ms "
+                                  f"{loops / vectorized:>7.1f}x")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _time(self, function, user, today, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(user, today)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def _check(self, expected, result):
+        """Obie wersje muszą dać te same liczby (z dokładnością do groszy)"""
+        def same(a, b):
+            return (a is None) == (b is None) and (a is None or abs(float(a) - b) < 0.01)
+
+        pairs = [
+            ('expense', expected['expense'], result['expense']),
+            ('expense_rolling', expected['expense_rolling'], result['expense_rolling']),
+            ('balance_rolling', expected['balance_rolling'], result['balance_rolling']),
+            ('expense_change', expected['expense_change'][0], result['expense_change']),
+            ('expense_change_pct', expected['expense_change'][1], result['expense_change_pct']),
+            ('savings_rate', expected['savings_rate'], result['savings_rate']),
+            ('top_movers', [mover[1] for mover in expected['top_movers']],
+             [mover['category_id'] for mover in result['top_movers']]),
+        ]
+        if result['forecast']['method'] == 'trend liniowy':
+            pairs.append(('forecast', expected['forecast'], result['forecast']['expense']))
+        for name, a, b in pairs:
+            if expected['months'] != result['months'] or len(a) != len(b) or not all(
+                    x == y if name == 'top_movers' else same(x, y) for x, y in zip(a, b)):
+                raise CommandError(f"Wyniki różnią się: {name}")
@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from finance import synthetic
+
+# (nazwa, adres API, odpowiadająca mu strona HTML)
+PAIRS = [
+    ('transakcje', 'api_transactions', 'transaction_search'),
+    ('podsumowanie', 'api_summary', 'transaction_list'),
+    ('kategorie', 'api_categories', 'category_list'),
+]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark JSON API (/api/v1/) względem odpowiadających mu stron HTML: czas odpowiedzi, "
+            "rozmiar (bez i z gzip) i czas odpowiedzi 304 na If-None-Match. Działa na tymczasowej bazie testowej.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=10000, help="Liczba transakcji użytkownika")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, transactions, repeat, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Bez limitu żądań - pomiar wysyła ich setki; wykresy pulpitu rysowane w procesie
+            with override_settings(ALLOWED_HOSTS=['testserver'], FINANCE_API_RATE_LIMIT=0,
+                                   FINANCE_CHART_WORKERS=0):
+                self._bench(transactions, repeat)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _bench(self, transactions, repeat):
+        categories = synthetic.ensure_categories()
+        user = synthetic.create_users('bench-api', 1, 'bench')[0]
+        synthetic.populate(user, synthetic.Generator(categories, seed=transactions), transactions)
+        client = Client()
+        client.force_login(user)
+
+        self.stdout.write(f"{transactions} transakcji, mediana z {repeat} żądań (po rozgrzewce)")
+        self.stdout.write(f"{'':<13} {'HTML':>9} {'HTML kB':>9} {'API':>9} {'API kB':>9} {'gzip kB':>9} {'API 304':>9}")
+        for name, api_name, html_name in PAIRS:
+            html_time, html = self._measure(client, reverse(html_name), repeat)
+            api_time, api = self._measure(client, reverse(api_name), repeat)
+            gzip_time, compressed = self._measure(client, reverse(api_name), repeat, HTTP_ACCEPT_ENCODING='gzip')
+            not_modified_time, not_modified = self._measure(
+                client, reverse(api_name), repeat, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+            assert not_modified.status_code == 304, not_modified.status_code
+            self.stdout.write(
+                f"{name:<13} {html_time * 1000:>7.1f}ms {len(html.content) / 1024:>7.1f}kB "
+                f"{api_time * 1000:>7.1f}ms {len(api.content) / 1024:>7.1f}kB "
+                f"{len(compressed.content) / 1024:>7.1f}kB {not_modified_time * 1000:>7.1f}ms"
+            )
+
+    def _measure(self, client, path, repeat, **headers):
+        client.get(path, **headers)
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(path, **headers)
+            times.append(time.perf_counter() - started)
+        return statistics.median(times), response
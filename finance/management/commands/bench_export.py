@@ -0,0 +1,74 @@
+import datetime
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from finance import exporters
+from finance.importers import insert_transactions
+from finance.models import Category
+
+INSERT_BATCH = 10000
+
+
+class Command(BaseCommand):
+    help = ("Benchmark eksportu: dla kolejnych rozmiarów historii mierzy czas do pierwszego bajtu, "
+            "czas całkowity i szczytowe zużycie pamięci Pythona. Działa na tymczasowej bazie testowej.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+        parser.add_argument('--format', choices=sorted(exporters.STREAMS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+
+    def handle(self, *args, rows, format, gzip, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            categories = [
+                Category.objects.create(name=name, type=type)
+                for name, type in [('Pensja', 'INCOME'), ('Jedzenie', 'EXPENSE'), ('Rachunki', 'EXPENSE')]
+            ]
+            self.stdout.write(f"{'wiersze':>10} {'1. bajt':>9} {'całość':>8} {'wiersze/s':>10} "
+                              f"{'rozmiar':>9} {'pamięć':>9}")
+            for count in rows:
+                user = self._populate(count, categories)
+                ttfb, total, size = self._export(user, format, gzip)
+                peak = self._peak_memory(user, format, gzip)
+                self.stdout.write(f"{count:>10} {ttfb * 1000:>7.1f}ms {total:>7.2f}s {count / total:>10.0f} "
+                                  f"{size / 2 ** 20:>7.1f}MB {peak / 2 ** 20:>7.1f}MB")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _populate(self, count, categories):
+        user = User.objects.create_user(f'bench-export-{count}')
+        start = datetime.date(2000, 1, 1)
+        with transaction.atomic():
+            for offset in range(0, count, INSERT_BATCH):
+                insert_transactions(user.pk, [
+                    (random.choice(categories).pk, Decimal(random.randint(100, 500000)) / 100,
+                     f"Operacja {i}", start + datetime.timedelta(days=i // 100), None)
+                    for i in range(offset, min(offset + INSERT_BATCH, count))
+                ])
+        return user
+
+    def _export(self, user, format, gzip):
+        started = time.perf_counter()
+        stream = exporters.export_stream(exporters.export_rows(user), format, gzip=gzip)
+        size = len(next(stream))
+        ttfb = time.perf_counter() - started
+        for chunk in stream:
+            size += len(chunk)
+        return ttfb, time.perf_counter() - started, size
+
+    def _peak_memory(self, user, format, gzip):
+        # Osobny przebieg - tracemalloc spowalnia wykonanie i zafałszowałby czasy
+        tracemalloc.start()
+        try:
+            for _ in exporters.export_stream(exporters.export_rows(user), format, gzip=gzip):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,59 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from finance import recurring, rollups
+from finance.models import Category, RecurringRule, Transaction
+
+USERS = 1000
+
+
+class Command(BaseCommand):
+    help = ("Benchmark transakcji cyklicznych: tworzy zaległe reguły, mierzy czas ich materializacji "
+            "i drugiego, pustego przebiegu. Działa na tymczasowej bazie testowej.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', type=int, default=100000)
+        parser.add_argument('--periods', type=int, default=1,
+                            help="Ile zaległych terminów miesięcznych ma każda reguła")
+        parser.add_argument('--batch-size', type=int, default=recurring.BATCH_SIZE)
+
+    def handle(self, *args, rules, periods, batch_size, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            today = datetime.date(2024, 6, 15)
+            self._populate(rules, rollups.add_months(today, 1 - periods))
+
+            started = time.perf_counter()
+            done, created = recurring.materialize(today, batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Materializacja: {done} reguł, {created} transakcji w {elapsed:.2f}s "
+                              f"({created / elapsed:.0f} transakcji/s)")
+
+            started = time.perf_counter()
+            again = recurring.materialize(today, batch_size=batch_size)
+            self.stdout.write(f"Ponowny przebieg: {again[0]} reguł, {again[1]} transakcji "
+                              f"w {(time.perf_counter() - started) * 1000:.1f}ms")
+
+            assert Transaction.objects.count() == created == rules * periods
+            mismatches = rollups.verify()
+            self.stdout.write(f"Rollupy: {'zgodne' if not mismatches else f'{len(mismatches)} rozbieżności'}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _populate(self, count, start_date):
+        categories = [Category.objects.create(name=name, type=type)
+                      for name, type in [('Pensja', 'INCOME'), ('Czynsz', 'EXPENSE'), ('Abonamenty', 'EXPENSE')]]
+        users = User.objects.bulk_create([User(username=f'bench-recurring-{i}') for i in range(USERS)])
+        with transaction.atomic():
+            RecurringRule.objects.bulk_create([
+                RecurringRule(user=users[i % USERS], category=random.choice(categories),
+                              amount=Decimal(random.randint(1000, 500000)) / 100, description=f"Reguła {i}",
+                              cadence='MONTHLY', start_date=start_date, next_date=start_date)
+                for i in range(count)
+            ], batch_size=10000)
@@ -0,0 +1,146 @@
+import argparse
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from finance import preload
+
+# lazy - obecny kod (matplotlib i NumPy przy pierwszym użyciu)
+# eager - jak przed zmianą: ciężkie moduły importowane przy starcie każdego procesu
+# preload - FINANCE_PRELOAD w procesie głównym pre-fork, pomiar w procesie potomnym
+MODES = ['lazy', 'eager', 'preload']
+HEAVY = ['matplotlib', 'numpy']
+
+
+class Command(BaseCommand):
+    help = ("Benchmark startu procesu: czas 'manage.py check', pierwszego żądania i pierwszego wykresu "
+            "oraz pamięć procesu roboczego - z leniwym importem matplotlib/NumPy, z importem przy starcie "
+            "i z wczytaniem w procesie głównym przed fork (FINANCE_PRELOAD). Wykres rysowany jak w widoku "
+            "(finance/rendering.py) - w puli procesów albo, z --chart-workers 0, w procesie serwera")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Ile razy uruchomić każdy wariant (mediana)")
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+        parser.add_argument('--chart-workers', type=int, default=settings.FINANCE_CHART_WORKERS,
+                            help="FINANCE_CHART_WORKERS w procesach pomiarowych (0 = rysowanie w procesie)")
+        # Pomiar w osobnym, świeżym procesie - wywoływane przez to samo polecenie
+        parser.add_argument('--child', choices=['check', 'serve'], help=argparse.SUPPRESS)
+        parser.add_argument('--mode', choices=MODES, default='lazy', help=argparse.SUPPRESS)
+
+    def handle(self, *args, repeat, modes, chart_workers, child, mode, **options):
+        if child:
+            result = self._check(mode) if child == 'check' else self._serve(mode)
+            self.stdout.write(json.dumps(result))
+            return
+        if 'preload' in modes and not hasattr(os, 'fork'):
+            self.stderr.write("Brak os.fork - pomijam wariant preload")
+            modes = [name for name in modes if name != 'preload']
+
+        # Procesy pomiarowe czytają ustawienie ze zmiennej środowiskowej (core/settings.py)
+        os.environ['FINANCE_CHART_WORKERS'] = str(chart_workers)
+        self.stdout.write(f"Python {sys.version.split()[0]}, {repeat} uruchomień na wariant (mediana), "
+                          + (f"wykresy w puli {chart_workers} procesów" if chart_workers else "wykresy w procesie"))
+        self.stdout.write(f"{'wariant':>8} {'check':>9} {'1. żądanie':>11} {'1. wykres':>10} "
+                          f"{'RSS':>8} {'prywatna':>9} {'preload':>9}  po żądaniu CRUD")
+        for name in modes:
+            # check nie przechodzi przez core/wsgi.py - preload nic tu nie zmienia
+            checks = [self._spawn('check', 'lazy' if name == 'preload' else name)[0] for _ in range(repeat)]
+            runs = [self._spawn('serve', name)[1] for _ in range(repeat)]
+
+            def median(key):
+                values = [run[key] for run in runs if run.get(key) is not None]
+                return statistics.median(values) if values else None
+
+            private = median('private')
+            preloaded = median('preload_seconds')
+            self.stdout.write(
+                f"{name:>8} {statistics.median(checks):>8.2f}s {median('request') * 1000:>9.0f}ms "
+                f"{median('chart') * 1000:>8.0f}ms {median('rss') / 2 ** 20:>6.1f}MB "
+                f"{'-' if private is None else f'{private / 2 ** 20:.1f}MB':>9} "
+                f"{'-' if preloaded is None else f'{preloaded:.2f}s':>9}  "
+                f"{', '.join(runs[-1]['loaded']) or 'bez ' + ', '.join(HEAVY)}"
+            )
+        self.stdout.write("RSS/prywatna - pamięć procesu roboczego po pierwszym żądaniu (prywatna = bez stron "
+                          "współdzielonych z procesem głównym, bez procesów puli wykresów); "
+                          "preload - jednorazowy koszt w procesie głównym.")
+
+    def _spawn(self, child, mode):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_startup', '--child', child,
+                   '--mode', mode]
+        started = time.perf_counter()
+        process = subprocess.run(command, capture_output=True, text=True)
+        seconds = time.perf_counter() - started
+        if process.returncode:
+            raise CommandError(f"Pomiar {child}/{mode} nie powiódł się:\n{process.stderr}")
+        return seconds, json.loads(process.stdout.strip().splitlines()[-1])
+
+    # --- Pomiary w procesie potomnym ---
+
+    def _check(self, mode):
+        if mode == 'eager':
+            preload.import_modules()
+        call_command('check', stdout=io.StringIO())
+        return {}
+
+    def _serve(self, mode):
+        if mode == 'eager':
+            preload.import_modules()
+        if mode != 'preload':
+            return self._first_request()
+
+        seconds = preload.preload()
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.close(read)
+            with os.fdopen(write, 'w') as output:
+                output.write(json.dumps(self._first_request()))
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as stream:
+            result = json.loads(stream.read())
+        os.waitpid(pid, 0)
+        return dict(result, preload_seconds=seconds)
+
+    def _first_request(self):
+        # Strona bez wykresów i bez bazy - typowe żądanie procesu, który obsługuje formularze
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            started = time.perf_counter()
+            response = Client().get(reverse('login'))
+            request = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"Strona logowania zwróciła {response.status_code}")
+        result = dict(_memory(), request=request, loaded=[name for name in HEAVY if name in sys.modules])
+
+        # Jak widok chart_image: w puli (start i rozgrzanie jej procesów wchodzą do pomiaru) albo w procesie
+        from finance import charts, rendering
+        started = time.perf_counter()
+        try:
+            rendering.render(charts.balance_spec(1000, 500))
+            result['chart'] = time.perf_counter() - started
+        finally:
+            rendering.shutdown()
+        return result
+
+
+def _memory():
+    """RSS i pamięć prywatna procesu w bajtach (prywatna tylko na Linuksie, z /proc/self/smaps_rollup)"""
+    try:
+        with open('/proc/self/smaps_rollup') as stream:
+            fields = {line.split(':')[0]: int(line.split()[1]) * 1024 for line in stream if line.endswith('kB\n')}
+        return {'rss': fields['Rss'], 'private': fields['Private_Clean'] + fields['Private_Dirty']}
+    except (OSError, KeyError):
+        # ru_maxrss: kilobajty na Linuksie, bajty na macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': peak if sys.platform == 'darwin' else peak * 1024, 'private': None}
@@ -0,0 +1,230 @@
+import datetime
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.backends.django import Template
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from finance import charts, synthetic, urls
+from finance.models import BudgetLimit, Category, ImportRule, Transaction
+from finance.pagination import keyset_page
+from finance.views import transaction_feed
+
+
+class TemplateTimer:
+    """Sumuje czas renderowania szablonów (tylko najbardziej zewnętrznych - bez podwójnego liczenia)"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._depth = 0
+
+    def __enter__(self):
+        self._original = original = Template.render
+        timer = self
+
+        def render(template, *args, **kwargs):
+            timer._depth += 1
+            started = time.perf_counter()
+            try:
+                return original(template, *args, **kwargs)
+            finally:
+                timer._depth -= 1
+                if not timer._depth:
+                    timer.seconds += time.perf_counter() - started
+
+        Template.render = render
+        return self
+
+    def __exit__(self, *exc_info):
+        Template.render = self._original
+
+
+class QueryTimer:
+    """Liczba zapytań i łączny czas ich wykonania (CaptureQueriesContext zaokrągla czasy do 1 ms)"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class Fixture:
+    """Obiekty, do których prowadzą adresy z parametrami (edycja transakcji, wykres...)"""
+
+    def __init__(self, user):
+        self.transaction = Transaction.objects.filter(user=user).order_by('-date', '-id').first()
+        self.category = Category.objects.order_by('id').first()
+        self.budget = BudgetLimit.objects.filter(user=user).order_by('-month').first()
+        self.rule = ImportRule.objects.get_or_create(
+            user=user, pattern='Biedronka', defaults={'category': self.category})[0]
+        self.cursor = keyset_page(transaction_feed(user))[1]
+        self.chart_spec = charts.balance_spec(1000, 500)
+
+
+# Parametry ścieżki, zapytanie GET i przygotowanie przed każdym pomiarem - dla adresów, które tego wymagają
+URL_KWARGS = {
+    'transaction_update': lambda f: {'pk': f.transaction.pk},
+    'transaction_delete': lambda f: {'pk': f.transaction.pk},
+    'category_update': lambda f: {'pk': f.category.pk},
+    'category_delete': lambda f: {'pk': f.category.pk},
+    'budget_update': lambda f: {'pk': f.budget.pk},
+    'budget_delete': lambda f: {'pk': f.budget.pk},
+    'import_rule_delete': lambda f: {'pk': f.rule.pk},
+    'chart_image': lambda f: {'key': charts.chart_key(f.chart_spec)},
+}
+URL_QUERY = {
+    'transaction_list_more': lambda f: {'cursor': f.cursor},
+    'transaction_export_download': lambda f: {'format': 'csv'},
+}
+URL_PREPARE = {
+    'chart_image': lambda f: charts.register(f.chart_spec),
+}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark wszystkich adresów z finance/urls.py na kilku rozmiarach danych: czas odpowiedzi, "
+            "liczba zapytań, czas bazy, czas szablonów, rozmiar odpowiedzi. Wyniki w JSON; z --baseline "
+            "porównuje z zapisanym przebiegiem i kończy się błędem przy regresji. Działa na tymczasowej bazie testowej.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="Liczby transakcji użytkownika, dla których mierzymy")
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--cold', action='store_true',
+                            help="Czyść cache (pulpit, wykresy) przed każdym żądaniem")
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help="Mierz tylko wskazane adresy")
+        parser.add_argument('--output', help="Zapisz wyniki do pliku JSON")
+        parser.add_argument('--baseline', help="Plik JSON z wcześniejszego przebiegu do porównania")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Dopuszczalny względny wzrost czasu (0.25 = 25%%)")
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help="Wzrosty czasu mniejsze niż tyle ms nie są regresją (szum pomiaru)")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Wykresy rysowane w procesie - czas renderowania wchodzi do pomiaru, bez startu puli procesów;
+            # bez limitu żądań API (pomiar wysyła kilkaset żądań na użytkownika)
+            with override_settings(ALLOWED_HOSTS=['testserver'], FINANCE_CHART_WORKERS=0, FINANCE_API_RATE_LIMIT=0):
+                categories = synthetic.ensure_categories()
+                results = []
+                for scale in options['scales']:
+                    results.extend(self._bench_scale(scale, categories, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Wyniki zapisane w {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = self._compare(json.load(baseline)['results'], results, options)
+            if regressions:
+                raise CommandError(f"Regresje wydajności: {len(regressions)}")
+            self.stdout.write(self.style.SUCCESS("Brak regresji względem punktu odniesienia."))
+
+    def _bench_scale(self, scale, categories, options):
+        self.stdout.write(f"\n== {scale} transakcji ==")
+        user = synthetic.create_users(f'bench-{scale}', 1, 'bench')[0]
+        user.is_staff = True  # /stats/cache.json
+        user.save(update_fields=['is_staff'])
+        synthetic.populate(user, synthetic.Generator(categories, seed=scale), scale)
+        fixture = Fixture(user)
+
+        client = Client()
+        client.force_login(user)
+        self.stdout.write(f"{'adres':<30} {'status':>6} {'czas':>9} {'zapytania':>9} {'baza':>9} "
+                          f"{'szablony':>9} {'rozmiar':>9}")
+        results = []
+        for pattern in urls.urlpatterns:
+            if options['only'] and pattern.name not in options['only']:
+                continue
+            if pattern.pattern.converters and pattern.name not in URL_KWARGS:
+                self.stderr.write(f"{pattern.name}: brak parametrów w URL_KWARGS - pomijam")
+                continue
+            path = reverse(pattern.name, kwargs=URL_KWARGS[pattern.name](fixture) if pattern.name in URL_KWARGS else None)
+            query = URL_QUERY[pattern.name](fixture) if pattern.name in URL_QUERY else {}
+            prepare = URL_PREPARE.get(pattern.name)
+            result = dict(scale=scale, name=pattern.name, path=path,
+                          **self._measure(client, path, query, prepare, fixture, options))
+            results.append(result)
+            self.stdout.write(f"{pattern.name:<30} {result['status']:>6} {result['total_ms']:>7.1f}ms "
+                              f"{result['queries']:>9} {result['db_ms']:>7.1f}ms {result['template_ms']:>7.1f}ms "
+                              f"{result['bytes'] / 1024:>7.1f}kB")
+        return results
+
+    def _measure(self, client, path, query, prepare, fixture, options):
+        totals, db_times, template_times = [], [], []
+        # Pierwsze żądanie to rozgrzewka (import modułów, pierwsze połączenie) - nie wchodzi do wyników
+        for iteration in range(options['iterations'] + 1):
+            if options['cold']:
+                cache.clear()
+                charts.png_cache.clear()
+            if prepare:
+                prepare(fixture)
+            queries = QueryTimer()
+            with connection.execute_wrapper(queries), TemplateTimer() as templates:
+                started = time.perf_counter()
+                response = client.get(path, query)
+                size = (sum(len(chunk) for chunk in response.streaming_content)
+                        if response.streaming else len(response.content))
+                elapsed = time.perf_counter() - started
+            if iteration:
+                totals.append(elapsed)
+                db_times.append(queries.seconds)
+                template_times.append(templates.seconds)
+        return {
+            'status': response.status_code,
+            'total_ms': round(statistics.median(totals) * 1000, 3),
+            'db_ms': round(statistics.median(db_times) * 1000, 3),
+            'template_ms': round(statistics.median(template_times) * 1000, 3),
+            'queries': queries.count,
+            'bytes': size,
+        }
+
+    def _compare(self, baseline, results, options):
+        previous = {(row['scale'], row['name']): row for row in baseline}
+        regressions = []
+        self.stdout.write(f"\n{'adres':<30} {'skala':>8} {'przed':>9} {'teraz':>9} {'zmiana':>8}")
+        for row in results:
+            before = previous.get((row['scale'], row['name']))
+            if before is None:
+                continue
+            change = row['total_ms'] / before['total_ms'] - 1 if before['total_ms'] else 0
+            slower = (change > options['threshold']
+                      and row['total_ms'] - before['total_ms'] > options['min_delta_ms'])
+            more_queries = row['queries'] > before['queries']
+            marker = ''
+            if slower or more_queries:
+                regressions.append(row)
+                marker = '  REGRESJA' + (f" (zapytania {before['queries']} -> {row['queries']})" if more_queries else '')
+            self.stdout.write(f"{row['name']:<30} {row['scale']:>8} {before['total_ms']:>7.1f}ms "
+                              f"{row['total_ms']:>7.1f}ms {change:>+7.0%}{marker}")
+        return regressions
@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from finance import rollups
+from finance.models import BudgetLimit
+from finance.views import transaction_feed
+
+# Dowolne wartości parametrów - liczy się tylko kształt zapytania
+SAMPLE_USER_ID = 0
+SAMPLE_DATE = datetime.date(2024, 1, 1)
+
+
+def query_plans():
+    """(nazwa, queryset, indeks który musi pojawić się w planie) - te same zapytania co w widokach"""
+    feed = transaction_feed(SAMPLE_USER_ID).order_by('-date', '-id')
+    return [
+        ('transaction_list: pierwsza strona', feed, 'transaction_user_date_idx'),
+        ('transaction_list_more: strona po kursorze',
+         feed.filter(Q(date__lt=SAMPLE_DATE) | Q(date=SAMPLE_DATE, id__lt=1)), 'transaction_user_date_idx'),
+        # Grupowanie po (typ, miesiąc, waluta) - wszystkie kolumny są w indeksie miesięcznym
+        ('transaction_list: sumy', rollups.totals_by_type(SAMPLE_USER_ID), 'rollup_user_month_idx'),
+        ('analysis: wydatki per kategoria', rollups.expenses_by_category(SAMPLE_USER_ID), 'rollup_user_type_cat_idx'),
+        ('analysis: bilans miesięczny', rollups.monthly_totals(SAMPLE_USER_ID), 'rollup_user_month_idx'),
+        ('rebuild_rollups: sumy z transakcji', rollups._source_rows([SAMPLE_USER_ID]), 'transaction_user_cat_date_idx'),
+        ('limity budżetu w miesiącu', BudgetLimit.objects.filter(user=SAMPLE_USER_ID, month=SAMPLE_DATE),
+         'budgetlimit_user_month_idx'),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Sprawdza (EXPLAIN QUERY PLAN), czy zapytania widoków używają dedykowanych indeksów. "
+            "Kończy się błędem, jeśli któreś zapytanie przestało z nich korzystać.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"Pominięto: sprawdzanie planów dotyczy SQLite (baza: {connection.vendor}).")
+            return
+
+        failures = []
+        for name, queryset, index in query_plans():
+            plan = queryset.explain()
+            if index in plan:
+                self.stdout.write(f"OK    {name}: {index}")
+            else:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"BŁĄD  {name}: brak {index} w planie"))
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} zapytań nie korzysta z oczekiwanych indeksów")
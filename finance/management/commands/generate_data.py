@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from finance import synthetic
+
+
+class Command(BaseCommand):
+    help = ("Generuje syntetycznych użytkowników z historią transakcji i limitami budżetów "
+            "(do benchmarków i testów obciążeniowych). Hasło wszystkich użytkowników: --password.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions', type=int, default=100000, help="Liczba transakcji na użytkownika")
+        parser.add_argument('--months', type=int, default=36, help="Długość historii w miesiącach")
+        parser.add_argument('--prefix', default='demo', help="Nazwy użytkowników: <prefix>-1, <prefix>-2, ...")
+        parser.add_argument('--password', default='demo12345')
+        parser.add_argument('--no-budgets', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        categories = synthetic.ensure_categories()
+        users = synthetic.create_users(options['prefix'], options['users'], options['password'])
+        total = 0
+
+        def progress(user, written):
+            rate = (total + written) / (time.monotonic() - started)
+            self.stdout.write(f"\r{user.username}: {written}/{options['transactions']} ({rate:.0f} wierszy/s)",
+                              ending='')
+            self.stdout.flush()
+
+        for i, user in enumerate(users):
+            # Osobne ziarno dla każdego użytkownika - te same dane niezależnie od kolejności
+            generator = synthetic.Generator(categories, months=options['months'], seed=f"{options['seed']}-{i}")
+            synthetic.populate(user, generator, options['transactions'], budgets=not options['no_budgets'],
+                               progress=progress)
+            total += options['transactions']
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Użytkownicy: {len(users)}, transakcje: {total} w {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.importers import BATCH_SIZE, import_statement
+from finance.models import CURRENCY_CHOICES, DEFAULT_CURRENCY, Category
+
+
+class Command(BaseCommand):
+    help = ("Importuje wyciąg bankowy (CSV lub OFX) strumieniowo, paczkami. "
+            "Przerwany import tego samego pliku jest automatycznie wznawiany.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Nazwa użytkownika, któremu dopisujemy transakcje")
+        parser.add_argument('--format', choices=['csv', 'ofx'], help="Domyślnie według rozszerzenia pliku")
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--date-column', default='date')
+        parser.add_argument('--amount-column', default='amount')
+        parser.add_argument('--description-column', default='description')
+        parser.add_argument('--date-format', default='%Y-%m-%d')
+        parser.add_argument('--income-category', help="Kategoria dla wpływów bez pasującej reguły")
+        parser.add_argument('--expense-category', help="Kategoria dla wydatków bez pasującej reguły")
+        parser.add_argument('--currency', choices=[code for code, label in CURRENCY_CHOICES], default=DEFAULT_CURRENCY,
+                            help="Waluta rachunku (wszystkich operacji z wyciągu)")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-resume', action='store_true', help="Zacznij od początku zamiast wznawiać")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"Nie ma pliku {path}")
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Nie ma użytkownika {options['user']}")
+
+        format = options['format'] or ('ofx' if path.suffix.lower() in ('.ofx', '.qfx') else 'csv')
+        income_category = self._category(options['income_category'], 'INCOME')
+        expense_category = self._category(options['expense_category'], 'EXPENSE')
+
+        with path.open('rb') as fileobj:
+            job = import_statement(
+                user, path.name, fileobj, format=format, encoding=options['encoding'],
+                resume=not options['no_resume'], income_category=income_category,
+                expense_category=expense_category, batch_size=options['batch_size'], progress=self._progress,
+                currency=options['currency'],
+                **({} if format == 'ofx' else {
+                    'delimiter': options['delimiter'], 'date_column': options['date_column'],
+                    'amount_column': options['amount_column'],
+                    'description_column': options['description_column'], 'date_format': options['date_format'],
+                }),
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Zaimportowano {job.rows_imported} transakcji z {job.rows_read} wierszy "
+            f"(duplikaty: {job.rows_duplicate}, błędne: {job.rows_invalid}) "
+            f"w {job.seconds:.1f} s - {job.rows_per_second:.0f} wierszy/s"
+        ))
+
+    def _category(self, name, type):
+        if not name:
+            return None
+        try:
+            return Category.objects.get(name=name, type=type)
+        except Category.DoesNotExist:
+            raise CommandError(f"Nie ma kategorii '{name}' typu {type}")
+        except Category.MultipleObjectsReturned:
+            raise CommandError(f"Więcej niż jedna kategoria '{name}' typu {type}")
+
+    def _progress(self, job):
+        self.stdout.write(f"{job.rows_read} wierszy, {job.rows_per_second:.0f} wierszy/s")
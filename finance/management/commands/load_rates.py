@@ -0,0 +1,65 @@
+import csv
+import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finance import caching
+from finance.models import CURRENCY_CHOICES, DEFAULT_CURRENCY, ExchangeRate
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = ("Wczytuje kursy walut z plików CSV (kolumny date, currency, rate - ile "
+            f"{DEFAULT_CURRENCY} za 1 jednostkę waluty). Istniejące kursy z tych samych dni są nadpisywane.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, paths, delimiter, encoding, **options):
+        rates = {}
+        for name in paths:
+            path = Path(name)
+            if not path.is_file():
+                raise CommandError(f"Nie ma pliku {path}")
+            with path.open(encoding=encoding, newline='') as stream:
+                for line, row in enumerate(csv.DictReader(stream, delimiter=delimiter), start=2):
+                    currency, date, rate = self._parse(row, f"{path.name}:{line}")
+                    # Ten sam dzień w kilku plikach - wygrywa ostatni
+                    rates[currency, date] = rate
+
+        objects = [ExchangeRate(currency=currency, date=date, rate=rate) for (currency, date), rate in rates.items()]
+        with transaction.atomic():
+            ExchangeRate.objects.bulk_create(objects, batch_size=BATCH_SIZE, update_conflicts=True,
+                                             unique_fields=['currency', 'date'], update_fields=['rate'])
+            # Procesy przeładują tabelę kursów, a pulpity przeliczą się z nowymi kursami
+            transaction.on_commit(caching.bump_rates)
+
+        per_currency = {}
+        for currency, date in rates:
+            per_currency[currency] = per_currency.get(currency, 0) + 1
+        summary = ', '.join(f"{currency}: {count}" for currency, count in sorted(per_currency.items()))
+        self.stdout.write(self.style.SUCCESS(f"Wczytano {len(objects)} kursów ({summary or 'brak'})."))
+
+    def _parse(self, row, where):
+        currencies = {code for code, label in CURRENCY_CHOICES} - {DEFAULT_CURRENCY}
+        currency = (row.get('currency') or '').strip().upper()
+        if currency not in currencies:
+            raise CommandError(f"{where}: nieznana waluta {currency!r} (dozwolone: {', '.join(sorted(currencies))})")
+        try:
+            date = datetime.date.fromisoformat((row.get('date') or '').strip())
+        except ValueError:
+            raise CommandError(f"{where}: niepoprawna data {row.get('date')!r} (oczekiwano RRRR-MM-DD)")
+        try:
+            # Przecinek dziesiętny (np. tabele NBP)
+            rate = Decimal((row.get('rate') or '').strip().replace(',', '.'))
+        except InvalidOperation:
+            raise CommandError(f"{where}: niepoprawny kurs {row.get('rate')!r}")
+        if not rate.is_finite() or rate <= 0:
+            raise CommandError(f"{where}: kurs musi być dodatni")
+        return currency, date, rate
@@ -0,0 +1,141 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/', '/analysis/', '/data/balance.json', '/analysis/data/monthly.json']
+
+ASGI_SERVERS = {
+    'uvicorn': lambda port: [sys.executable, '-m', 'uvicorn', 'core.asgi:application',
+                             '--port', str(port), '--log-level', 'warning', '--no-access-log'],
+    'daphne': lambda port: [sys.executable, '-m', 'daphne', '-p', str(port), 'core.asgi:application'],
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Test obciążeniowy: uruchamia lokalnie serwer ASGI (uvicorn/daphne) i WSGI (runserver), "
+            "zasypuje oba współbieżnymi żądaniami jako wskazany użytkownik i porównuje opóźnienia p50/p99.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="Nazwa użytkownika, jako który wysyłamy żądania")
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--requests', type=int, default=400, help="Liczba żądań na serwer")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--asgi-server', choices=sorted(ASGI_SERVERS), default='uvicorn')
+        parser.add_argument('--asgi-url', help="Adres działającego już serwera ASGI (zamiast uruchamiać własny)")
+        parser.add_argument('--wsgi-url', help="Adres działającego już serwera WSGI (zamiast uruchamiać własny)")
+        parser.add_argument('--port', type=int, default=8701, help="Pierwszy z dwóch portów dla serwerów")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get_by_natural_key(options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Nie ma użytkownika {options['user']!r}")
+
+        session = self._login(user)
+        processes = []
+        try:
+            targets = []
+            for name, url, command, async_views in [
+                ('ASGI', options['asgi_url'], ASGI_SERVERS[options['asgi_server']](options['port']), '1'),
+                ('WSGI', options['wsgi_url'],
+                 [sys.executable, 'manage.py', 'runserver', '--noreload', str(options['port'] + 1)], '0'),
+            ]:
+                if url is None:
+                    port = options['port'] + len(targets)
+                    url = f'http://127.0.0.1:{port}'
+                    env = dict(os.environ, FINANCE_ASYNC_VIEWS=async_views)
+                    processes.append(subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+                    self._wait_for(port)
+                targets.append((name, url.rstrip('/')))
+
+            cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+            results = {name: self._run(url, cookie, options) for name, url in targets}
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+            session.delete()
+
+        self._report(results, options['paths'])
+
+    def _login(self, user):
+        # Sesja zapisana w bazie - oba serwery czytają ją tak samo jak po zwykłym logowaniu
+        session = SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
+
+    def _wait_for(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Serwer na porcie {port} nie wystartował w {timeout} s")
+
+    def _fetch(self, url, cookie):
+        request = urllib.request.Request(url, headers={'Cookie': cookie})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                # Przekierowanie (np. na stronę logowania) też liczymy jako błąd
+                ok = response.status == 200 and response.url == url
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def _run(self, base_url, cookie, options):
+        paths = options['paths']
+        # Rozgrzewka: połączenia z bazą, pula wykresów, cache pulpitu
+        for path in paths:
+            self._fetch(base_url + path, cookie)
+
+        urls = [base_url + paths[i % len(paths)] for i in range(options['requests'])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            samples = list(pool.map(lambda url: self._fetch(url, cookie), urls))
+        elapsed = time.perf_counter() - started
+
+        by_path = {path: [] for path in paths}
+        errors = 0
+        for i, (seconds, ok) in enumerate(samples):
+            by_path[paths[i % len(paths)]].append(seconds)
+            errors += not ok
+        return {'by_path': by_path, 'all': [seconds for seconds, ok in samples],
+                'errors': errors, 'throughput': len(samples) / elapsed}
+
+    def _report(self, results, paths):
+        self.stdout.write(f"{'serwer':<6} {'ścieżka':<32} {'p50':>9} {'p99':>9}")
+        for name, result in results.items():
+            for path in paths + [None]:
+                samples = result['all'] if path is None else result['by_path'][path]
+                self.stdout.write(f"{name:<6} {path or '(wszystkie)':<32} "
+                                  f"{percentile(samples, 0.5) * 1000:>7.1f}ms {percentile(samples, 0.99) * 1000:>7.1f}ms")
+            self.stdout.write(f"{name:<6} {result['throughput']:.1f} żądań/s, błędy: {result['errors']}")
+
+        if len(results) == 2:
+            asgi, wsgi = results['ASGI']['all'], results['WSGI']['all']
+            for label, fraction in (('p50', 0.5), ('p99', 0.99)):
+                ratio = percentile(asgi, fraction) / percentile(wsgi, fraction)
+                self.stdout.write(f"ASGI/WSGI {label}: {ratio:.2f}x")
@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import recurring
+
+
+class Command(BaseCommand):
+    help = ("Tworzy transakcje dla zaległych terminów reguł cyklicznych wszystkich użytkowników. "
+            "Można uruchamiać dowolnie często (np. z crona) - każdy termin powstaje tylko raz.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Materializuj terminy do tej daty (RRRR-MM-DD), domyślnie do dziś")
+        parser.add_argument('--batch-size', type=int, default=recurring.BATCH_SIZE,
+                            help="Ile reguł w jednej transakcji bazy")
+
+    def handle(self, *args, date=None, batch_size, **options):
+        today = None
+        if date:
+            try:
+                today = datetime.date.fromisoformat(date)
+            except ValueError:
+                raise CommandError(f"Nieprawidłowa data: {date}")
+
+        def progress(rules, created):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {rules} reguł, {created} transakcji")
+
+        rules, created = recurring.materialize(today, batch_size=batch_size, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Reguły z zaległymi terminami: {rules}, utworzone transakcje: {created}."))
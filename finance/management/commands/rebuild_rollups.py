@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import rollups
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera miesięczne rollupy (MonthlyRollup) i/lub sprawdza ich zgodność z transakcjami"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Ogranicz do wskazanego użytkownika (można podać wielokrotnie)")
+        parser.add_argument('--verify-only', action='store_true',
+                            help="Tylko sprawdź zgodność, nic nie zapisuj")
+
+    def handle(self, *args, usernames=None, verify_only=False, **options):
+        user_ids = None
+        if usernames:
+            user_ids = list(User.objects.filter(username__in=usernames).values_list('id', flat=True))
+            if len(user_ids) != len(set(usernames)):
+                raise CommandError("Nie znaleziono części użytkowników: %s" % ', '.join(usernames))
+
+        if not verify_only:
+            created = rollups.rebuild(user_ids)
+            self.stdout.write(f"Utworzono {created} wierszy rollupów.")
+
+        mismatches = rollups.verify(user_ids)
+        for user_id, category_id, month, currency, expected, stored in mismatches[:20]:
+            self.stderr.write(f"user={user_id} category={category_id} {month:%Y-%m} {currency}: "
+                              f"oczekiwano {expected}, zapisano {stored}")
+        if mismatches:
+            raise CommandError(f"Rollupy niezgodne z transakcjami: {len(mismatches)} rozbieżności")
+        self.stdout.write(self.style.SUCCESS("Rollupy zgodne z transakcjami."))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from finance import jobs
+
+# Co ile sekund worker zwraca do kolejki porzucone zadania i usuwa przeterminowane wyniki
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = ("Worker kolejki zadań w tle (eksporty, importy, wykresy). Można uruchomić kilka workerów "
+            "równolegle - każde zadanie wykona tylko jeden z nich.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Wykonaj zadania z kolejki i zakończ")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Przerwa przy pustej kolejce (sekundy)")
+        parser.add_argument('--max-jobs', type=int, default=0, help="Zakończ po tylu zadaniach (0 = bez limitu)")
+        parser.add_argument('--name', default=None, help="Nazwa workera (domyślnie host:pid)")
+
+    def handle(self, *args, once, sleep, max_jobs, name, **options):
+        worker = name or jobs.default_worker_name()
+        self.stdout.write(f"Worker {worker} gotowy.")
+        done = 0
+        maintained = None
+        while not max_jobs or done < max_jobs:
+            if maintained is None or time.monotonic() - maintained >= MAINTENANCE_INTERVAL:
+                requeued, failed = jobs.requeue_stale()
+                removed = jobs.cleanup()
+                if requeued or failed or removed:
+                    self.stdout.write(f"Porzucone zadania: {requeued} do kolejki, {failed} przerwane; "
+                                      f"usunięte przeterminowane: {removed}")
+                maintained = time.monotonic()
+
+            job = jobs.run_next(worker)
+            if job is None:
+                if once:
+                    break
+                # Połączenie nie wisi otwarte przez czas bezczynności
+                connections.close_all()
+                time.sleep(sleep)
+                continue
+            done += 1
+            if options['verbosity'] > 0:
+                self.stdout.write(f"{job} - próba {job.attempts}" + (f": {job.error}" if job.status != 'DONE' else ''))
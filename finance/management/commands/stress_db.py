@@ -0,0 +1,162 @@
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+from django.db.models import Sum
+
+from finance import series, synthetic
+from finance.models import Category, MonthlyRollup, Transaction
+from finance.pagination import keyset_page
+from finance.views import transaction_feed
+
+# Zmienne środowiskowe procesów dla porównywanych profili (patrz core/settings.py)
+PROFILES = {
+    'development': {'DB_PROFILE': 'development'},
+    'production': {'DB_PROFILE': 'production'},
+    'production-read': {'DB_PROFILE': 'production', 'DB_READ_ALIAS': '1'},
+}
+STRESS_USER = 'stress'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+class Command(BaseCommand):
+    help = ("Test współbieżnego zapisu do SQLite: kilka procesów jednocześnie zapisuje transakcje "
+            "(odczyt + zapis w jednej transakcji bazy, jak widoki) i czyta pulpit. Dla każdego profilu "
+            "bazy (DB_PROFILE) na świeżej bazie tymczasowej mierzy przepustowość zapisu i odsetek "
+            "błędów \"database is locked\".")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES),
+                            default=['development', 'production'])
+        parser.add_argument('--workers', type=int, default=8, help="Liczba procesów")
+        parser.add_argument('--seconds', type=float, default=10, help="Czas trwania testu jednego profilu")
+        parser.add_argument('--read-ratio', type=float, default=0.5, help="Jaka część operacji to odczyty")
+        parser.add_argument('--rows', type=int, default=20000, help="Transakcje w bazie przed startem testu")
+        # Role procesów pomocniczych uruchamianych przez ten sam command
+        parser.add_argument('--setup', action='store_true', help="(wewnętrzne) przygotuj bazę")
+        parser.add_argument('--worker', type=int, help="(wewnętrzne) numer procesu obciążającego")
+        parser.add_argument('--start-at', type=float, help="(wewnętrzne) wspólny moment startu procesów")
+
+    def handle(self, *args, **options):
+        if options['setup']:
+            return self._setup(options)
+        if options['worker'] is not None:
+            return self._work(options)
+
+        results = {}
+        with tempfile.TemporaryDirectory(prefix='finance-stress-') as directory:
+            for profile in options['profiles']:
+                path = Path(directory) / f'{profile}.sqlite3'
+                env = {**os.environ, 'DB_NAME': str(path), 'DB_READ_ALIAS': '', **PROFILES[profile]}
+                self.stdout.write(f"{profile}: przygotowanie bazy ({options['rows']} transakcji)...")
+                subprocess.run(self._command('--setup', '--rows', str(options['rows'])), cwd=settings.BASE_DIR,
+                               env=env, check=True)
+                results[profile] = self._run(env, options)
+                self._print(profile, results[profile], options)
+        self._compare(results)
+
+    def _command(self, *arguments):
+        return [sys.executable, 'manage.py', 'stress_db', *arguments]
+
+    def _run(self, env, options):
+        # Procesy startują w tym samym momencie - import Django nie rozkłada obciążenia w czasie
+        start_at = time.time() + 3
+        processes = [
+            subprocess.Popen(self._command('--worker', str(number), '--start-at', str(start_at),
+                                           '--seconds', str(options['seconds']),
+                                           '--read-ratio', str(options['read_ratio'])),
+                             cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE)
+            for number in range(options['workers'])
+        ]
+        totals = {'writes': 0, 'reads': 0, 'locked': 0, 'errors': 0, 'write_latency': [], 'read_latency': []}
+        for process in processes:
+            output, _ = process.communicate()
+            if process.returncode:
+                raise CommandError(f"Proces obciążający zakończył się błędem ({process.returncode})")
+            result = json.loads(output.decode().strip().splitlines()[-1])
+            for key, value in result.items():
+                totals[key] += value
+        return totals
+
+    def _setup(self, options):
+        call_command('migrate', verbosity=0)
+        categories = synthetic.ensure_categories()
+        user = synthetic.create_users(STRESS_USER, 1, 'stress')[0]
+        synthetic.populate(user, synthetic.Generator(categories, seed='stress'), options['rows'])
+
+    def _work(self, options):
+        user = get_user_model().objects.get(username=f'{STRESS_USER}-1')
+        categories = list(Category.objects.filter(type='EXPENSE'))
+        rng = random.Random(options['worker'])
+        result = {'writes': 0, 'reads': 0, 'locked': 0, 'errors': 0, 'write_latency': [], 'read_latency': []}
+
+        time.sleep(max(0.0, options['start_at'] - time.time()))
+        deadline = time.time() + options['seconds']
+        while time.time() < deadline:
+            write = rng.random() >= options['read_ratio']
+            started = time.perf_counter()
+            try:
+                if write:
+                    self._write(user, rng.choice(categories), rng)
+                else:
+                    self._read(user)
+            except OperationalError as error:
+                message = str(error)
+                result['locked' if 'locked' in message or 'busy' in message else 'errors'] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            result['writes' if write else 'reads'] += 1
+            result['write_latency' if write else 'read_latency'].append(elapsed)
+        self.stdout.write(json.dumps(result))
+
+    def _write(self, user, category, rng):
+        # Jak widoki zapisujące: najpierw odczyt (np. stan budżetu), potem zapis, w jednej transakcji bazy.
+        # Przy zwykłym BEGIN to tu pojawia się "database is locked" - blokada zapisu brana za późno.
+        with transaction.atomic():
+            MonthlyRollup.objects.filter(user=user, category=category).aggregate(Sum('total'))
+            Transaction.objects.create(user=user, category=category, date=datetime.date.today(),
+                                       amount=Decimal(rng.randint(100, 20000)) / 100, description='stress')
+
+    def _read(self, user):
+        list(keyset_page(transaction_feed(user))[0])
+        series.balance(user)
+
+    def _print(self, profile, totals, options):
+        seconds = options['seconds']
+        attempts = totals['writes'] + totals['locked'] + totals['errors']
+        self.stdout.write(
+            f"  zapisy: {totals['writes'] / seconds:8.1f}/s   odczyty: {totals['reads'] / seconds:8.1f}/s   "
+            f"zablokowane: {totals['locked']} ({totals['locked'] / attempts if attempts else 0:.1%})   "
+            f"inne błędy: {totals['errors']}\n"
+            f"  zapis p50/p99: {percentile(totals['write_latency'], 0.5) * 1000:.1f}/"
+            f"{percentile(totals['write_latency'], 0.99) * 1000:.1f} ms   "
+            f"odczyt p50/p99: {percentile(totals['read_latency'], 0.5) * 1000:.1f}/"
+            f"{percentile(totals['read_latency'], 0.99) * 1000:.1f} ms"
+        )
+
+    def _compare(self, results):
+        if 'development' not in results or len(results) < 2:
+            return
+        before = results['development']
+        self.stdout.write("\nWzględem profilu development:")
+        for profile, totals in results.items():
+            if profile == 'development':
+                continue
+            ratio = totals['writes'] / before['writes'] if before['writes'] else float('inf')
+            self.stdout.write(f"  {profile}: zapisy x{ratio:.2f}, zablokowane {before['locked']} -> {totals['locked']}")
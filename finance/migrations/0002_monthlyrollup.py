@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    # Wypełniamy rollupy dla transakcji, które istniały przed tą migracją
+    Transaction = apps.get_model('finance', 'Transaction')
+    MonthlyRollup = apps.get_model('finance', 'MonthlyRollup')
+    rows = (Transaction.objects.filter(category__isnull=False)
+            .annotate(month=TruncMonth('date'))
+            .values('user_id', 'category_id', 'category__type', 'month')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by())
+    MonthlyRollup.objects.bulk_create(
+        MonthlyRollup(user_id=row['user_id'], category_id=row['category_id'], category_type=row['category__type'],
+                      month=row['month'], total=row['total'], count=row['count'])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_type', models.CharField(choices=[('INCOME', 'Dochód'), ('EXPENSE', 'Wydatek')], max_length=7)),
+                ('month', models.DateField(help_text='Pierwszy dzień miesiąca')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='finance.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'category', 'month')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
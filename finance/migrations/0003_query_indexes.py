@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_monthlyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budgetlimit',
+            index=models.Index(fields=['user', 'month'], name='budgetlimit_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrollup',
+            index=models.Index(fields=['user', 'month', 'category_type', 'total'], name='rollup_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrollup',
+            index=models.Index(fields=['user', 'category_type', 'category', 'total'], name='rollup_user_type_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-id'], name='transaction_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'date', 'amount'], name='transaction_user_cat_date_idx'),
+        ),
+    ]
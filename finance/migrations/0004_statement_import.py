@@ -0,0 +1,76 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Plik')),
+                ('file_hash', models.CharField(max_length=64)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('ofx', 'OFX')], max_length=3)),
+                ('status', models.CharField(choices=[('RUNNING', 'W trakcie'), ('DONE', 'Zakończony'), ('FAILED', 'Błąd')], default='RUNNING', max_length=7)),
+                ('rows_read', models.IntegerField(default=0)),
+                ('rows_imported', models.IntegerField(default=0)),
+                ('rows_duplicate', models.IntegerField(default=0)),
+                ('rows_invalid', models.IntegerField(default=0)),
+                ('seconds', models.FloatField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Import wyciągu',
+                'verbose_name_plural': 'Importy wyciągów',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern', models.CharField(max_length=200, verbose_name='Fragment opisu')),
+                ('priority', models.IntegerField(default=0, help_text='Niższy = sprawdzany wcześniej', verbose_name='Priorytet')),
+            ],
+            options={
+                'verbose_name': 'Reguła importu',
+                'verbose_name_plural': 'Reguły importu',
+                'ordering': ['priority', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('user', 'fingerprint'), name='transaction_user_fingerprint_uniq'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='importrule',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='finance.category', verbose_name='Kategoria'),
+        ),
+        migrations.AddField(
+            model_name='importrule',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Indeks pełnotekstowy opisów transakcji (SQLite FTS5, tabela "external content" - tekst
+# trzymamy tylko w finance_transaction, FTS przechowuje sam indeks). Triggery aktualizują
+# indeks przy każdym zapisie, także przy masowych INSERT-ach importu wyciągów.
+# remove_diacritics 2 - "zabka" znajduje "Żabka"; prefix - szybkie wyszukiwanie początków słów.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE finance_transaction_fts USING fts5(
+        description,
+        content='finance_transaction', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER finance_transaction_fts_insert AFTER INSERT ON finance_transaction BEGIN
+        INSERT INTO finance_transaction_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER finance_transaction_fts_delete AFTER DELETE ON finance_transaction BEGIN
+        INSERT INTO finance_transaction_fts(finance_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER finance_transaction_fts_update AFTER UPDATE OF description ON finance_transaction BEGIN
+        INSERT INTO finance_transaction_fts(finance_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO finance_transaction_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    # Indeks dla transakcji, które istniały przed migracją
+    "INSERT INTO finance_transaction_fts(finance_transaction_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS finance_transaction_fts_insert',
+    'DROP TRIGGER IF EXISTS finance_transaction_fts_delete',
+    'DROP TRIGGER IF EXISTS finance_transaction_fts_update',
+    'DROP TABLE IF EXISTS finance_transaction_fts',
+]
+
+
+def _run_on_sqlite(statements):
+    # Na innych bazach wyszukiwanie działa bez indeksu FTS (patrz finance/search.py)
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_statement_import'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run_on_sqlite(CREATE_SQL), _run_on_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_transaction_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Kwota')),
+                ('description', models.CharField(blank=True, max_length=200, verbose_name='Opis')),
+                ('cadence', models.CharField(choices=[('WEEKLY', 'Co tydzień'), ('MONTHLY', 'Co miesiąc'), ('QUARTERLY', 'Co kwartał'), ('YEARLY', 'Co rok')], default='MONTHLY', max_length=9, verbose_name='Powtarzanie')),
+                ('start_date', models.DateField(verbose_name='Pierwszy termin')),
+                ('end_date', models.DateField(blank=True, help_text='Puste = bez końca', null=True, verbose_name='Ostatni termin')),
+                ('last_date', models.DateField(blank=True, editable=False, null=True)),
+                ('next_date', models.DateField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='finance.category', verbose_name='Kategoria')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transakcja cykliczna',
+                'verbose_name_plural': 'Transakcje cykliczne',
+                'ordering': ['next_date', 'id'],
+                'indexes': [models.Index(fields=['next_date', 'id'], name='recurringrule_next_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_balances(apps, schema_editor):
+    # Sumy narastające dla transakcji, które istniały przed tą migracją
+    Transaction = apps.get_model('finance', 'Transaction')
+    DailyBalance = apps.get_model('finance', 'DailyBalance')
+    rows = (Transaction.objects.filter(category__isnull=False)
+            .values('user_id', 'category_id', 'date')
+            .annotate(day_total=Sum('amount'), day_count=Count('id'))
+            .order_by('user_id', 'category_id', 'date'))
+    balances, key, total, count = [], None, 0, 0
+    for row in rows:
+        if (row['user_id'], row['category_id']) != key:
+            key, total, count = (row['user_id'], row['category_id']), 0, 0
+        total += row['day_total']
+        count += row['day_count']
+        balances.append(DailyBalance(user_id=row['user_id'], category_id=row['category_id'], date=row['date'],
+                                     day_total=row['day_total'], day_count=row['day_count'],
+                                     total=total, count=count))
+    DailyBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_recurring_rule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('day_total', models.DecimalField(decimal_places=2, default=0, help_text='Suma z tego dnia', max_digits=14)),
+                ('day_count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, help_text='Suma od początku do tego dnia', max_digits=16)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='finance.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailybalance',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'date'), name='dailybalance_user_cat_date_uniq'),
+        ),
+        migrations.RunPython(build_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_daily_balance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('export', 'Eksport transakcji'), ('import', 'Import wyciągu'), ('chart', 'Wykres całej historii')], max_length=10)),
+                ('params', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('QUEUED', 'W kolejce'), ('RUNNING', 'W trakcie'), ('DONE', 'Gotowe'), ('FAILED', 'Błąd')], default='QUEUED', max_length=7)),
+                ('attempts', models.IntegerField(default=0)),
+                ('run_after', models.DateTimeField()),
+                ('progress', models.CharField(blank=True, max_length=200)),
+                ('error', models.TextField(blank=True)),
+                ('input_file', models.CharField(blank=True, max_length=255)),
+                ('result_file', models.CharField(blank=True, max_length=255)),
+                ('result_name', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Zadanie w tle',
+                'verbose_name_plural': 'Zadania w tle',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after', 'id'], name='job_queue_idx'), models.Index(fields=['user', 'status'], name='job_user_status_idx'), models.Index(fields=['expires_at'], name='job_expires_idx')],
+            },
+        ),
+    ]
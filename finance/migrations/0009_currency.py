@@ -0,0 +1,100 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:55
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+
+search = import_module('finance.migrations.0005_transaction_search')
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Dodanie kolumny na SQLite przebudowuje tabelę finance_transaction, a razem ze starą
+    # tabelą znikają triggery indeksu FTS - zakładamy je ponownie i przebudowujemy indeks
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in search.DROP_SQL[:3] + search.CREATE_SQL[1:]:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_background_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Przy cofaniu migracji tabela przebudowuje się po raz drugi - ta operacja wykona się wtedy na końcu
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('PLN', 'PLN - złoty'), ('EUR', 'EUR - euro'), ('USD', 'USD - dolar amerykański'), ('GBP', 'GBP - funt brytyjski'), ('CHF', 'CHF - frank szwajcarski')], max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'verbose_name': 'Kurs waluty',
+                'verbose_name_plural': 'Kursy walut',
+                'ordering': ['currency', 'date'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='dailybalance',
+            name='dailybalance_user_cat_date_uniq',
+        ),
+        migrations.RemoveIndex(
+            model_name='monthlyrollup',
+            name='rollup_user_month_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='monthlyrollup',
+            name='rollup_user_type_cat_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlyrollup',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='dailybalance',
+            name='currency',
+            field=models.CharField(choices=[('PLN', 'PLN - złoty'), ('EUR', 'EUR - euro'), ('USD', 'USD - dolar amerykański'), ('GBP', 'GBP - funt brytyjski'), ('CHF', 'CHF - frank szwajcarski')], default='PLN', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='monthlyrollup',
+            name='currency',
+            field=models.CharField(choices=[('PLN', 'PLN - złoty'), ('EUR', 'EUR - euro'), ('USD', 'USD - dolar amerykański'), ('GBP', 'GBP - funt brytyjski'), ('CHF', 'CHF - frank szwajcarski')], default='PLN', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringrule',
+            name='currency',
+            field=models.CharField(choices=[('PLN', 'PLN - złoty'), ('EUR', 'EUR - euro'), ('USD', 'USD - dolar amerykański'), ('GBP', 'GBP - funt brytyjski'), ('CHF', 'CHF - frank szwajcarski')], default='PLN', max_length=3, verbose_name='Waluta'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency',
+            field=models.CharField(choices=[('PLN', 'PLN - złoty'), ('EUR', 'EUR - euro'), ('USD', 'USD - dolar amerykański'), ('GBP', 'GBP - funt brytyjski'), ('CHF', 'CHF - frank szwajcarski')], default='PLN', max_length=3, verbose_name='Waluta'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlyrollup',
+            unique_together={('user', 'category', 'month', 'currency')},
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrollup',
+            index=models.Index(fields=['user', 'month', 'category_type', 'currency', 'total'], name='rollup_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrollup',
+            index=models.Index(fields=['user', 'category_type', 'category', 'month', 'currency', 'total'], name='rollup_user_type_cat_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailybalance',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'currency', 'date'), name='dailybalance_user_cat_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='exchangerate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='exchangerate_currency_date_uniq'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User  # Do przypisywania danych do użytkownika
 
+# Waluta bazowa: w niej są kursy z ExchangeRate (ile złotych za jednostkę waluty)
+# i w niej zapisane są transakcje sprzed wprowadzenia walut
+DEFAULT_CURRENCY = 'PLN'
+CURRENCY_CHOICES = (
+    ('PLN', 'PLN - złoty'),
+    ('EUR', 'EUR - euro'),
+    ('USD', 'USD - dolar amerykański'),
+    ('GBP', 'GBP - funt brytyjski'),
+    ('CHF', 'CHF - frank szwajcarski'),
+)
+
 
 class Category(models.Model):
     TYPE_CHOICES = (
@@ -22,17 +33,31 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)  # Każdy widzi tylko swoje finanse
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Kwota")
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY, verbose_name="Waluta")
     description = models.TextField(blank=True, verbose_name="Opis")
     date = models.DateField(verbose_name="Data transakcji")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Odcisk wiersza z wyciągu bankowego - chroni przed podwójnym importem tych samych operacji
+    fingerprint = models.CharField(max_length=40, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-date']  # Najnowsze na górze
         verbose_name = "Transakcja"
         verbose_name_plural = "Transakcje"
+        indexes = [
+            # Lista transakcji: WHERE user = ? ORDER BY date DESC, id DESC (+ kursor keyset)
+            models.Index(fields=['user', '-date', '-id'], name='transaction_user_date_idx'),
+            # Agregaty per kategoria w czasie (rebuild/verify rollupów, raporty)
+            models.Index(fields=['user', 'category', 'date', 'amount'], name='transaction_user_cat_date_idx'),
+        ]
+        constraints = [
+            # NULL-e są w indeksie unikalnym rozróżnialne, więc ręcznie dodane transakcje go nie blokują
+            models.UniqueConstraint(fields=['user', 'fingerprint'], name='transaction_user_fingerprint_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.amount} PLN - {self.category.name}"
+        from finance.categories import registry  # rejestr importuje modele
+        return f"{self.amount} {self.currency} - {registry().name(self.category_id, 'bez kategorii')}"
 
 
 class BudgetLimit(models.Model):
@@ -44,6 +69,245 @@ class BudgetLimit(models.Model):
 
     class Meta:
         unique_together = ('user', 'category', 'month')  # Unikalny limit dla usera/kategorii/miesiąca
+        indexes = [
+            # Limity użytkownika na dany miesiąc (bez względu na kategorię)
+            models.Index(fields=['user', 'month'], name='budgetlimit_user_month_idx'),
+        ]
+
+    def __str__(self):
+        from finance.categories import registry
+        return f"Limit {registry().name(self.category_id)}: {self.limit_amount}"
+
+
+class MonthlyRollup(models.Model):
+    """
+    Zmaterializowane sumy transakcji per (użytkownik, kategoria, miesiąc, waluta).
+    Aktualizowane przyrostowo przy każdym zapisie transakcji (finance/signals.py),
+    dzięki czemu pulpit i analizy nie skanują całej tabeli Transaction. Sumy są w walucie
+    transakcji - na walutę raportów przelicza je odczyt (finance/currency.py), więc zmiana
+    kursów nie wymaga przeliczania rollupów.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    # Kopia Category.type - sumy wpływów/wydatków bez JOIN-a z kategoriami
+    category_type = models.CharField(max_length=7, choices=Category.TYPE_CHOICES)
+    month = models.DateField(help_text="Pierwszy dzień miesiąca")
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'category', 'month', 'currency')
+        indexes = [
+            # Indeksy pokrywające: sumy per miesiąc oraz per typ/kategoria bez sięgania do tabeli
+            models.Index(fields=['user', 'month', 'category_type', 'currency', 'total'], name='rollup_user_month_idx'),
+            models.Index(fields=['user', 'category_type', 'category', 'month', 'currency', 'total'],
+                         name='rollup_user_type_cat_idx'),
+        ]
 
     def __str__(self):
-        return f"Limit {self.category.name}: {self.limit_amount}"
\ No newline at end of file
+        return f"{self.month:%Y-%m} {self.category_id}: {self.total} {self.currency} ({self.count})"
+
+
+class DailyBalance(models.Model):
+    """
+    Sumy narastające (prefiksowe) per (użytkownik, kategoria, waluta): wiersz na każdy dzień z transakcjami.
+    Suma z dowolnego okresu [od, do] to różnica dwóch wierszy - ostatniego z datą <= do i ostatniego
+    z datą < od - czyli dwa wyszukiwania w indeksie na kategorię, niezależnie od liczby transakcji.
+    Utrzymywane przyrostowo przez finance/balances.py (sygnał transactions_changed).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    date = models.DateField()
+    day_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma z tego dnia")
+    day_count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0, help_text="Suma od początku do tego dnia")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Indeks unikalny służy też wyszukiwaniu:
+            # WHERE user = ? AND category = ? AND currency = ? AND date <= ? ORDER BY date DESC
+            models.UniqueConstraint(fields=['user', 'category', 'currency', 'date'],
+                                    name='dailybalance_user_cat_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.category_id}: {self.total} {self.currency} ({self.count})"
+
+
+class RecurringRule(models.Model):
+    """
+    Transakcja cykliczna (pensja, czynsz, abonament). Terminy materializuje finance/recurring.py;
+    last_date to znacznik postępu - ostatni już utworzony termin - a next_date najbliższy
+    nieutworzony (NULL, gdy reguła się skończyła), więc każde uruchomienie bierze tylko nowe terminy.
+    """
+    CADENCE_CHOICES = (
+        ('WEEKLY', 'Co tydzień'),
+        ('MONTHLY', 'Co miesiąc'),
+        ('QUARTERLY', 'Co kwartał'),
+        ('YEARLY', 'Co rok'),
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Kategoria")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Kwota")
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY, verbose_name="Waluta")
+    description = models.CharField(max_length=200, blank=True, verbose_name="Opis")
+    cadence = models.CharField(max_length=9, choices=CADENCE_CHOICES, default='MONTHLY', verbose_name="Powtarzanie")
+    start_date = models.DateField(verbose_name="Pierwszy termin")
+    end_date = models.DateField(null=True, blank=True, verbose_name="Ostatni termin",
+                                help_text="Puste = bez końca")
+    last_date = models.DateField(null=True, blank=True, editable=False)
+    next_date = models.DateField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_date', 'id']
+        verbose_name = "Transakcja cykliczna"
+        verbose_name_plural = "Transakcje cykliczne"
+        indexes = [
+            # Wybór zaległych reguł: WHERE next_date <= dziś ORDER BY next_date, id
+            models.Index(fields=['next_date', 'id'], name='recurringrule_next_date_idx'),
+        ]
+
+    def __str__(self):
+        from finance.categories import registry
+        return (f"{self.amount} {self.currency} - {registry().name(self.category_id)} "
+                f"({self.get_cadence_display().lower()})")
+
+
+class ExchangeRate(models.Model):
+    """
+    Kurs średni waluty z danego dnia: ile jednostek waluty bazowej (DEFAULT_CURRENCY) za 1 jednostkę.
+    Ładowany z plików poleceniem "manage.py load_rates" - aplikacja nie pyta żadnego serwisu.
+    """
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        ordering = ['currency', 'date']
+        verbose_name = "Kurs waluty"
+        verbose_name_plural = "Kursy walut"
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchangerate_currency_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.date}: {self.rate}"
+
+
+class ImportRule(models.Model):
+    """Reguła przypisania kategorii przy imporcie wyciągu: fragment opisu -> kategoria"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    pattern = models.CharField(max_length=200, verbose_name="Fragment opisu")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Kategoria")
+    priority = models.IntegerField(default=0, verbose_name="Priorytet", help_text="Niższy = sprawdzany wcześniej")
+
+    class Meta:
+        ordering = ['priority', 'id']
+        verbose_name = "Reguła importu"
+        verbose_name_plural = "Reguły importu"
+
+    def __str__(self):
+        from finance.categories import registry
+        return f"'{self.pattern}' -> {registry().name(self.category_id)}"
+
+
+class ImportJob(models.Model):
+    """Przebieg importu wyciągu - postęp zapisywany po każdej paczce, więc przerwany import można wznowić"""
+    STATUS_CHOICES = (
+        ('RUNNING', 'W trakcie'),
+        ('DONE', 'Zakończony'),
+        ('FAILED', 'Błąd'),
+    )
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    source = models.CharField(max_length=255, verbose_name="Plik")
+    file_hash = models.CharField(max_length=64)
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default='RUNNING')
+    # Liczba wierszy pliku już przetworzonych i zatwierdzonych w bazie (punkt wznowienia)
+    rows_read = models.IntegerField(default=0)
+    rows_imported = models.IntegerField(default=0)
+    rows_duplicate = models.IntegerField(default=0)
+    rows_invalid = models.IntegerField(default=0)
+    seconds = models.FloatField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Import wyciągu"
+        verbose_name_plural = "Importy wyciągów"
+
+    def __str__(self):
+        return f"{self.source} ({self.get_status_display()})"
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0
+
+
+class BackgroundJob(models.Model):
+    """
+    Zadanie w kolejce w bazie (finance/jobs.py): ciężki eksport, import czy wykres liczony przez
+    workera "manage.py run_jobs" zamiast w żądaniu. Wynik to plik w FINANCE_JOBS_DIR, usuwany
+    razem z zadaniem po expires_at.
+    """
+    KIND_CHOICES = (
+        ('export', 'Eksport transakcji'),
+        ('import', 'Import wyciągu'),
+        ('chart', 'Wykres całej historii'),
+    )
+    STATUS_CHOICES = (
+        ('QUEUED', 'W kolejce'),
+        ('RUNNING', 'W trakcie'),
+        ('DONE', 'Gotowe'),
+        ('FAILED', 'Błąd'),
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.IntegerField(default=0)
+    # Najwcześniejsza chwila (ponownego) uruchomienia - przy ponowieniach przesuwana coraz dalej
+    run_after = models.DateTimeField()
+    progress = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    # Ścieżki względem FINANCE_JOBS_DIR: przesłany plik wejściowy i gotowy wynik
+    input_file = models.CharField(max_length=255, blank=True)
+    result_file = models.CharField(max_length=255, blank=True)
+    result_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    # Ostatni znak życia workera - zadanie bez niego przez FINANCE_JOBS_TIMEOUT wraca do kolejki
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Zadanie w tle"
+        verbose_name_plural = "Zadania w tle"
+        indexes = [
+            # Wybór następnego zadania: WHERE status = 'QUEUED' AND run_after <= teraz ORDER BY run_after, id
+            models.Index(fields=['status', 'run_after', 'id'], name='job_queue_idx'),
+            # Limity na użytkownika: zadania w kolejce / w trakcie
+            models.Index(fields=['user', 'status'], name='job_user_status_idx'),
+            models.Index(fields=['expires_at'], name='job_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def finished(self):
+        return self.status in ('DONE', 'FAILED')
@@ -0,0 +1,56 @@
+import datetime
+
+from django.db.models import Q
+
+# Stały rozmiar strony - czas odpowiedzi nie rośnie razem z historią użytkownika
+PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(transaction):
+    return f"{transaction.date.isoformat()}_{transaction.pk}"
+
+
+def decode_cursor(cursor):
+    """Zamienia kursor 'RRRR-MM-DD_id' na parę (data, id)"""
+    try:
+        date_part, pk_part = cursor.split('_', 1)
+        return datetime.date.fromisoformat(date_part), int(pk_part)
+    except (ValueError, AttributeError):
+        raise InvalidCursor(cursor)
+
+
+def _page_query(queryset, cursor, size):
+    queryset = queryset.order_by('-date', '-id')
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+    # Pobieramy o jeden wiersz więcej, żeby wiedzieć czy jest następna strona
+    return queryset[:size + 1]
+
+
+def _split_page(rows, size):
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """
+    Paginacja kursorowa (keyset) po (date, id) malejąco.
+
+    Zamiast OFFSET (który i tak musi przeskanować wszystkie wcześniejsze wiersze)
+    filtrujemy "wszystko starsze niż ostatni widziany wiersz".
+    Zwraca (lista_wierszy, kursor_następnej_strony lub None).
+    """
+    return _split_page(list(_page_query(queryset, cursor, size)), size)
+
+
+async def akeyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """keyset_page dla widoków asynchronicznych"""
+    return _split_page([row async for row in _page_query(queryset, cursor, size)], size)
@@ -0,0 +1,64 @@
+"""
+Wczytywanie ciężkich zależności (matplotlib, NumPy) przed rozwidleniem procesów serwera.
+
+Domyślnie moduły wykresów i analiz ładują je dopiero przy pierwszym użyciu (finance/charts.py,
+widoki analiz), więc proces obsługujący tylko listy, formularze i API startuje szybciej
+i zajmuje mniej pamięci. Serwer typu pre-fork uruchomiony z FINANCE_PRELOAD=1 i opcją
+wczytania aplikacji w procesie głównym (np. "gunicorn --preload core.wsgi") robi to raz,
+w procesie głównym: procesy robocze dziedziczą gotowe moduły jako strony pamięci
+współdzielone przez copy-on-write.
+
+Wykresy rysuje domyślnie pula procesów z finance/rendering.py (FINANCE_CHART_WORKERS),
+a jej procesy startują przez spawn i niczego z procesu głównego nie dziedziczą. Dlatego
+matplotlib i rozgrzany renderer Agg trafiają do procesu głównego tylko przy rysowaniu
+w procesie serwera (FINANCE_CHART_WORKERS=0); przy puli rozgrzewa się każdy jej proces
+(warm_charts jako initializer), zaraz po utworzeniu puli.
+
+gc.freeze() przenosi wszystkie obiekty z procesu głównego do pokolenia, którego garbage
+collector nie przegląda - inaczej pierwsze odśmiecanie w procesie roboczym zapisałoby
+nagłówki tych obiektów i skopiowało współdzielone strony.
+"""
+import gc
+import importlib
+import time
+
+from django.conf import settings
+
+MODULES = [
+    'numpy',
+    'finance.analytics',
+]
+CHART_MODULES = [
+    'matplotlib.figure',
+    'matplotlib.backends.backend_agg',
+]
+
+
+def import_modules(names=MODULES + CHART_MODULES):
+    for name in names:
+        importlib.import_module(name)
+
+
+def warm_charts():
+    """Importuje CHART_MODULES i rysuje próbny wykres - w procesie głównym albo w procesie puli"""
+    import_modules(CHART_MODULES)
+    from finance import charts
+
+    # Pierwszy wykres wczytuje cache fontów i przygotowuje metryki tekstu - to połowa kosztu startu
+    charts.render_png(charts.balance_spec(1, 1))
+
+
+def preload():
+    """Importuje MODULES (i rozgrzewa wykresy, gdy rysuje proces serwera), zamraża obiekty; zwraca czas w sekundach"""
+    started = time.perf_counter()
+    import_modules(MODULES)
+    if not settings.FINANCE_CHART_WORKERS:
+        warm_charts()
+    gc.freeze()
+    return time.perf_counter() - started
+
+
+def preload_if_enabled():
+    if settings.FINANCE_PRELOAD:
+        return preload()
+    return None
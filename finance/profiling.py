@@ -0,0 +1,255 @@
+"""
+Profilowanie żądań: zapytania SQL, duplikaty (N+1), rysowanie wykresów, szablony.
+
+Włączane ustawieniem FINANCE_PROFILING. Wyłączone middleware zgłasza MiddlewareNotUsed,
+więc Django w ogóle go nie wywołuje, a punkty pomiarowe (span) sprowadzają się do
+odczytu pustej zmiennej kontekstu. Pomiary trafiają do nagłówka Server-Timing i do
+histogramów w formacie Prometheusa (/metrics). Histogramy są per proces - przy wielu
+workerach Prometheus zbiera je z każdego osobno.
+
+Opcjonalnie losowa część żądań (ułamek FINANCE_PROFILING_SAMPLE_RATE) jest profilowana
+przez cProfile, a wynik zapisywany w FINANCE_PROFILING_DIR/<widok>/*.prof
+(do obejrzenia np. przez python -m pstats albo snakeviz).
+"""
+import cProfile
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('finance_request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.spans = {}
+        self._depth = Counter()
+
+    def duplicates(self):
+        """Zapytania wykonane więcej niż raz w jednym żądaniu (ten sam SQL, inne parametry = typowe N+1)"""
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+
+@contextmanager
+def span(kind):
+    """Mierzy fragment żądania (np. 'chart', 'template'); zagnieżdżone fragmenty tego samego rodzaju liczymy raz"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile._depth[kind] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._depth[kind] -= 1
+        if not profile._depth[kind]:
+            profile.spans[kind] = profile.spans.get(kind, 0.0) + time.perf_counter() - started
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_seconds += time.perf_counter() - started
+        profile.queries += 1
+        profile.statements[sql] += 1
+
+
+def _install_sql_wrapper(sender=None, connection=None, **kwargs):
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+_installed = False
+
+
+def install():
+    """Podpina pomiar SQL (każde połączenie, także tworzone później w innych wątkach) i szablonów"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(_install_sql_wrapper)
+    for connection in connections.all(initialized_only=True):
+        _install_sql_wrapper(connection=connection)
+
+    from django.template.backends.django import Template
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        with span('template'):
+            return render(self, *args, **kwargs)
+
+    Template.render = timed_render
+
+
+# --- Histogramy w formacie Prometheusa ---
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # widok -> [liczniki kubełków..., suma, liczba]
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for view, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} {series[-1]}')
+                lines.append(f'{self.name}_sum{{view="{view}"}} {series[-2]:.6f}')
+                lines.append(f'{self.name}_count{{view="{view}"}} {series[-1]}')
+        return lines
+
+
+HISTOGRAMS = {
+    'total': Histogram('finance_request_duration_seconds', 'Czas obsługi żądania', TIME_BUCKETS),
+    'db': Histogram('finance_db_duration_seconds', 'Łączny czas zapytań SQL w żądaniu', TIME_BUCKETS),
+    'queries': Histogram('finance_db_queries', 'Liczba zapytań SQL w żądaniu', COUNT_BUCKETS),
+    'chart': Histogram('finance_chart_render_seconds', 'Czas rysowania wykresów w żądaniu', TIME_BUCKETS),
+    'template': Histogram('finance_template_render_seconds', 'Czas renderowania szablonów w żądaniu', TIME_BUCKETS),
+}
+duplicate_queries = Counter()
+
+
+def counter_lines(name, help, values, type='counter'):
+    """Metryka bez histogramu; values to {etykiety: wartość} albo pojedyncza liczba"""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} {type}']
+    if not isinstance(values, dict):
+        values = {'': values}
+    for labels, value in sorted(values.items()):
+        lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return lines
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    lines.extend(counter_lines('finance_duplicate_queries_total', 'Powtórzone zapytania SQL (podejrzenie N+1)',
+                               {f'view="{view}"': count for view, count in duplicate_queries.items()}))
+    return lines
+
+
+# --- Middleware ---
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FINANCE_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = None
+        if random.random() < settings.FINANCE_PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+            _current.reset(token)
+        return self._finish(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        # Bez cProfile - w pętli zdarzeń profil mieszałby równoległe żądania
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, None)
+
+    def _finish(self, request, response, profile, profiler):
+        total = time.perf_counter() - profile.started
+        view = _view_name(request)
+        chart = profile.spans.get('chart', 0.0)
+        template = profile.spans.get('template', 0.0)
+
+        HISTOGRAMS['total'].observe(view, total)
+        HISTOGRAMS['db'].observe(view, profile.db_seconds)
+        HISTOGRAMS['queries'].observe(view, profile.queries)
+        if chart:
+            HISTOGRAMS['chart'].observe(view, chart)
+        if template:
+            HISTOGRAMS['template'].observe(view, template)
+
+        duplicates = profile.duplicates()
+        repeated = sum(count - 1 for count in duplicates.values())
+        if repeated:
+            duplicate_queries[view] += repeated
+            sql, count = max(duplicates.items(), key=lambda item: item[1])
+            if count >= settings.FINANCE_PROFILING_DUPLICATE_THRESHOLD:
+                logger.warning("%s: zapytanie wykonane %d razy w jednym żądaniu (N+1?): %s",
+                               view, count, sql[:300])
+
+        # Nagłówki HTTP są w latin-1 - opisy po angielsku, bez polskich znaków
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.queries} queries, {repeated} repeated"',
+            f'chart;dur={chart * 1000:.1f}',
+            f'tpl;dur={template * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        if profiler:
+            directory = Path(settings.FINANCE_PROFILING_DIR) / view.replace(':', '_')
+            directory.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(directory / f'{time.strftime("%Y%m%d-%H%M%S")}-{int(total * 1000)}ms.prof')
+        return response
@@ -0,0 +1,195 @@
+"""
+Transakcje cykliczne: materializacja zaległych terminów reguł RecurringRule.
+
+Każda reguła pamięta ostatni utworzony termin (last_date) i najbliższy nieutworzony
+(next_date, zindeksowany). Przebieg bierze paczkami tylko reguły z next_date <= dziś,
+wylicza ich nowe terminy, wstawia transakcje wszystkich użytkowników jednym executemany
+(importers.insert_rows), przesuwa znaczniki jednym executemany UPDATE i wysyła
+jeden sygnał transactions_changed na paczkę - wszystko w jednej transakcji bazy.
+
+Powtórne uruchomienie niczego nie dubluje: terminy są zawsze późniejsze niż last_date,
+a odcisk transakcji "recurring:<id reguły>:<data>" jest unikalny w obrębie użytkownika -
+gdy dwa procesy wezmą tę samą paczkę, drugi dostanie IntegrityError, wycofa się
+i wczyta reguły ponownie (już z przesuniętymi znacznikami).
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+
+from finance import caching, rollups
+from finance.importers import insert_rows
+from finance.rollups import add_months
+from finance.models import RecurringRule, Transaction
+from finance.signals import transactions_changed
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+# Ile razy ponawiamy paczkę, którą w międzyczasie zmaterializował inny proces
+CONFLICT_RETRIES = 3
+RUNNER_LOCK_KEY = caching.PREFIX + 'recurring:runner'
+
+# Krok terminów: (dni, miesiące)
+STEPS = {
+    'WEEKLY': (7, 0),
+    'MONTHLY': (0, 1),
+    'QUARTERLY': (0, 3),
+    'YEARLY': (0, 12),
+}
+
+
+def occurrence(rule, index):
+    """Termin numer index (od 0) - liczony zawsze od start_date, więc dzień miesiąca nie "dryfuje" po lutym"""
+    days, months = STEPS[rule.cadence]
+    if days:
+        return rule.start_date + datetime.timedelta(days=days * index)
+    return add_months(rule.start_date, months * index)
+
+
+def first_index_after(rule, day):
+    """Numer pierwszego terminu późniejszego niż day"""
+    if day < rule.start_date:
+        return 0
+    days, months = STEPS[rule.cadence]
+    if days:
+        return (day - rule.start_date).days // days + 1
+    index = ((day.year - rule.start_date.year) * 12 + day.month - rule.start_date.month) // months
+    # Przycięcie do końca miesiąca może przesunąć termin przed/za day - poprawiamy o jeden krok
+    while occurrence(rule, index) <= day:
+        index += 1
+    while index and occurrence(rule, index - 1) > day:
+        index -= 1
+    return index
+
+
+def next_after(rule, day):
+    """Pierwszy termin późniejszy niż day (None = brak, np. po end_date)"""
+    date = occurrence(rule, first_index_after(rule, day)) if day else rule.start_date
+    if rule.end_date and date > rule.end_date:
+        return None
+    return date
+
+
+def schedule(rule):
+    """Ustawia next_date po zmianie reguły; terminy do last_date włącznie nigdy nie są tworzone ponownie"""
+    rule.next_date = next_after(rule, rule.last_date)
+
+
+def index_of(rule, date):
+    """Numer terminu date (date musi być terminem reguły - np. next_date)"""
+    days, months = STEPS[rule.cadence]
+    if days:
+        return (date - rule.start_date).days // days
+    # Przycięcie do końca miesiąca zmienia tylko dzień - numer wynika z różnicy miesięcy
+    return ((date.year - rule.start_date.year) * 12 + date.month - rule.start_date.month) // months
+
+
+def due_dates(rule, today):
+    """Nowe terminy reguły do dziś (włącznie), począwszy od next_date, i termin następny po nich"""
+    date = rule.next_date
+    if date is None:
+        return [], None
+    index = index_of(rule, date)
+    limit = min(today, rule.end_date) if rule.end_date else today
+    dates = []
+    while date <= limit:
+        dates.append(date)
+        index += 1
+        date = occurrence(rule, index)
+    if rule.end_date and date > rule.end_date:
+        date = None
+    return dates, date
+
+
+def fingerprint(rule_id, date):
+    return f'recurring:{rule_id}:{date.isoformat()}'
+
+
+def materialize(today=None, queryset=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Tworzy transakcje dla wszystkich zaległych terminów (domyślnie wszystkich reguł).
+    progress(reguły, transakcje) jest wołane po każdej paczce. Zwraca (reguły, transakcje).
+    """
+    today = today or timezone.localdate()
+    queryset = RecurringRule.objects.all() if queryset is None else queryset
+    # Krotki z nazwanymi polami zamiast modeli - przy setkach tysięcy reguł to połowa czasu
+    due = (queryset.filter(next_date__lte=today).order_by('next_date', 'id')
+           .values_list('id', 'user_id', 'category_id', 'amount', 'currency', 'description', 'cadence',
+                        'start_date', 'end_date', 'last_date', 'next_date', named=True))
+    rules_done = created = conflicts = 0
+    while True:
+        # Zawsze pierwsza paczka: przetworzone reguły mają już next_date > today albo NULL
+        rules = list(due[:batch_size])
+        if not rules:
+            break
+        try:
+            created += _materialize_batch(rules, today)
+        except IntegrityError:
+            conflicts += 1
+            if conflicts > CONFLICT_RETRIES:
+                raise
+            logger.info("Paczka reguł cyklicznych utworzona równolegle przez inny proces - ponawiam")
+            continue
+        rules_done += len(rules)
+        if progress:
+            progress(rules_done, created)
+    return rules_done, created
+
+
+def _materialize_batch(rules, today):
+    values = []
+    marks = []
+    deltas = rollups.new_deltas()
+    for rule in rules:
+        dates, next_date = due_dates(rule, today)
+        for date in dates:
+            values.append((rule.user_id, rule.category_id, rule.amount, rule.description, date,
+                           fingerprint(rule.id, date), rule.currency))
+            rollups.add_delta(deltas, rule.user_id, rule.category_id, date, rule.amount, rule.currency)
+        marks.append((dates[-1] if dates else rule.last_date, next_date, rule.id))
+
+    connection = connections[router.db_for_write(RecurringRule)]
+    ops = connection.ops
+    table = ops.quote_name(RecurringRule._meta.db_table)
+    params = [(ops.adapt_datefield_value(last_date), ops.adapt_datefield_value(next_date), pk)
+              for last_date, next_date, pk in marks]
+    with transaction.atomic(using=connection.alias):
+        insert_rows(values)
+        with connection.cursor() as cursor:
+            cursor.executemany(f'UPDATE {table} SET last_date = %s, next_date = %s WHERE id = %s', params)
+        transactions_changed.send(sender=Transaction, deltas=deltas)
+    return len(values)
+
+
+def _run_periodically(interval):
+    while True:
+        # Przy kilku procesach serwera i wspólnym cache przebieg wykonuje tylko jeden z nich
+        if cache.add(RUNNER_LOCK_KEY, 1, timeout=interval):
+            try:
+                rules, created = materialize()
+                if created:
+                    logger.info("Transakcje cykliczne: %d reguł, %d nowych transakcji", rules, created)
+            except Exception:
+                logger.exception("Materializacja transakcji cyklicznych nie powiodła się")
+            finally:
+                connections.close_all()
+        time.sleep(interval)
+
+
+def start_runner():
+    """
+    Uruchamia w tle okresową materializację co FINANCE_RECURRING_INTERVAL sekund (0 = wyłączona;
+    wtedy wystarczy cron z "manage.py materialize_recurring"). Wołane z core/wsgi.py i core/asgi.py.
+    """
+    interval = settings.FINANCE_RECURRING_INTERVAL
+    if not interval:
+        return None
+    thread = threading.Thread(target=_run_periodically, args=(interval,), name='finance-recurring', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,135 @@
+"""
+Renderowanie wykresów poza wątkiem żądania - w ograniczonej puli procesów.
+
+matplotlib trzyma GIL przez cały czas rysowania, więc kilka równoległych wykresów
+renderowanych w wątkach serwera blokuje pozostałe żądania. Tutaj rysowanie trafia do
+osobnych procesów (FINANCE_CHART_WORKERS). Kolejka jest ograniczona
+(FINANCE_CHART_QUEUE_LIMIT) - nadmiarowe żądania od razu dostają RenderQueueFull
+zamiast czekać w nieskończoność - a na wynik czekamy najwyżej FINANCE_CHART_TIMEOUT sekund.
+
+Pula powstaje przy pierwszym wykresie (w procesie roboczym serwera, już po fork) i od razu
+uruchamia wszystkie procesy; każdy importuje matplotlib i rysuje próbny wykres
+(preload.warm_charts), zanim dostanie pierwsze zlecenie.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from finance import charts, preload
+
+
+class RenderError(Exception):
+    pass
+
+
+class RenderQueueFull(RenderError):
+    pass
+
+
+class RenderTimeout(RenderError):
+    pass
+
+
+_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn - fork procesu z wątkami serwera (i otwartymi połączeniami do bazy) nie jest bezpieczny
+        _pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=settings.FINANCE_CHART_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=preload.warm_charts,
+        )
+        # Procesy spawn startują na żądanie, po jednym na zlecenie - puste zlecenia uruchamiają
+        # (i rozgrzewają) wszystkie naraz, równolegle z pierwszym wykresem
+        for _ in range(settings.FINANCE_CHART_WORKERS):
+            _pool.submit(_ready)
+    return _pool
+
+
+def _ready():
+    pass
+
+
+def shutdown():
+    """Zamyka pulę (np. przed zakończeniem procesu, który ją utworzył)"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _release(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def pending():
+    """Liczba wykresów w kolejce i w trakcie rysowania"""
+    return _pending
+
+
+def submit(spec):
+    """Zleca narysowanie wykresu; RenderQueueFull, gdy kolejka jest pełna"""
+    global _pool, _pending
+    with _lock:
+        if _pending >= settings.FINANCE_CHART_QUEUE_LIMIT:
+            raise RenderQueueFull(f"W kolejce jest już {_pending} wykresów")
+        _pending += 1
+        try:
+            future = _get_pool().submit(charts.render_png, spec)
+        except BrokenProcessPool:
+            # Proces roboczy padł wcześniej (np. OOM killer) - pula jest bezużyteczna, zakładamy nową
+            _pool = None
+            future = _get_pool().submit(charts.render_png, spec)
+        except BaseException:
+            _pending -= 1
+            raise
+    future.add_done_callback(_release)
+    return future
+
+
+def _broken(error):
+    global _pool
+    with _lock:
+        _pool = None
+    return RenderError(f"Proces rysujący wykres zakończył się nieoczekiwanie: {error}")
+
+
+def render(spec):
+    """Rysuje wykres w puli i czeka na wynik (widoki synchroniczne)"""
+    if not settings.FINANCE_CHART_WORKERS:
+        return charts.render_png(spec)
+    future = submit(spec)
+    try:
+        return future.result(timeout=settings.FINANCE_CHART_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise RenderTimeout(f"Wykres nie powstał w {settings.FINANCE_CHART_TIMEOUT} s")
+    except BrokenProcessPool as error:
+        raise _broken(error)
+
+
+async def arender(spec):
+    """render() dla widoków asynchronicznych - pętla zdarzeń nie czeka na matplotlib"""
+    if not settings.FINANCE_CHART_WORKERS:
+        return await sync_to_async(charts.render_png, thread_sensitive=False)(spec)
+    try:
+        # wait_for anuluje zadanie, które jeszcze nie wystartowało - zwalnia miejsce w kolejce
+        return await asyncio.wait_for(asyncio.wrap_future(submit(spec)), settings.FINANCE_CHART_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise RenderTimeout(f"Wykres nie powstał w {settings.FINANCE_CHART_TIMEOUT} s")
+    except BrokenProcessPool as error:
+        raise _broken(error)
+
@@ -0,0 +1,236 @@
+"""
+Przyrostowe utrzymywanie tabeli MonthlyRollup.
+
+Zmiany transakcji opisujemy jako "delty": słownik
+{(user_id, category_id, data, waluta): [kwota, liczba]}. Zapis jednej transakcji
+to +kwota/+1, usunięcie -kwota/-1, edycja to usunięcie starej wersji i dodanie nowej.
+Operacje masowe (import, bulk_create) liczą delty dla całej paczki i wysyłają
+je jednym sygnałem transactions_changed.
+"""
+import calendar
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from finance.models import Category, MonthlyRollup, Transaction
+
+
+CENT = Decimal('0.01')
+# Od ilu kluczy (użytkownik, kategoria, miesiąc) delty nakładamy zbiorczo (_apply_bulk)
+BULK_THRESHOLD = 20
+# Limit parametrów zapytania w starszych SQLite to 999 (reszta to kategorie i miesiące)
+LOOKUP_CHUNK = 500
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    """Przesuwa datę o months miesięcy; 31 stycznia + 1 miesiąc = 28/29 lutego"""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def month_end(day):
+    return add_months(day.replace(day=1), 1) - datetime.timedelta(days=1)
+
+
+def new_deltas():
+    return defaultdict(lambda: [Decimal('0'), 0])
+
+
+def add_delta(deltas, user_id, category_id, date, amount, currency, count=1):
+    entry = deltas[(user_id, category_id, date, currency)]
+    entry[0] += amount * count
+    entry[1] += count
+
+
+def apply_deltas(deltas):
+    """
+    Nakłada delty na MonthlyRollup. Kilka kluczy (zapis pojedynczej transakcji) - jedno
+    UPDATE ... SET total = total + x na (user, kategoria, miesiąc, waluta); duże paczki obejmujące
+    wielu użytkowników (import, transakcje cykliczne) - patrz _apply_bulk.
+    """
+    monthly = defaultdict(lambda: [Decimal('0'), 0])
+    for (user_id, category_id, date, currency), (amount, count) in deltas.items():
+        # Transakcje bez kategorii nie wchodzą do żadnej sumy
+        if category_id is None or (not amount and not count):
+            continue
+        entry = monthly[(user_id, category_id, month_start(date), currency)]
+        entry[0] += amount
+        entry[1] += count
+    monthly = {key: value for key, value in monthly.items() if value[0] or value[1]}
+
+    if not monthly:
+        return
+
+    category_types = dict(
+        Category.objects.filter(id__in={key[1] for key in monthly}).values_list('id', 'type')
+    )
+
+    with transaction.atomic():
+        if len(monthly) > BULK_THRESHOLD:
+            _apply_bulk(monthly, category_types)
+            return
+        for key, (amount, count) in monthly.items():
+            _apply_one(key, amount, count, category_types)
+
+
+def _apply_one(key, amount, count, category_types):
+    user_id, category_id, month, currency = key
+    lookup = {'user_id': user_id, 'category_id': category_id, 'month': month, 'currency': currency}
+    updated = MonthlyRollup.objects.filter(**lookup).update(
+        total=F('total') + amount, count=F('count') + count,
+    )
+    if not updated:
+        # Brak wiersza przy usuwaniu - nie ma czego odejmować; ujemny rollup byłby tylko śmieciem
+        if count <= 0:
+            return
+        try:
+            with transaction.atomic():
+                MonthlyRollup.objects.create(
+                    category_type=category_types[category_id], total=amount, count=count, **lookup,
+                )
+        except IntegrityError:
+            # Równoległy zapis utworzył wiersz przed nami - wystarczy go zaktualizować
+            MonthlyRollup.objects.filter(**lookup).update(
+                total=F('total') + amount, count=F('count') + count,
+            )
+    elif count < 0:
+        MonthlyRollup.objects.filter(count__lte=0, **lookup).delete()
+
+
+def _apply_bulk(monthly, category_types):
+    """
+    Paczka tysięcy kluczy: istniejące wiersze wczytujemy kilkoma zapytaniami, aktualizujemy
+    jednym executemany, a brakujące tworzymy jednym bulk_create - zamiast dwóch-trzech
+    zapytań ORM na klucz.
+    """
+    existing = {}
+    user_ids = sorted({key[0] for key in monthly})
+    category_ids = {key[1] for key in monthly}
+    months = {key[2] for key in monthly}
+    for start in range(0, len(user_ids), LOOKUP_CHUNK):
+        rows = MonthlyRollup.objects.filter(
+            user_id__in=user_ids[start:start + LOOKUP_CHUNK], category_id__in=category_ids, month__in=months,
+        ).values_list('id', 'user_id', 'category_id', 'month', 'currency')
+        existing.update(((user_id, category_id, month, currency), pk)
+                        for pk, user_id, category_id, month, currency in rows)
+
+    connection = connections[router.db_for_write(MonthlyRollup)]
+    ops = connection.ops
+    total_field = MonthlyRollup._meta.get_field('total')
+    params = [
+        (ops.adapt_decimalfield_value(amount, total_field.max_digits, total_field.decimal_places), count,
+         existing[key])
+        for key, (amount, count) in monthly.items() if key in existing
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany('UPDATE %s SET %s = %s + %%s, %s = %s + %%s WHERE %s = %%s' % (
+                ops.quote_name(MonthlyRollup._meta.db_table),
+                ops.quote_name('total'), ops.quote_name('total'),
+                ops.quote_name('count'), ops.quote_name('count'), ops.quote_name('id'),
+            ), params)
+    emptied = [existing[key] for key, (amount, count) in monthly.items() if key in existing and count < 0]
+    if emptied:
+        for start in range(0, len(emptied), LOOKUP_CHUNK):
+            MonthlyRollup.objects.filter(id__in=emptied[start:start + LOOKUP_CHUNK], count__lte=0).delete()
+
+    missing = [key for key in monthly if key not in existing and monthly[key][1] > 0]
+    try:
+        with transaction.atomic():
+            MonthlyRollup.objects.bulk_create([
+                MonthlyRollup(user_id=user_id, category_id=category_id, month=month, currency=currency,
+                              category_type=category_types[category_id],
+                              total=monthly[user_id, category_id, month, currency][0],
+                              count=monthly[user_id, category_id, month, currency][1])
+                for user_id, category_id, month, currency in missing
+            ])
+    except IntegrityError:
+        # Część wierszy utworzył w międzyczasie równoległy zapis - te klucze po jednym
+        for key in missing:
+            _apply_one(key, *monthly[key], category_types)
+
+
+# Odczyty zwracają sumy per waluta i miesiąc - na walutę raportów przelicza je finance/currency.py
+# (po kursie z miesiąca), dlatego miesiąc zostaje w grupowaniu także tam, gdzie pokazujemy całą historię
+
+def totals_by_type(user):
+    """(typ kategorii, miesiąc, waluta, suma) - wpływy i wydatki na pulpit"""
+    return (MonthlyRollup.objects.filter(user=user)
+            .values_list('category_type', 'month', 'currency').annotate(Sum('total')).order_by())
+
+
+def expenses_by_category(user):
+    # Grupowanie po category_id - zapytanie w całości z indeksu, nazwy podstawia rejestr kategorii
+    return (MonthlyRollup.objects.filter(user=user, category_type='EXPENSE')
+            .values('category_id', 'month', 'currency').annotate(sum=Sum('total')).order_by())
+
+
+def monthly_totals(user):
+    return (MonthlyRollup.objects.filter(user=user)
+            .values('month', 'category_type', 'currency').annotate(total=Sum('total')).order_by('month'))
+
+
+def _source_rows(user_ids=None):
+    """Sumy policzone od zera z tabeli Transaction (punkt odniesienia dla rebuild/verify)"""
+    transactions = Transaction.objects.filter(category__isnull=False)
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+    return (transactions
+            .annotate(month=TruncMonth('date'))
+            .values('user_id', 'category_id', 'category__type', 'month', 'currency')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by())
+
+
+def rebuild(user_ids=None):
+    """Przelicza rollupy od zera. Zwraca liczbę utworzonych wierszy."""
+    with transaction.atomic():
+        rollups = MonthlyRollup.objects.all()
+        if user_ids is not None:
+            rollups = rollups.filter(user_id__in=user_ids)
+        rollups.delete()
+        created = MonthlyRollup.objects.bulk_create(
+            MonthlyRollup(
+                user_id=row['user_id'], category_id=row['category_id'], category_type=row['category__type'],
+                month=row['month'], currency=row['currency'], total=row['total'], count=row['count'],
+            )
+            for row in _source_rows(user_ids)
+        )
+    return len(created)
+
+
+def verify(user_ids=None):
+    """
+    Porównuje rollupy z sumami policzonymi z tabeli Transaction.
+    Zwraca listę rozbieżności: (user_id, category_id, miesiąc, waluta, oczekiwane, zapisane).
+    """
+    # SQLite sumuje kolumny decimal jako REAL - zaokrąglamy do groszy przed porównaniem
+    expected = {
+        (row['user_id'], row['category_id'], row['month'], row['currency']):
+            (row['category__type'], row['total'].quantize(CENT), row['count'])
+        for row in _source_rows(user_ids)
+    }
+    rollups = MonthlyRollup.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+    stored = {
+        (row['user_id'], row['category_id'], row['month'], row['currency']):
+            (row['category_type'], row['total'], row['count'])
+        for row in rollups.values('user_id', 'category_id', 'month', 'currency', 'category_type', 'total', 'count')
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        if expected.get(key) != stored.get(key):
+            mismatches.append((*key, expected.get(key), stored.get(key)))
+    return mismatches
@@ -0,0 +1,67 @@
+"""
+Filtrowanie i wyszukiwanie transakcji.
+
+Na SQLite wyszukiwanie w opisach idzie przez indeks FTS5 finance_transaction_fts
+(migracja 0005, synchronizowany triggerami) zamiast LIKE '%...%', które musiałoby
+przeczytać każdy wiersz. Każde słowo zapytania jest traktowane jako prefiks,
+wszystkie słowa muszą wystąpić ("bied war" znajdzie "Biedronka Warszawa").
+"""
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+
+from finance import categories
+from finance.models import Transaction
+
+WORD = re.compile(r'\w+')
+
+FTS_MATCH_SQL = 'SELECT rowid FROM finance_transaction_fts WHERE finance_transaction_fts MATCH %s'
+# Do tylu trafień pobieramy identyfikatory od razu i szukamy po kluczu głównym
+SMALL_RESULT = 2000
+
+
+def match_expression(text):
+    """Zapytanie użytkownika -> wyrażenie MATCH FTS5; słowa w cudzysłowach, więc operatory FTS nie działają"""
+    words = WORD.findall(text.lower())
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+
+def search(queryset, text):
+    words = WORD.findall(text)
+    if not words:
+        return queryset
+    connection = connections[router.db_for_read(Transaction)]
+    if connection.vendor == 'sqlite':
+        expression = match_expression(text)
+        # Mało trafień (typowe wyszukiwanie): lista id -> odczyt po kluczu głównym, bez przeglądania historii.
+        # Dużo trafień: podzapytanie - SQLite idzie indeksem (user, -date) i kończy po pierwszej stronie.
+        with connection.cursor() as cursor:
+            cursor.execute(FTS_MATCH_SQL + ' LIMIT %s', [expression, SMALL_RESULT + 1])
+            ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) <= SMALL_RESULT:
+            return queryset.filter(id__in=ids)
+        return queryset.filter(id__in=RawSQL(FTS_MATCH_SQL, [expression]))
+    for word in words:
+        queryset = queryset.filter(description__icontains=word)
+    return queryset
+
+
+def filter_transactions(queryset, filters):
+    """Nakłada filtry z TransactionFilterForm.cleaned_data (puste pola są pomijane)"""
+    if filters.get('date_from'):
+        queryset = queryset.filter(date__gte=filters['date_from'])
+    if filters.get('date_to'):
+        queryset = queryset.filter(date__lte=filters['date_to'])
+    if filters.get('category'):
+        queryset = queryset.filter(category=filters['category'])
+    if filters.get('type'):
+        # Identyfikatory kategorii danego typu z rejestru - bez JOIN-a z tabelą kategorii
+        queryset = queryset.filter(category_id__in=categories.registry().ids_of_type(filters['type']))
+    if filters.get('amount_min') is not None:
+        queryset = queryset.filter(amount__gte=filters['amount_min'])
+    if filters.get('amount_max') is not None:
+        queryset = queryset.filter(amount__lte=filters['amount_max'])
+    if filters.get('q'):
+        queryset = search(queryset, filters['q'])
+    return queryset
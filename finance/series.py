@@ -0,0 +1,80 @@
+"""
+Serie danych do wykresów, liczone z miesięcznych rollupów.
+
+Te same serie trafiają do specyfikacji wykresów PNG (finance/charts.py)
+i do endpointów JSON, z których wykresy rysuje przeglądarka. Kwoty są w walucie
+raportów - sumy rollupów w innych walutach przelicza finance/currency.py.
+"""
+from decimal import Decimal
+
+from finance import categories, currency, rollups
+from finance.rollups import CENT
+
+
+def balance(user):
+    """Wpływy, wydatki i bilans z całej historii - karty i wykres na pulpicie"""
+    return _balance(rollups.totals_by_type(user), currency.converter())
+
+
+def expenses_by_category(user):
+    return _expenses_by_category(rollups.expenses_by_category(user), categories.registry(), currency.converter())
+
+
+def monthly_balance(user):
+    """Przychody i wydatki miesiąc po miesiącu"""
+    return _monthly_balance(rollups.monthly_totals(user), currency.converter())
+
+
+# Odpowiedniki dla widoków asynchronicznych - te same zapytania, pobierane przez async for
+
+async def abalance(user):
+    return _balance([row async for row in rollups.totals_by_type(user)], await currency.aconverter())
+
+
+async def aexpenses_by_category(user):
+    return _expenses_by_category([row async for row in rollups.expenses_by_category(user)],
+                                 await categories.aregistry(), await currency.aconverter())
+
+
+async def amonthly_balance(user):
+    return _monthly_balance([row async for row in rollups.monthly_totals(user)], await currency.aconverter())
+
+
+def _balance(rows, converter):
+    totals = {'INCOME': Decimal('0'), 'EXPENSE': Decimal('0')}
+    for type, month, code, total in rows:
+        totals[type] += converter.month(total, code, month)
+    income, expense = totals['INCOME'].quantize(CENT), totals['EXPENSE'].quantize(CENT)
+    return {'income': income, 'expense': expense, 'balance': income - expense,
+            'missing_rates': sorted(converter.missing)}
+
+
+def _expenses_by_category(rows, registry, converter):
+    sums = {}
+    for item in rows:
+        amount = converter.month(item['sum'], item['currency'], item['month'])
+        sums[item['category_id']] = sums.get(item['category_id'], 0) + amount
+    return {
+        'labels': [registry.name(category_id) for category_id in sums],
+        'values': [value.quantize(CENT) for value in sums.values()],
+    }
+
+
+def _monthly_balance(rows, converter):
+    data_dict = {}
+    for item in rows:
+        month_str = item['month'].strftime("%Y-%m")
+        if month_str not in data_dict:
+            data_dict[month_str] = {'INCOME': 0, 'EXPENSE': 0}
+        data_dict[month_str][item['category_type']] += converter.month(item['total'], item['currency'], item['month'])
+
+    months = list(data_dict.keys())
+    return {
+        'months': months,
+        'incomes': [_cents(data_dict[m]['INCOME']) for m in months],
+        'expenses': [_cents(data_dict[m]['EXPENSE']) for m in months],
+    }
+
+
+def _cents(value):
+    return value.quantize(CENT) if isinstance(value, Decimal) else value
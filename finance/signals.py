@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from finance import balances, caching, rollups
+from finance.models import BudgetLimit, Category, MonthlyRollup, Transaction
+
+# Wysyłany po każdej zmianie transakcji z argumentem deltas (patrz finance/rollups.py).
+# Operacje masowe, które omijają save()/delete(), wysyłają go same.
+transactions_changed = Signal()
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, raw=False, **kwargs):
+    # Zapamiętujemy stan sprzed edycji, żeby odjąć go od rollupów
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = (Transaction.objects.filter(pk=instance.pk)
+                                    .values('user_id', 'category_id', 'date', 'amount', 'currency').first())
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = rollups.new_deltas()
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        rollups.add_delta(deltas, previous['user_id'], previous['category_id'], previous['date'],
+                          previous['amount'], previous['currency'], count=-1)
+    rollups.add_delta(deltas, instance.user_id, instance.category_id, instance.date, instance.amount,
+                      instance.currency)
+    transactions_changed.send(sender=Transaction, deltas=deltas)
+
+
+def _cascade_delete(origin):
+    """Usuwanie zaczęte od użytkownika albo kategorii (origin - obiekt albo QuerySet z delete())"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, (User, Category))
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, origin=None, **kwargs):
+    # Kaskada usuwa w tej samej operacji rollupy i salda użytkownika - delta utworzyłaby je na nowo
+    # (z ujemnymi sumami i kluczem do usuwanego użytkownika)
+    if origin is not None and _cascade_delete(origin):
+        return
+    deltas = rollups.new_deltas()
+    rollups.add_delta(deltas, instance.user_id, instance.category_id, instance.date, instance.amount,
+                      instance.currency, count=-1)
+    transactions_changed.send(sender=Transaction, deltas=deltas)
+
+
+@receiver(transactions_changed)
+def update_rollups(sender, deltas, **kwargs):
+    rollups.apply_deltas(deltas)
+
+
+@receiver(transactions_changed)
+def update_daily_balances(sender, deltas, **kwargs):
+    balances.apply_deltas(deltas)
+
+
+@receiver(transactions_changed)
+def invalidate_dashboards(sender, deltas, **kwargs):
+    # Dopiero po commicie - inaczej równoległe żądanie mogłoby zapisać w cache stare dane pod nową wersją
+    user_ids = {key[0] for key in deltas}
+    transaction.on_commit(lambda: caching.bump_users(user_ids))
+
+
+@receiver(post_save, sender=BudgetLimit)
+@receiver(post_delete, sender=BudgetLimit)
+def budget_limit_changed(sender, instance, **kwargs):
+    # Limity są częścią pulpitu (widżet budżetów)
+    transaction.on_commit(lambda: caching.bump_users([instance.user_id]))
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_category_type(sender, instance, raw=False, **kwargs):
+    instance._previous_type = None
+    if instance.pk and not raw:
+        instance._previous_type = Category.objects.filter(pk=instance.pk).values_list('type', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, raw=False, **kwargs):
+    # Zmiana typu kategorii (np. Wydatek -> Dochód) przenosi jej sumy między wpływami a wydatkami
+    previous_type = getattr(instance, '_previous_type', None)
+    if previous_type and previous_type != instance.type:
+        MonthlyRollup.objects.filter(category=instance).update(category_type=instance.type)
+    transaction.on_commit(caching.bump_categories)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    transaction.on_commit(caching.bump_categories)
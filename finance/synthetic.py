@@ -0,0 +1,107 @@
+"""
+Syntetyczne dane do benchmarków i testów obciążeniowych.
+
+Rozkłady są zbliżone do prawdziwego budżetu domowego: pensja i czynsz raz w miesiącu,
+zakupy spożywcze kilkanaście razy, kwoty z rozkładu log-normalnego (dużo drobnych
+wydatków, mało dużych). Transakcje zapisujemy paczkami przez insert_transactions
+i jednym sygnałem transactions_changed na paczkę - tak jak import wyciągów.
+"""
+import datetime
+import math
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from finance import caching, rollups
+from finance.importers import insert_transactions
+from finance.models import DEFAULT_CURRENCY, BudgetLimit, Category, Transaction
+from finance.signals import transactions_changed
+
+BATCH_SIZE = 10000
+
+# (nazwa, typ, średnio operacji w miesiącu, mediana kwoty, rozrzut log-normalny, opisy)
+CATEGORIES = [
+    ('Pensja', 'INCOME', 1, 7500, 0.15, ['Wynagrodzenie']),
+    ('Premia', 'INCOME', 0.2, 2000, 0.5, ['Premia kwartalna', 'Nagroda']),
+    ('Czynsz', 'EXPENSE', 1, 2200, 0.05, ['Czynsz']),
+    ('Jedzenie', 'EXPENSE', 22, 55, 0.7, ['Biedronka', 'Lidl', 'Żabka', 'Carrefour', 'Piekarnia']),
+    ('Rachunki', 'EXPENSE', 3, 180, 0.4, ['Prąd', 'Internet', 'Telefon', 'Gaz']),
+    ('Transport', 'EXPENSE', 6, 120, 0.6, ['Orlen', 'Bilet miesięczny', 'Taxi']),
+    ('Rozrywka', 'EXPENSE', 4, 90, 0.8, ['Kino', 'Książki', 'Streaming', 'Koncert']),
+    ('Zdrowie', 'EXPENSE', 1.5, 120, 0.9, ['Apteka', 'Lekarz', 'Dentysta']),
+]
+
+
+def ensure_categories():
+    """Kategorie z CATEGORIES (tworzone, jeśli ich nie ma) - {nazwa: Category}"""
+    return {
+        name: Category.objects.get_or_create(name=name, type=type)[0]
+        for name, type, *rest in CATEGORIES
+    }
+
+
+class Generator:
+    def __init__(self, categories, months=36, end=None, seed=0):
+        self.random = random.Random(seed)
+        self.end = end or datetime.date.today()
+        self.start = self.end - datetime.timedelta(days=round(months * 30.44))
+        self.categories = [(categories[name], frequency, math.log(median), sigma, descriptions)
+                           for name, type, frequency, median, sigma, descriptions in CATEGORIES]
+        self.weights = [frequency for category, frequency, *rest in self.categories]
+
+    def _amount(self, mu, sigma):
+        return max(Decimal(round(self.random.lognormvariate(mu, sigma) * 100)) / 100, Decimal('0.01'))
+
+    def transactions(self, count):
+        """Krotki dla insert_transactions: (category_id, amount, description, date, fingerprint)"""
+        span = (self.end - self.start).days
+        for offset in range(0, count, BATCH_SIZE):
+            for category, frequency, mu, sigma, descriptions in self.random.choices(
+                    self.categories, self.weights, k=min(BATCH_SIZE, count - offset)):
+                yield (category.pk, self._amount(mu, sigma), self.random.choice(descriptions),
+                       self.start + datetime.timedelta(days=self.random.randrange(span + 1)), None)
+
+    def budget_limits(self, user):
+        """Limit na każdą regularną kategorię wydatków w każdym miesiącu okresu"""
+        month = rollups.month_start(self.start)
+        while month <= self.end:
+            for category, frequency, mu, sigma, descriptions in self.categories:
+                if category.type == 'EXPENSE' and frequency >= 1:
+                    typical = math.exp(mu) * frequency * self.random.uniform(0.9, 1.4)
+                    yield BudgetLimit(user=user, category=category, month=month,
+                                      limit_amount=Decimal(round(typical / 10) * 10))
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def create_users(prefix, count, password):
+    """Tworzy (albo pobiera) użytkowników prefix-1..prefix-N; hasło hashowane raz dla wszystkich"""
+    password_hash = make_password(password)
+    usernames = [f'{prefix}-{i}' for i in range(1, count + 1)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    User.objects.bulk_create(User(username=username, password=password_hash)
+                             for username in usernames if username not in existing)
+    return list(User.objects.filter(username__in=usernames).order_by('id'))
+
+
+def populate(user, generator, transactions, budgets=True, progress=None):
+    """Dopisuje użytkownikowi transakcje (i limity budżetów) z generatora"""
+    rows = generator.transactions(transactions)
+    written = 0
+    while written < transactions:
+        values = [next(rows) for _ in range(min(BATCH_SIZE, transactions - written))]
+        deltas = rollups.new_deltas()
+        for category_id, amount, description, date, fingerprint in values:
+            rollups.add_delta(deltas, user.pk, category_id, date, amount, DEFAULT_CURRENCY)
+        with transaction.atomic():
+            insert_transactions(user.pk, values)
+            transactions_changed.send(sender=Transaction, deltas=deltas)
+        written += len(values)
+        if progress:
+            progress(user, written)
+    if budgets:
+        BudgetLimit.objects.bulk_create(generator.budget_limits(user), batch_size=1000, ignore_conflicts=True)
+        # bulk_create nie wysyła post_save - pulpit (widżet budżetów) unieważniamy sami
+        caching.bump_users([user.pk])
@@ -0,0 +1,82 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from finance import balances, caching, rollups
+from finance.models import Category, DailyBalance, Transaction
+from finance.signals import transactions_changed
+
+
+class DailyBalanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('anna', password='x')
+        cls.other = User.objects.create_user('jan', password='x')
+        cls.income = Category.objects.create(name='Pensja', type='INCOME')
+        cls.expense = Category.objects.create(name='Jedzenie', type='EXPENSE')
+
+    def setUp(self):
+        # Raport czyta kategorie z rejestru procesu - po nowych kategoriach testu musi się przeładować
+        caching.bump_categories()
+
+    def add(self, user, category, amount, date):
+        return Transaction.objects.create(user=user, category=category, amount=Decimal(amount), date=date)
+
+    def test_save_edit_and_delete_keep_balances_in_sync(self):
+        first = self.add(self.user, self.expense, '10.00', datetime.date(2024, 1, 10))
+        self.add(self.user, self.expense, '5.00', datetime.date(2024, 1, 20))
+        # Dzień wcześniejszy niż istniejące - przesuwa sumy narastające późniejszych dni
+        early = self.add(self.user, self.expense, '2.50', datetime.date(2024, 1, 1))
+        self.assertEqual(balances.verify(), [])
+
+        first.amount = Decimal('12.00')
+        first.date = datetime.date(2024, 1, 25)
+        first.save()
+        self.assertEqual(balances.verify(), [])
+
+        early.delete()
+        self.assertEqual(balances.verify(), [])
+        self.assertFalse(DailyBalance.objects.filter(date=datetime.date(2024, 1, 1)).exists())
+
+    def test_many_days_rewrite_suffix(self):
+        day = datetime.date(2024, 1, 1)
+        objects = [Transaction(user=self.user, category=self.expense, amount=Decimal('1.50'),
+                               date=day + datetime.timedelta(days=index))
+                   for index in range(balances.SUFFIX_THRESHOLD * 2)]
+        Transaction.objects.bulk_create(objects)
+        deltas = rollups.new_deltas()
+        for obj in objects:
+            rollups.add_delta(deltas, obj.user_id, obj.category_id, obj.date, obj.amount, obj.currency)
+        transactions_changed.send(sender=Transaction, deltas=deltas)
+        self.assertEqual(balances.verify(), [])
+
+    def test_report_sums_period(self):
+        self.add(self.user, self.income, '100.00', datetime.date(2024, 1, 5))
+        self.add(self.user, self.expense, '30.00', datetime.date(2024, 1, 31))
+        self.add(self.user, self.expense, '20.00', datetime.date(2024, 2, 1))
+
+        report = balances.report(self.user, datetime.date(2024, 1, 1), datetime.date(2024, 1, 31))
+
+        totals = {label: values['current'] for label, values in report['totals']}
+        self.assertEqual(totals, {'Przychody': Decimal('100.00'), 'Wydatki': Decimal('30.00'),
+                                  'Bilans': Decimal('70.00')})
+
+    def test_deleting_user_with_transactions(self):
+        self.add(self.user, self.expense, '10.00', datetime.date(2024, 1, 5))
+        self.add(self.user, self.expense, '20.00', datetime.date(2024, 1, 6))
+        self.add(self.other, self.expense, '5.00', datetime.date(2024, 1, 5))
+
+        self.user.delete()
+
+        self.assertFalse(DailyBalance.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(balances.verify(), [])
+
+    def test_delete_without_balance_row_inserts_nothing(self):
+        transaction = self.add(self.user, self.expense, '10.00', datetime.date(2024, 1, 5))
+        DailyBalance.objects.all().delete()
+
+        transaction.delete()
+
+        self.assertFalse(DailyBalance.objects.exists())
@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from finance import charts
+
+
+class RegisterTests(TestCase):
+    def setUp(self):
+        charts.png_cache.clear()
+        self.spec = charts.balance_spec(100, 40)
+
+    def test_register_rewrites_spec_even_when_png_is_cached(self):
+        key = charts.register(self.spec)
+        charts.png_cache.set(key, b'png')
+        # Specyfikacja wygasła w cache współdzielonym, ale ten proces wciąż ma PNG
+        cache.delete(charts.SPEC_CACHE_PREFIX + key)
+
+        self.assertEqual(charts.register(self.spec), key)
+
+        self.assertEqual(cache.get(charts.SPEC_CACHE_PREFIX + key), self.spec)
+
+
+@override_settings(FINANCE_CHART_WORKERS=0)
+class ChartImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('anna', password='x')
+
+    def setUp(self):
+        charts.png_cache.clear()
+        self.client.force_login(self.user)
+
+    def test_etag_and_not_modified(self):
+        key = charts.register(charts.balance_spec(100, 40))
+        url = reverse('chart_image', args=[key])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['ETag'], f'"{key}"')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{key}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_key_is_404_without_etag(self):
+        key = 'f' * 64
+        response = self.client.get(reverse('chart_image', args=[key]), HTTP_IF_NONE_MATCH=f'"{key}"')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,83 @@
+import datetime
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from finance import importers, rollups
+from finance.models import ImportJob, Transaction
+
+
+def statement(*rows):
+    return io.BytesIO('\n'.join(['date,amount,description', *rows]).encode())
+
+
+class ParseAmountTests(TestCase):
+    def test_formats(self):
+        self.assertEqual(importers.parse_amount('-1 234,56'), Decimal('-1234.56'))
+        self.assertEqual(importers.parse_amount('1,234.56'), Decimal('1234.56'))
+        self.assertEqual(importers.parse_amount('12.5'), Decimal('12.5'))
+
+    def test_rejects_values_that_do_not_fit_amount_field(self):
+        for value in ['abc', 'NaN', 'sNaN', 'Infinity', '-inf', '123456789012.00', '99999999.995', '1e400']:
+            with self.subTest(value), self.assertRaises(importers.RowError):
+                importers.parse_amount(value)
+
+
+class StatementImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('anna', password='x')
+
+    def test_invalid_amounts_are_counted_not_fatal(self):
+        job = importers.import_statement(self.user, 'wyciag.csv', statement(
+            '2024-01-01,-10.00,Kawa',
+            '2024-01-02,NaN,Zepsuty wiersz',
+            '2024-01-03,123456789012.00,Za duża kwota',
+            '2024-01-04,2500.00,Pensja',
+        ))
+
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual((job.rows_read, job.rows_imported, job.rows_invalid), (4, 2, 2))
+        self.assertEqual(rollups.verify(), [])
+
+    def test_reimport_skips_duplicates_but_keeps_repeated_rows(self):
+        job = importers.import_statement(self.user, 'a.csv', statement(
+            '2024-01-01,-10.00,Kawa', '2024-01-01,-10.00,Kawa', '2024-01-02,-3.00,Bilet'))
+        self.assertEqual((job.rows_imported, job.rows_duplicate), (3, 0))
+
+        # Nowszy wyciąg (malejąco po dacie) zachodzi na poprzedni i ma jeszcze jedną identyczną kawę tego dnia
+        job = importers.import_statement(self.user, 'b.csv', statement(
+            '2024-01-03,-8.00,Obiad', '2024-01-02,-3.00,Bilet',
+            '2024-01-01,-10.00,Kawa', '2024-01-01,-10.00,Kawa', '2024-01-01,-10.00,Kawa'))
+        self.assertEqual((job.rows_imported, job.rows_duplicate), (2, 3))
+        self.assertEqual(Transaction.objects.filter(user=self.user, description='Kawa').count(), 3)
+
+    def test_unsorted_statement_is_rejected_not_deduplicated(self):
+        # Ten sam dzień wraca po innych dniach - drugiej kawy nie wolno uznać za duplikat pierwszej
+        rows = ['2024-01-01,-10.00,Kawa']
+        rows += [f'2023-12-{day:02d},-1.00,Operacja {day}' for day in range(1, 31)]
+        rows += ['2024-01-01,-10.00,Kawa']
+
+        with self.assertRaises(importers.UnsortedStatement):
+            importers.import_statement(self.user, 'a.csv', statement(*rows), batch_size=10)
+
+        job = ImportJob.objects.get(user=self.user)
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.rows_imported, 30)
+        self.assertEqual(job.rows_duplicate, 0)
+
+    def test_interrupted_import_resumes_after_last_batch(self):
+        data = statement(*[f'2024-01-{day:02d},-1.00,Operacja {day}' for day in range(1, 29)]).getvalue()
+
+        def interrupt(job):
+            raise RuntimeError("przerwane")
+
+        with self.assertRaises(RuntimeError):
+            importers.import_statement(self.user, 'a.csv', io.BytesIO(data), batch_size=5, progress=interrupt)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 5)
+
+        job = importers.import_statement(self.user, 'a.csv', io.BytesIO(data), batch_size=5)
+        self.assertEqual((job.status, job.rows_read, job.rows_imported, job.rows_duplicate), ('DONE', 28, 28, 0))
+        self.assertEqual(Transaction.objects.filter(user=self.user).latest('date').date, datetime.date(2024, 1, 28))
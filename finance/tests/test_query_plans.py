@@ -0,0 +1,16 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from finance.management.commands.check_query_plans import query_plans
+
+
+@skipUnless(connection.vendor == 'sqlite', "Plany zapytań sprawdzamy na SQLite")
+class QueryPlanTests(TestCase):
+    """Zapytania widoków muszą korzystać z dedykowanych indeksów (te same co w manage.py check_query_plans)"""
+
+    def test_views_use_dedicated_indexes(self):
+        for name, queryset, index in query_plans():
+            with self.subTest(name):
+                self.assertIn(index, queryset.explain())
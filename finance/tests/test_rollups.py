@@ -0,0 +1,77 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from finance import rollups
+from finance.models import Category, MonthlyRollup, Transaction
+from finance.signals import transactions_changed
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('anna', password='x')
+        cls.other = User.objects.create_user('jan', password='x')
+        cls.income = Category.objects.create(name='Pensja', type='INCOME')
+        cls.expense = Category.objects.create(name='Jedzenie', type='EXPENSE')
+
+    def add(self, user, category, amount, date, currency='PLN'):
+        return Transaction.objects.create(user=user, category=category, amount=Decimal(amount), date=date,
+                                          currency=currency)
+
+    def test_save_edit_and_delete_keep_rollups_in_sync(self):
+        first = self.add(self.user, self.expense, '10.50', datetime.date(2024, 1, 5))
+        second = self.add(self.user, self.expense, '4.50', datetime.date(2024, 1, 20))
+        self.add(self.user, self.income, '3000.00', datetime.date(2024, 1, 10))
+        self.add(self.user, self.expense, '7.00', datetime.date(2024, 2, 1), currency='EUR')
+
+        rollup = MonthlyRollup.objects.get(user=self.user, category=self.expense, month=datetime.date(2024, 1, 1),
+                                           currency='PLN')
+        self.assertEqual((rollup.total, rollup.count), (Decimal('15.00'), 2))
+
+        # Edycja przenosi kwotę między miesiącami, kategoriami i walutami
+        first.amount = Decimal('12.00')
+        first.date = datetime.date(2024, 3, 1)
+        first.save()
+        second.category = self.income
+        second.currency = 'EUR'
+        second.save()
+        self.assertEqual(rollups.verify(), [])
+
+        second.delete()
+        self.assertEqual(rollups.verify(), [])
+        # Opróżniony rollup znika zamiast zostawać z zerową sumą
+        self.assertFalse(MonthlyRollup.objects.filter(count__lte=0).exists())
+
+    def test_bulk_deltas_match_source(self):
+        day = datetime.date(2023, 1, 1)
+        objects = [Transaction(user=self.user if index % 2 else self.other, category=self.expense,
+                               amount=Decimal('1.25'), date=day + datetime.timedelta(days=31 * index))
+                   for index in range(rollups.BULK_THRESHOLD * 2)]
+        Transaction.objects.bulk_create(objects)
+        deltas = rollups.new_deltas()
+        for obj in objects:
+            rollups.add_delta(deltas, obj.user_id, obj.category_id, obj.date, obj.amount, obj.currency)
+        transactions_changed.send(sender=Transaction, deltas=deltas)
+        self.assertEqual(rollups.verify(), [])
+
+    def test_deleting_user_with_transactions(self):
+        self.add(self.user, self.expense, '10.00', datetime.date(2024, 1, 5))
+        self.add(self.user, self.income, '20.00', datetime.date(2024, 2, 5))
+        self.add(self.other, self.expense, '5.00', datetime.date(2024, 1, 5))
+
+        self.user.delete()
+
+        self.assertFalse(MonthlyRollup.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(MonthlyRollup.objects.get(user=self.other).total, Decimal('5.00'))
+
+    def test_delete_without_rollup_creates_no_row(self):
+        transaction = self.add(self.user, self.expense, '10.00', datetime.date(2024, 1, 5))
+        MonthlyRollup.objects.all().delete()
+
+        transaction.delete()
+
+        self.assertFalse(MonthlyRollup.objects.exists())
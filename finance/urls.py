@@ -1,15 +1,54 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Pod ASGI widoki tylko do odczytu w wersji asynchronicznej (patrz finance/async_views.py)
+read_views = async_views if settings.FINANCE_ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.transaction_list, name='transaction_list'),
+    path('', read_views.transaction_list, name='transaction_list'),
+    path('more/', read_views.transaction_list_more, name='transaction_list_more'),
+    path('transactions/', views.transaction_search, name='transaction_search'),
+    path('transactions.json', views.transaction_search_data, name='transaction_search_data'),
+    path('transactions/batch/', views.transaction_batch, name='transaction_batch'),
+    path('transactions/batch.json', views.transaction_batch_data, name='transaction_batch_data'),
+    path('transactions/delete/', views.transaction_bulk_delete, name='transaction_bulk_delete'),
     path('add/', views.transaction_create, name='transaction_create'),
     path('register/', views.register, name='register'),
-    path('analysis/', views.analysis, name='analysis'),  
+    path('analysis/', read_views.analysis, name='analysis'),  
+    path('charts/<slug:key>.png', read_views.chart_image, name='chart_image'),
+    path('data/balance.json', read_views.balance_data, name='balance_data'),
+    path('stats/cache.json', views.cache_stats, name='cache_stats'),
+    path('metrics', views.metrics, name='metrics'),
+    path('analysis/data/expenses.json', read_views.expenses_data, name='expenses_data'),
+    path('analysis/data/monthly.json', read_views.monthly_data, name='monthly_data'),
+    path('analysis/data/analytics.json', read_views.analytics_data, name='analytics_data'),
+    path('analysis/history/', views.analysis_chart_job, name='analysis_chart_job'),
+    path('reports/', views.reports, name='reports'),
     path('categories/', views.category_list, name='category_list'),
     path('categories/add/', views.category_create, name='category_create'),
     path('categories/edit/<int:pk>/', views.category_update, name='category_update'),
     path('categories/delete/<int:pk>/', views.category_delete, name='category_delete'),
+    path('budgets/', views.budget_list, name='budget_list'),
+    path('budgets/add/', views.budget_create, name='budget_create'),
+    path('budgets/edit/<int:pk>/', views.budget_update, name='budget_update'),
+    path('budgets/delete/<int:pk>/', views.budget_delete, name='budget_delete'),
+    path('recurring/', views.recurring_list, name='recurring_list'),
+    path('recurring/add/', views.recurring_create, name='recurring_create'),
+    path('recurring/edit/<int:pk>/', views.recurring_update, name='recurring_update'),
+    path('recurring/delete/<int:pk>/', views.recurring_delete, name='recurring_delete'),
+    path('import/', views.statement_import, name='statement_import'),
+    path('import/rules/delete/<int:pk>/', views.import_rule_delete, name='import_rule_delete'),
+    path('export/', views.transaction_export, name='transaction_export'),
+    path('export/download/', views.transaction_export_download, name='transaction_export_download'),
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>.json', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
     path('edit/<int:pk>/', views.transaction_update, name='transaction_update'),
     path('delete/<int:pk>/', views.transaction_delete, name='transaction_delete'),
+    # JSON API tylko do odczytu (finance/api.py)
+    path('api/v1/transactions/', api.transactions, name='api_transactions'),
+    path('api/v1/categories/', api.category_list, name='api_categories'),
+    path('api/v1/summary/', api.summary, name='api_summary'),
 ]
\ No newline at end of file
@@ -1,70 +1,246 @@
+import datetime
+import hashlib
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from finance.models import Transaction, Category
-from finance.forms import TransactionForm, CategoryForm
-import matplotlib.pyplot as plt
-import io
-import urllib, base64
-from django.db.models.functions import TruncMonth
+from django.contrib import messages
+from django.conf import settings
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag, urlencode
+from django.views.decorators.http import condition, require_POST
+from finance.models import Transaction, Category, BackgroundJob, BudgetLimit, ImportJob, ImportRule, RecurringRule
+from finance.forms import (TransactionForm, CategoryForm, BudgetLimitForm, ExportForm, ImportForm, ImportRuleForm,
+                           RecurringRuleForm, ReportForm, TransactionFilterForm, BATCH_MAX_ROWS, transaction_formset)
+from finance.categories import registry as category_registry
+from finance.pagination import keyset_page, InvalidCursor
+from finance.rollups import add_months, month_start
+from finance import (balances, batch, budgets, caching, charts, exporters, importers, jobs, profiling, recurring,
+                     rendering, search, series)
+
+# Wykresy są adresowane treścią - mogą leżeć w cache przeglądarki przez rok
+CHART_MAX_AGE = 365 * 24 * 3600
+CHART_MODES = ('server', 'client')
+# Puste wiersze formularza masowego dodawania
+BATCH_EXTRA_ROWS = 10
+
+
+def transaction_feed(user):
+    # Tylko kolumny potrzebne w tabeli; kategorie podstawia rejestr (Registry.attach) - bez JOIN-a i bez N+1
+    return Transaction.objects.filter(user=user).only('id', 'date', 'amount', 'currency', 'category')
+
+
+def chart_mode(request):
+    """
+    'server' - wykresy PNG z matplotlib, 'client' - przeglądarka rysuje je z danych JSON.
+    Tryb można przełączyć parametrem ?charts=client|server (zapamiętywany w sesji).
+    """
+    mode = request.GET.get('charts')
+    if mode in CHART_MODES:
+        request.session['chart_mode'] = mode
+        return mode
+    return request.session.get('chart_mode', settings.FINANCE_CHART_MODE)
+
+
+def dashboard_context(user, mode, today):
+    """Dane pulpitu - liczone raz na wersję danych użytkownika i trzymane w cache"""
+    key = caching.dashboard_key(user.pk, mode, today.year, today.month)
+    context = caching.get_dashboard(key)
+    if context is None:
+        # Pobieramy transakcje TYLKO zalogowanego użytkownika (pierwsza strona)
+        page, next_cursor = keyset_page(transaction_feed(user))
+        category_registry().attach(page)
+
+        # Obliczenia sum - z miesięcznych rollupów, koszt zależy od liczby miesięcy, nie transakcji
+        totals = series.balance(user)
+        context = build_dashboard_context(page, next_cursor, totals, budgets.statuses(user, today), mode)
+        caching.set_dashboard(key, context)
+    return context
+
+
+def build_dashboard_context(page, next_cursor, totals, budget_statuses, mode):
+    context = {
+        'budgets': budget_statuses,
+        'transactions': page,
+        'next_cursor': next_cursor,
+        'total_income': totals['income'],
+        'total_expense': totals['expense'],
+        'balance': totals['balance'],
+        # Waluty bez kursów w ExchangeRate - ich kwoty nie weszły do sum
+        'missing_rates': totals['missing_rates'],
+        'has_chart': totals['income'] > 0 or totals['expense'] > 0,
+        'chart_spec': None,
+    }
+    if context['has_chart'] and mode == 'server':
+        context['chart_spec'] = charts.balance_spec(totals['income'], totals['expense'])
+    return context
+
+
+def render_dashboard(request, context, mode):
+    context = dict(context)
+
+    # --- Ogólny wykres (Pulpit) - w HTML tylko adres obrazka, renderowany osobno i cache'owany ---
+    # register() przy każdym wyświetleniu: specyfikacja w cache mogła wygasnąć niezależnie od pulpitu
+    spec = context.pop('chart_spec')
+    context['chart_mode'] = mode
+    context['dashboard_chart'] = charts.register(spec) if spec else None # Przekazujemy wykres do szablonu
+
+    response = render(request, 'finance/transaction_list.html', context)
+    # Przeglądarka może trzymać pulpit, ale za każdym razem pyta o aktualność (304, gdy bez zmian)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _dashboard_cacheable(request):
+    # Strona z jednorazowymi komunikatami nie może zostać zastąpiona odpowiedzią 304
+    return request.user.is_authenticated and not messages.get_messages(request)
+
+
+def dashboard_etag(request):
+    if not _dashboard_cacheable(request):
+        return None
+    today = timezone.localdate()
+    # Token CSRF i nazwa użytkownika są w HTML - zmiana ciasteczka (np. po ponownym logowaniu) to nowa strona
+    parts = (request.user.pk, request.user.get_username(), caching.data_version(request.user.pk),
+             chart_mode(request), today.year, today.month, request.COOKIES.get(settings.CSRF_COOKIE_NAME))
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def dashboard_last_modified(request):
+    if not _dashboard_cacheable(request):
+        return None
+    return datetime.datetime.fromtimestamp(caching.last_modified(request.user.pk), tz=datetime.timezone.utc)
 
 
 @login_required
+@condition(etag_func=dashboard_etag, last_modified_func=dashboard_last_modified)
 def transaction_list(request):
-    # Pobieramy transakcje TYLKO zalogowanego użytkownika
-    transactions = Transaction.objects.filter(user=request.user)
-
-    # Obliczenia sum
-    total_income = transactions.filter(category__type='INCOME').aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expense = transactions.filter(category__type='EXPENSE').aggregate(Sum('amount'))['amount__sum'] or 0
-    balance = total_income - total_expense
-
-    # --- NOWOŚĆ: Generowanie ogólnego wykresu (Pulpit) ---
-    dashboard_chart = None
-    if total_income > 0 or total_expense > 0:
-        plt.switch_backend('AGG') # Ustawiamy backend na nieinteraktywny
-        
-        # Tworzymy figurę o niestandardowym rozmiarze (szeroka i niska)
-        fig, ax = plt.subplots(figsize=(8, 3)) 
-        
-        categories = ['Przychody', 'Wydatki']
-        values = [total_income, total_expense]
-        colors = ['#198754', '#dc3545'] # Kolory Bootstrap: Success (zielony) i Danger (czerwony)
-        
-        # Rysujemy słupki
-        bars = ax.bar(categories, values, color=colors, width=0.4)
-        
-        # Dodajemy wartości nad słupkami dla czytelności
-        ax.bar_label(bars, fmt='%.2f zł', padding=3)
-        
-        ax.set_title('Ogólny Bilans Finansowy')
-        
-        # Usuwamy ramki wykresu dla czystszego wyglądu (opcjonalne)
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        
-        fig.tight_layout()
-
-        # Zapis do bufora
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png')
-        buf.seek(0)
-        string = base64.b64encode(buf.read())
-        dashboard_chart = urllib.parse.quote(string)
-        plt.close(fig) # Zamykamy, aby zwolnić pamięć
-    # -----------------------------------------------------
-
-    return render(request, 'finance/transaction_list.html', {
-        'transactions': transactions,
-        'total_income': total_income,
-        'total_expense': total_expense,
-        'balance': balance,
-        'dashboard_chart': dashboard_chart, # Przekazujemy wykres do szablonu
+    mode = chart_mode(request)
+    return render_dashboard(request, dashboard_context(request.user, mode, timezone.localdate()), mode)
+
+
+@user_passes_test(lambda user: user.is_staff)
+def cache_stats(request):
+    """Skuteczność cache pulpitu i wykresów (dla administratora)"""
+    dashboard = caching.stats()
+    lookups = dashboard['hits'] + dashboard['misses']
+    return JsonResponse({
+        'dashboard': dict(dashboard, hit_ratio=round(dashboard['hits'] / lookups, 3) if lookups else None),
+        'charts': dict(charts.stats, cached_bytes=charts.png_cache.size),
+        'backend': settings.CACHES['default']['BACKEND'],
     })
 
 
+@login_required
+def transaction_list_more(request):
+    """Kolejna strona wierszy tabeli - dla przycisku "Załaduj więcej" i infinite scroll"""
+    try:
+        page, next_cursor = keyset_page(transaction_feed(request.user), request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Nieprawidłowy kursor')
+    category_registry().attach(page)
+
+    response = render(request, 'finance/_transaction_rows.html', {'transactions': page})
+    # Kursor następnej strony w nagłówku - fragment HTML to same wiersze <tr>
+    response['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+
+def filtered_transactions(request):
+    """(formularz filtrów, queryset) - wspólne dla wyszukiwarki HTML i JSON"""
+    form = TransactionFilterForm(request.GET)
+    transactions = (Transaction.objects.filter(user=request.user)
+                    .only('id', 'date', 'amount', 'currency', 'description', 'category'))
+    if form.is_valid():
+        transactions = search.filter_transactions(transactions, form.cleaned_data)
+    return form, transactions
+
+
+@login_required
+def transaction_search(request):
+    """Lista transakcji z filtrami i wyszukiwaniem w opisach (paginacja kursorowa jak na pulpicie)"""
+    form, transactions = filtered_transactions(request)
+    if not form.is_valid():
+        transactions = transactions.none()
+    try:
+        page, next_cursor = keyset_page(transactions, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Nieprawidłowy kursor')
+    category_registry().attach(page)
+
+    context = {'transactions': page, 'with_description': True, 'selectable': True}
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        # "Załaduj więcej" - same wiersze, kursor w nagłówku
+        response = render(request, 'finance/_transaction_rows.html', context)
+        response['X-Next-Cursor'] = next_cursor or ''
+        return response
+
+    # Filtry bez kursora - ten sam zestaw parametrów dla "Załaduj więcej" i dla eksportu do JSON
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    return render(request, 'finance/transaction_search.html', dict(
+        context, form=form, next_cursor=next_cursor, query=query.urlencode()))
+
+
+@login_required
+def transaction_search_data(request):
+    form, transactions = filtered_transactions(request)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    try:
+        page, next_cursor = keyset_page(transactions, request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'errors': {'cursor': ['Nieprawidłowy kursor']}}, status=400)
+    category_registry().attach(page)
+    return JsonResponse({
+        'results': [{
+            'id': t.pk,
+            'date': t.date,
+            'amount': t.amount,
+            'currency': t.currency,
+            'description': t.description,
+            'category': t.category and {'id': t.category.pk, 'name': t.category.name, 'type': t.category.type},
+        } for t in page],
+        'next_cursor': next_cursor,
+    })
+
+
+def notify_budget(request, transaction):
+    """Komunikat, gdy zapisana transakcja zbliża kategorię do limitu albo go przekracza"""
+    if transaction.category is None or transaction.category.type != 'EXPENSE':
+        return
+    status = budgets.check_transaction(transaction)
+    if status is not None:
+        budget_message(request, status)
+
+
+def notify_budgets(request, transactions):
+    """Jak notify_budget, ale dla paczki transakcji - jedno zapytanie na miesiąc zamiast jednego na wiersz"""
+    touched = {(t.category_id, month_start(t.date)) for t in transactions if t.category_id}
+    for month in sorted({month for category_id, month in touched}):
+        for status in budgets.statuses(request.user, month):
+            if (status.limit.category_id, month) in touched:
+                budget_message(request, status)
+
+
+def budget_message(request, status):
+    if status.level == 'ok':
+        return
+    message = (f"Budżet „{status.limit.category.name}” na {status.limit.month:%m.%Y}: "
+               f"wydano {status.spent:.2f} z {status.limit.limit_amount} {settings.FINANCE_REPORTING_CURRENCY}.")
+    if status.level == 'over':
+        messages.error(request, "Przekroczono limit! " + message)
+    else:
+        messages.warning(request, "Zbliżasz się do limitu. " + message)
+
+
 @login_required
 def transaction_create(request):
     if request.method == 'POST':
@@ -75,6 +251,7 @@ def transaction_create(request):
             # Przypisujemy transakcję do aktualnie zalogowanego użytkownika
             transaction.user = request.user
             transaction.save()  # Teraz zapisujemy do bazy
+            notify_budget(request, transaction)
             return redirect('transaction_list')
     else:
         form = TransactionForm()
@@ -82,6 +259,81 @@ def transaction_create(request):
     return render(request, 'finance/transaction_form.html', {'form': form})
 
 
+def selected_ids(params):
+    """Identyfikatory zaznaczonych transakcji (?ids=1&ids=2...)"""
+    return [int(pk) for pk in params.getlist('ids') if pk.isdigit()][:BATCH_MAX_ROWS]
+
+
+@login_required
+def transaction_batch(request):
+    """
+    Masowe dodawanie (puste wiersze) albo edycja zaznaczonych transakcji (?ids=...).
+    Wszystkie wiersze walidowane razem i zapisywane jedną transakcją bazy - albo wszystkie, albo żaden.
+    """
+    ids = selected_ids(request.GET)
+    transactions = Transaction.objects.filter(user=request.user, pk__in=ids).order_by('-date', '-id')
+    TransactionFormSet = transaction_formset(extra=0 if ids else BATCH_EXTRA_ROWS)
+    if request.method == 'POST':
+        formset = TransactionFormSet(request.POST, queryset=transactions)
+        if formset.is_valid():
+            created, updated, deleted = batch.save_formset(formset, request.user)
+            messages.success(request, f"Dodano: {len(created)}, zmieniono: {updated}, usunięto: {deleted}.")
+            notify_budgets(request, [*created, *(obj for obj, changed in formset.changed_objects)])
+            return redirect('transaction_search')
+    else:
+        formset = TransactionFormSet(queryset=transactions)
+    return render(request, 'finance/transaction_batch.html', {'formset': formset, 'editing': bool(ids)})
+
+
+@login_required
+@require_POST
+def transaction_batch_data(request):
+    """
+    Paczka zmian w JSON: {"create": [{"category": id, "amount": ..., "date": "RRRR-MM-DD", "description": ...}],
+    "update": [{"id": id, ...zmieniane pola}], "delete": [id, ...]}. Wszystko albo nic.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'errors': {'__all__': ['Nieprawidłowy JSON']}}, status=400)
+    if not isinstance(payload, dict) or not all(isinstance(payload.get(key, []), list)
+                                                for key in ('create', 'update', 'delete')):
+        return JsonResponse({'errors': {'__all__': ['Oczekiwano obiektu z listami create/update/delete']}},
+                            status=400)
+    try:
+        created, updated, deleted = batch.apply(
+            request.user, payload.get('create', []), payload.get('update', []), payload.get('delete', []),
+        )
+    except batch.BatchError as error:
+        return JsonResponse({'errors': error.errors}, status=400)
+    return JsonResponse({'created': [obj.pk for obj in created], 'updated': updated, 'deleted': deleted})
+
+
+@login_required
+def transaction_bulk_delete(request):
+    """
+    Usuwa zaznaczone transakcje (?ids=...) albo wszystkie pasujące do filtrów wyszukiwarki.
+    GET pokazuje, ile transakcji zostanie usuniętych, POST usuwa.
+    """
+    ids = selected_ids(request.GET)
+    if ids:
+        transactions = Transaction.objects.filter(user=request.user, pk__in=ids)
+    else:
+        form, transactions = filtered_transactions(request)
+        if not form.is_valid():
+            return HttpResponseBadRequest('Nieprawidłowe filtry')
+
+    if request.method == 'POST':
+        deleted = batch.delete(transactions)
+        messages.success(request, f"Usunięto {deleted} transakcji.")
+        return redirect('transaction_search')
+    return render(request, 'finance/transaction_bulk_delete.html', {
+        'count': transactions.count(),
+        'selected': bool(ids),
+        'query': request.GET.urlencode(),
+    })
+
+
 def register(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -98,8 +350,8 @@ def register(request):
 
 @login_required
 def category_list(request):
-    # Pobieramy wszystkie kategorie
-    categories = Category.objects.all()
+    # Wszystkie kategorie - z rejestru w pamięci procesu, bez zapytania
+    categories = category_registry().all()
     return render(request, 'finance/category_list.html', {'categories': categories})
 
 
@@ -160,6 +412,7 @@ def transaction_update(request, pk):
         form = TransactionForm(request.POST, instance=transaction)
         if form.is_valid():
             form.save()
+            notify_budget(request, transaction)
             return redirect('transaction_list')  # Powrót do pulpitu
     else:
         # KROK 3: Jeśli to GET (wejście na stronę), wyświetlamy formularz wypełniony danymi
@@ -183,76 +436,426 @@ def transaction_delete(request, pk):
     return render(request, 'finance/transaction_confirm_delete.html', {'transaction': transaction})
 @login_required
 def analysis(request):
-    # Ustawienie backendu matplotlib na 'Agg' (nieinteraktywny), aby uniknąć błędów serwera
-    plt.switch_backend('AGG')
-
-    transactions = Transaction.objects.filter(user=request.user)
-
-    # --- WYKRES 1: Kołowy (Wydatki według kategorii) ---
-    expenses = transactions.filter(category__type='EXPENSE').values('category__name').annotate(sum=Sum('amount'))
-    
+    mode = chart_mode(request)
     pie_chart = None
-    if expenses:
-        labels = [item['category__name'] for item in expenses]
-        sizes = [item['sum'] for item in expenses]
-        
-        fig, ax = plt.subplots(figsize=(6, 6))
-        ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-        ax.axis('equal')  # Zapewnia, że wykres jest kołem
-        ax.set_title('Procentowy udział wydatków')
-
-        # Zapisywanie wykresu do bufora
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png')
-        buf.seek(0)
-        string = base64.b64encode(buf.read())
-        uri = urllib.parse.quote(string)
-        pie_chart = uri
-        plt.close(fig) # Zamknij figurę, by zwolnić pamięć
-
-    # --- WYKRES 2: Słupkowy (Miesiąc po miesiącu: Przychody vs Wydatki) ---
-    # Grupujemy transakcje po miesiącach
-    monthly_data = transactions.annotate(month=TruncMonth('date')).values('month', 'category__type').annotate(total=Sum('amount')).order_by('month')
-
     bar_chart = None
-    if monthly_data:
-        # Przetwarzanie danych do formatu łatwego dla matplotlib
-        data_dict = {}
-        for item in monthly_data:
-            month_str = item['month'].strftime("%Y-%m")
-            if month_str not in data_dict:
-                data_dict[month_str] = {'INCOME': 0, 'EXPENSE': 0}
-            data_dict[month_str][item['category__type']] = float(item['total']) # Konwersja Decimal na float dla wykresu
-
-        months = list(data_dict.keys())
-        incomes = [data_dict[m]['INCOME'] for m in months]
-        expenses = [data_dict[m]['EXPENSE'] for m in months]
-
-        x = range(len(months))
-        width = 0.35
-
-        fig, ax = plt.subplots(figsize=(10, 6))
-        rects1 = ax.bar([i - width/2 for i in x], incomes, width, label='Przychody', color='green')
-        rects2 = ax.bar([i + width/2 for i in x], expenses, width, label='Wydatki', color='red')
-
-        ax.set_ylabel('Kwota (PLN)')
-        ax.set_title('Bilans miesięczny')
-        ax.set_xticks(x)
-        ax.set_xticklabels(months, rotation=45)
-        ax.legend()
-
-        fig.tight_layout()
-
-        # Zapisywanie wykresu do bufora
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png')
-        buf.seek(0)
-        string = base64.b64encode(buf.read())
-        uri = urllib.parse.quote(string)
-        bar_chart = uri
-        plt.close(fig)
 
+    # W trybie 'client' serwer nie liczy wykresów - przeglądarka pobierze dane z endpointów JSON
+    if mode == 'server':
+        # --- WYKRES 1: Kołowy (Wydatki według kategorii) ---
+        expenses = series.expenses_by_category(request.user)
+        if expenses['labels']:
+            pie_chart = charts.register(charts.pie_spec(expenses['labels'], expenses['values']))
+
+        # --- WYKRES 2: Słupkowy (Miesiąc po miesiącu: Przychody vs Wydatki) ---
+        monthly = series.monthly_balance(request.user)
+        if monthly['months']:
+            bar_chart = charts.register(charts.monthly_spec(monthly['months'], monthly['incomes'], monthly['expenses']))
+
+    # --- Trendy, prognoza i największe zmiany (finance/analytics.py) ---
+    # Import dopiero tutaj: NumPy ładuje się w procesie przy pierwszej analizie, nie przy starcie
+    # (procesy obsługujące tylko listy i formularze w ogóle go nie potrzebują, patrz finance/preload.py)
+    from finance import analytics
+    report = analytics.cached_report(request.user)
     return render(request, 'finance/analysis.html', {
+        'chart_mode': mode,
         'pie_chart': pie_chart,
-        'bar_chart': bar_chart
-    })
\ No newline at end of file
+        'bar_chart': bar_chart,
+        **analysis_context(report, mode),
+    })
+
+
+def analysis_context(report, mode):
+    from finance import analytics
+    trend_chart = None
+    if mode == 'server' and report['complete_months']:
+        trend_chart = charts.register(charts.trend_spec(
+            report['months'], report['expense'], report['expense_rolling'],
+            report['forecast']['months'], report['forecast']['expense'],
+        ))
+    return {
+        'report': report,
+        'recent_months': analytics.recent_months(report),
+        'forecast': list(zip(report['forecast']['months'], report['forecast']['expense'])),
+        'trend_chart': trend_chart,
+    }
+
+
+@login_required
+def reports(request):
+    """Sumy kategorii w dowolnym okresie z porównaniem - z dziennych sum narastających (finance/balances.py)"""
+    today = timezone.localdate()
+    presets = report_presets(today)
+    if request.GET:
+        form = ReportForm(request.GET)
+    else:
+        # Domyślnie bieżący miesiąc względem poprzedniego
+        form = ReportForm(dict(presets[0][1], compare='previous'))
+
+    report = None
+    if form.is_valid():
+        data = form.cleaned_data
+        report = balances.report(request.user, data['date_from'], data['date_to'], data['compare'])
+
+    compare = form.data.get('compare', 'previous')
+    return render(request, 'finance/reports.html', {
+        'form': form,
+        'report': report,
+        'presets': [(label, urlencode(dict(dates, compare=compare))) for label, dates in presets],
+    })
+
+
+def report_presets(today):
+    month = month_start(today)
+    previous_month = add_months(month, -1)
+    return [
+        ("Ten miesiąc", {'date_from': month, 'date_to': balances.month_end(month)}),
+        ("Poprzedni miesiąc", {'date_from': previous_month, 'date_to': month - datetime.timedelta(days=1)}),
+        ("Ostatnie 30 dni", {'date_from': today - datetime.timedelta(days=29), 'date_to': today}),
+        ("Ten rok", {'date_from': today.replace(month=1, day=1), 'date_to': today.replace(month=12, day=31)}),
+        ("Poprzedni rok", {'date_from': datetime.date(today.year - 1, 1, 1),
+                           'date_to': datetime.date(today.year - 1, 12, 31)}),
+    ]
+
+
+@login_required
+def balance_data(request):
+    return JsonResponse(series.balance(request.user))
+
+
+@login_required
+def expenses_data(request):
+    return JsonResponse(series.expenses_by_category(request.user))
+
+
+@login_required
+def monthly_data(request):
+    return JsonResponse(series.monthly_balance(request.user))
+
+
+@login_required
+def analytics_data(request):
+    from finance import analytics
+    return JsonResponse(analytics.cached_report(request.user))
+
+
+@login_required
+def chart_image(request, key):
+    """
+    Obrazek wykresu spod adresu zależnego tylko od danych (klucz = skrót specyfikacji).
+    Ta sama treść ma zawsze ten sam adres, więc przeglądarka może go trzymać "na zawsze".
+    """
+    try:
+        png = charts.get_png(key, render=rendering.render)
+    except rendering.RenderError as error:
+        return chart_unavailable(error)
+    if png is None:
+        raise Http404("Nieznany wykres")
+    return chart_response(request, key, png)
+
+
+def chart_response(request, key, png):
+    """
+    PNG z ETagiem = klucz. ETag i 304 na If-None-Match tylko dla wykresu, który istnieje -
+    nie dla 404 (nieznany klucz) ani 503 (przeciążona pula).
+    """
+    response = HttpResponse(png, content_type='image/png')
+    patch_cache_control(response, private=True, max_age=CHART_MAX_AGE, immutable=True)
+    response.headers['ETag'] = quote_etag(key)
+    return get_conditional_response(request, etag=response.headers['ETag'], response=response) or response
+
+
+def chart_unavailable(error):
+    # Przeciążona pula renderująca - klient spróbuje ponownie, reszta serwisu działa dalej
+    response = HttpResponse(str(error), status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = '5'
+    return response
+
+
+def metrics(request):
+    """Metryki w formacie tekstowym Prometheusa - dla administratora albo z tokenem FINANCE_METRICS_TOKEN"""
+    token = settings.FINANCE_METRICS_TOKEN
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'))
+    if not authorized:
+        return HttpResponse(status=403)
+
+    dashboard = caching.stats()
+    lines = profiling.render_metrics()
+    lines += profiling.counter_lines('finance_dashboard_cache_hits_total', 'Trafienia w cache pulpitu', dashboard['hits'])
+    lines += profiling.counter_lines('finance_dashboard_cache_misses_total', 'Chybienia cache pulpitu',
+                                     dashboard['misses'])
+    lines += profiling.counter_lines('finance_chart_renders_total', 'Narysowane wykresy PNG', charts.stats['renders'])
+    lines += profiling.counter_lines('finance_chart_cache_bytes', 'Rozmiar bufora wykresów PNG',
+                                     charts.png_cache.size, type='gauge')
+    lines += profiling.counter_lines('finance_chart_queue_depth', 'Wykresy w kolejce puli rysującej',
+                                     rendering.pending(), type='gauge')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def statement_import(request):
+    """Import wyciągu bankowego (CSV/OFX) + reguły przypisywania kategorii"""
+    form = ImportForm()
+    rule_form = ImportRuleForm()
+
+    if request.method == 'POST' and 'pattern' in request.POST:
+        rule_form = ImportRuleForm(request.POST)
+        if rule_form.is_valid():
+            rule = rule_form.save(commit=False)
+            rule.user = request.user
+            rule.save()
+            return redirect('statement_import')
+    elif request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            csv_options = {}
+            if form.cleaned_data['format'] == 'csv':
+                csv_options = {
+                    'delimiter': form.cleaned_data['delimiter'],
+                    'date_format': form.cleaned_data['date_format'],
+                }
+            if upload.size > settings.FINANCE_JOBS_IMPORT_INLINE_BYTES:
+                # Duży wyciąg importuje worker - żądanie kończy się od razu
+                response = enqueue_job(request, 'import', {
+                    'source': upload.name, 'format': form.cleaned_data['format'],
+                    'encoding': form.cleaned_data['encoding'], 'currency': form.cleaned_data['currency'],
+                    **csv_options,
+                }, upload=upload)
+                return response or redirect('statement_import')
+            try:
+                job = importers.import_statement(
+                    request.user, upload.name, upload.file, format=form.cleaned_data['format'],
+                    encoding=form.cleaned_data['encoding'], currency=form.cleaned_data['currency'], **csv_options,
+                )
+            except importers.UnsortedStatement as error:
+                # Ponowne wysłanie tego samego pliku skończy się tak samo
+                messages.error(request, f"Import przerwany: {error}.")
+            except (ValueError, UnicodeDecodeError) as error:
+                messages.error(request, f"Import przerwany: {error}. Wyślij ten sam plik ponownie, aby go wznowić.")
+            else:
+                messages.success(request, f"Zaimportowano {job.rows_imported} transakcji "
+                                          f"(duplikaty: {job.rows_duplicate}, błędne wiersze: {job.rows_invalid}).")
+                return redirect('transaction_list')
+
+    return render(request, 'finance/statement_import.html', {
+        'form': form,
+        'rule_form': rule_form,
+        'rules': category_registry().attach(list(ImportRule.objects.filter(user=request.user))),
+        'jobs': ImportJob.objects.filter(user=request.user)[:10],
+    })
+
+
+@login_required
+def import_rule_delete(request, pk):
+    rule = get_object_or_404(ImportRule, pk=pk, user=request.user)
+    if request.method == 'POST':
+        rule.delete()
+    return redirect('statement_import')
+
+
+@login_required
+def transaction_export(request):
+    form = ExportForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        if 'background' in request.POST:
+            response = enqueue_job(request, 'export', jobs.export_params(form.cleaned_data))
+            if response:
+                return response
+        else:
+            # Pobieranie od razu - strumieniowo, pod adresem GET z tymi samymi parametrami
+            query = request.POST.copy()
+            query.pop('csrfmiddlewaretoken', None)
+            query.pop('download', None)
+            return redirect(f"{reverse('transaction_export_download')}?{query.urlencode()}")
+    return render(request, 'finance/transaction_export.html', {'form': form})
+
+
+@login_required
+def transaction_export_download(request):
+    """Eksport strumieniowy - plik jest wysyłany w trakcie czytania wierszy z bazy"""
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Nieprawidłowe parametry eksportu')
+
+    format = form.cleaned_data['format']
+    rows = exporters.export_rows(
+        request.user, form.cleaned_data['date_from'], form.cleaned_data['date_to'], form.cleaned_data['categories'],
+    )
+    filename = f"transakcje.{format}"
+    content_type = exporters.CONTENT_TYPES[format]
+    if form.cleaned_data['gzip']:
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(
+        exporters.export_stream(rows, format, gzip=form.cleaned_data['gzip']), content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def budget_list(request):
+    return render(request, 'finance/budget_list.html', {'budgets': budgets.statuses(request.user)})
+
+
+@login_required
+def budget_create(request):
+    if request.method == 'POST':
+        form = BudgetLimitForm(request.POST, user=request.user)
+        if form.is_valid():
+            limit = form.save(commit=False)
+            limit.user = request.user
+            limit.save()
+            return redirect('budget_list')
+    else:
+        form = BudgetLimitForm(user=request.user, initial={'month': timezone.localdate().replace(day=1)})
+
+    return render(request, 'finance/budget_form.html', {'form': form})
+
+
+@login_required
+def budget_update(request, pk):
+    limit = get_object_or_404(BudgetLimit, pk=pk, user=request.user)
+
+    if request.method == 'POST':
+        form = BudgetLimitForm(request.POST, instance=limit, user=request.user)
+        if form.is_valid():
+            form.save()
+            return redirect('budget_list')
+    else:
+        form = BudgetLimitForm(instance=limit, user=request.user)
+
+    return render(request, 'finance/budget_form.html', {'form': form})
+
+
+@login_required
+def budget_delete(request, pk):
+    limit = get_object_or_404(BudgetLimit, pk=pk, user=request.user)
+
+    if request.method == 'POST':
+        limit.delete()
+        return redirect('budget_list')
+
+    return render(request, 'finance/budget_confirm_delete.html', {'limit': limit})
+
+
+@login_required
+def recurring_list(request):
+    rules = list(RecurringRule.objects.filter(user=request.user).order_by('next_date', 'id'))
+    category_registry().attach(rules)
+    return render(request, 'finance/recurring_list.html', {'rules': rules})
+
+
+def save_recurring_rule(request, form):
+    """Zapisuje regułę, przelicza najbliższy termin i od razu tworzy zaległe transakcje tej reguły"""
+    rule = form.save(commit=False)
+    rule.user = request.user
+    recurring.schedule(rule)
+    rule.save()
+    rules, created = recurring.materialize(queryset=RecurringRule.objects.filter(pk=rule.pk))
+    if created:
+        messages.success(request, f"Utworzono zaległe transakcje cykliczne: {created}.")
+    return redirect('recurring_list')
+
+
+@login_required
+def recurring_create(request):
+    if request.method == 'POST':
+        form = RecurringRuleForm(request.POST)
+        if form.is_valid():
+            return save_recurring_rule(request, form)
+    else:
+        form = RecurringRuleForm(initial={'start_date': timezone.localdate()})
+
+    return render(request, 'finance/recurring_form.html', {'form': form})
+
+
+@login_required
+def recurring_update(request, pk):
+    rule = get_object_or_404(RecurringRule, pk=pk, user=request.user)
+
+    if request.method == 'POST':
+        form = RecurringRuleForm(request.POST, instance=rule)
+        if form.is_valid():
+            return save_recurring_rule(request, form)
+    else:
+        form = RecurringRuleForm(instance=rule)
+
+    return render(request, 'finance/recurring_form.html', {'form': form})
+
+
+@login_required
+def recurring_delete(request, pk):
+    rule = get_object_or_404(RecurringRule, pk=pk, user=request.user)
+
+    if request.method == 'POST':
+        # Już utworzone transakcje zostają
+        rule.delete()
+        return redirect('recurring_list')
+
+    return render(request, 'finance/recurring_confirm_delete.html', {'rule': rule})
+
+
+# --- Zadania w tle (finance/jobs.py) ---
+
+def enqueue_job(request, kind, params=None, upload=None):
+    """Dodaje zadanie i przekierowuje na jego stronę; None (z komunikatem), gdy limit zadań jest wyczerpany"""
+    try:
+        job = jobs.enqueue(request.user, kind, params, upload=upload)
+    except jobs.JobLimitError as error:
+        messages.error(request, str(error))
+        return None
+    messages.info(request, f"{job.get_kind_display()}: zadanie dodane do kolejki.")
+    return redirect('job_detail', pk=job.pk)
+
+
+@login_required
+@require_POST
+def analysis_chart_job(request):
+    return enqueue_job(request, 'chart') or redirect('analysis')
+
+
+@login_required
+def job_list(request):
+    return render(request, 'finance/job_list.html', {
+        'jobs': BackgroundJob.objects.filter(user=request.user)[:50],
+    })
+
+
+@login_required
+def job_detail(request, pk):
+    job = get_object_or_404(BackgroundJob, pk=pk, user=request.user)
+    return render(request, 'finance/job_detail.html', {'job': job})
+
+
+@login_required
+def job_status(request, pk):
+    """Status zadania dla strony, która czeka na wynik"""
+    job = get_object_or_404(BackgroundJob, pk=pk, user=request.user)
+    return JsonResponse({
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.finished,
+        'progress': job.progress,
+        'error': job.error,
+        'attempts': job.attempts,
+        'download_url': reverse('job_download', args=[job.pk]) if job.status == 'DONE' and job.result_file else None,
+        'expires_at': job.expires_at,
+    })
+
+
+@login_required
+def job_download(request, pk):
+    job = get_object_or_404(BackgroundJob, pk=pk, user=request.user, status='DONE')
+    try:
+        result = open(jobs.path(job.result_file), 'rb') if job.result_file else None
+    except FileNotFoundError:
+        result = None
+    if result is None:
+        raise Http404("Wynik zadania nie jest już dostępny")
+    return FileResponse(result, as_attachment=True, filename=job.result_name, content_type=job.content_type)